@@ -0,0 +1,46 @@
+"""
+Measure the payload bytes copied by the master per tuple.
+Sends tuples to a running master, then prints the payload counters of the messaging system. The bytes
+copied when serving are counted once containers have consumed the tuples.
+usage: python benchmark_payload_copies.py <master_host> <master_port> [tuples] [protocol_version]
+"""
+import sys
+import json
+from urllib.request import urlopen
+from harmonicIO.stream_connector.stream_connector import StreamConnector
+
+master_host = sys.argv[1]
+master_port = int(sys.argv[2])
+tuples = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+protocol_version = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+
+container_name = 'benblamey/hio-example:latest'
+container_os = 'ubuntu'
+
+# A 512 x 512 bitmap, the size of lena512.bmp.
+message_bytes = bytearray(512 * 512 + 1078)
+
+
+def get_statistics():
+    url = "http://{0}:{1}/messagesQuery?token=None&command=statistics".format(master_host, master_port)
+    return json.loads(str(urlopen(url).read(), 'utf-8'))
+
+
+before = get_statistics()
+
+sc = StreamConnector(master_host, master_port, max_try=1, std_idle_time=1, protocol_version=protocol_version)
+for i in range(tuples):
+    sc.send_data(container_name, container_os, message_bytes)
+sc.close()
+
+after = get_statistics()
+
+received = after['tuples_received'] - before['tuples_received']
+print("Tuples received: {0}, {1} bytes".format(received, after['bytes_received'] - before['bytes_received']))
+print("Bytes copied per tuple on ingestion: {0:.1f}".format(
+    (after['bytes_copied_in'] - before['bytes_copied_in']) / max(1, received)))
+
+served = after['tuples_served'] - before['tuples_served']
+print("Tuples served: {0}".format(served))
+print("Bytes copied per tuple on serving: {0:.1f}".format(
+    (after['bytes_copied_out'] - before['bytes_copied_out']) / max(1, served)))
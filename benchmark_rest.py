@@ -0,0 +1,68 @@
+"""
+Measure the requests per second served by the REST API of a running master or worker.
+Each client sends its requests one after the other over one connection, reconnecting whenever the server
+closes it, so keep-alive is used where the server supports it. Compare "rest_server": "simple" and "threaded".
+usage: python benchmark_rest.py <host> <port> [clients] [requests_per_client] [path]
+"""
+import sys
+import time
+import threading
+import http.client
+
+host = sys.argv[1]
+port = int(sys.argv[2])
+clients = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+requests_per_client = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+path = sys.argv[5] if len(sys.argv) > 5 else "/messagesQuery?token=None&command=current_id"
+
+latencies = []
+errors = []
+lock = threading.Lock()
+
+
+def run_client():
+    client_latencies = []
+    client_errors = 0
+    connection = None
+    for i in range(requests_per_client):
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection(host, port, timeout=30)
+
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.will_close:
+                connection.close()
+                connection = None
+
+            client_latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            client_errors += 1
+            if connection is not None:
+                connection.close()
+                connection = None
+
+    if connection is not None:
+        connection.close()
+
+    with lock:
+        latencies.extend(client_latencies)
+        errors.append(client_errors)
+
+
+threads = [threading.Thread(target=run_client) for _ in range(clients)]
+start_time = time.perf_counter()
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+elapsed = time.perf_counter() - start_time
+
+latencies.sort()
+print("Requests: {0}, errors: {1}, {2:.2f} s".format(len(latencies), sum(errors), elapsed))
+print("Requests per second: {0:.1f}".format(len(latencies) / elapsed))
+if latencies:
+    print("Latency ms p50: {0:.2f}, p99: {1:.2f}".format(latencies[len(latencies) // 2] * 1000,
+                                                       latencies[int(len(latencies) * 0.99)] * 1000))
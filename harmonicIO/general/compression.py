@@ -0,0 +1,111 @@
+"""
+Payload encodings shared by the stream connector, the messaging system and the containers.
+The encoding of a payload travels with it: in the flags of a version 2 frame, in the queue of the master,
+and in the X-Payload-Encoding header of the responses to containers.
+"""
+import time
+import zlib
+import lzma
+import threading
+
+
+class Encoding(object):
+    IDENTITY = 0
+    ZLIB = 1
+    LZMA = 2
+
+    __names = ["identity", "zlib", "lzma"]
+
+    @staticmethod
+    def get_name(encoding):
+        return Encoding.__names[encoding]
+
+    @staticmethod
+    def get_encoding(name):
+        """
+        :return: Encoding for the given name, raises ValueError for an unknown name.
+        """
+        return Encoding.__names.index(name.strip().lower())
+
+    @staticmethod
+    def is_valid(encoding):
+        return 0 <= encoding < len(Encoding.__names)
+
+
+class Compression(object):
+    """
+    Compress and decompress payloads, and keep the compression ratio and the CPU time spent per encoding.
+    """
+    __lock = threading.Lock()
+    __stats = dict()
+
+    # CPU time of the calling thread where available, the messaging system compresses on many threads.
+    __cpu_time = getattr(time, 'thread_time', time.process_time)
+
+    @staticmethod
+    def __add(encoding, key, raw_size, encoded_size, cpu_time):
+        with Compression.__lock:
+            stats = Compression.__stats.get((encoding, key))
+            if stats is None:
+                stats = Compression.__stats[(encoding, key)] = [0, 0, 0, 0.0]
+
+            stats[0] += 1
+            stats[1] += raw_size
+            stats[2] += encoded_size
+            stats[3] += cpu_time
+
+    @staticmethod
+    def compress(data, encoding, level=None):
+        start = Compression.__cpu_time()
+        if encoding == Encoding.ZLIB:
+            ret = zlib.compress(data, 6 if level is None else level)
+        elif encoding == Encoding.LZMA:
+            ret = lzma.compress(data, preset=level)
+        else:
+            return data
+
+        Compression.__add(encoding, "compress", len(data), len(ret), Compression.__cpu_time() - start)
+        return ret
+
+    @staticmethod
+    def decompress(data, encoding):
+        start = Compression.__cpu_time()
+        if encoding == Encoding.ZLIB:
+            ret = zlib.decompress(data)
+        elif encoding == Encoding.LZMA:
+            ret = lzma.decompress(data)
+        else:
+            return data
+
+        Compression.__add(encoding, "decompress", len(ret), len(data), Compression.__cpu_time() - start)
+        return ret
+
+    @staticmethod
+    def encode(data, encoding, threshold=0, level=None):
+        """
+        Compress a payload of at least threshold bytes, unless compression does not make it smaller.
+        :return: Tuple (payload, encoding of the payload)
+        """
+        if encoding == Encoding.IDENTITY or len(data) < threshold:
+            return data, Encoding.IDENTITY
+
+        ret = Compression.compress(data, encoding, level)
+        if len(ret) >= len(data):
+            return data, Encoding.IDENTITY
+
+        return ret, encoding
+
+    @staticmethod
+    def verbose():
+        ret = dict()
+        with Compression.__lock:
+            for (encoding, key), (count, raw_size, encoded_size, cpu_time) in Compression.__stats.items():
+                ret["{0}_{1}".format(Encoding.get_name(encoding), key)] = {
+                    'count': count,
+                    'raw_bytes': raw_size,
+                    'encoded_bytes': encoded_size,
+                    'ratio': raw_size / max(1, encoded_size),
+                    'cpu_seconds': cpu_time,
+                    'cpu_seconds_per_mb': cpu_time * 1024 * 1024 / max(1, raw_size)}
+
+        return ret
@@ -1,3 +1,6 @@
+import json
+
+
 class BatchErrorCode:
     SUCCESS = 0
     CREATE_SOCKET_ERROR = 1
@@ -31,6 +34,18 @@ class JobStatus:
     FAILED = "FAILED"
 
 
+class OperationStatus:
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class WorkerStatus:
+    ALIVE = "ALIVE"
+    SUSPECT = "SUSPECT"
+
+
 class Definition(object):
     @staticmethod
     def get_str_node_name():
@@ -100,6 +115,258 @@ class Definition(object):
     def get_str_token():
         return "token"
 
+    @staticmethod
+    def get_str_max_in_memory_msg():
+        return "max_in_memory_msg"
+
+    @staticmethod
+    def get_str_max_in_memory_bytes():
+        return "max_in_memory_bytes"
+
+    @staticmethod
+    def get_str_spill_directory():
+        return "spill_directory"
+
+    @staticmethod
+    def get_str_spill_segment_bytes():
+        return "spill_segment_bytes"
+
+    @staticmethod
+    def get_str_max_spill_bytes():
+        return "max_spill_bytes"
+
+    @staticmethod
+    def get_str_wal_directory():
+        return "wal_directory"
+
+    @staticmethod
+    def get_str_wal_fsync_interval():
+        return "wal_fsync_interval_ms"
+
+    @staticmethod
+    def get_str_wal_fsync_batch():
+        return "wal_fsync_batch"
+
+    @staticmethod
+    def get_str_wal_sync_commit():
+        return "wal_sync_commit"
+
+    @staticmethod
+    def get_str_wal_checkpoint_bytes():
+        return "wal_checkpoint_bytes"
+
+    @staticmethod
+    def get_str_dedup_images():
+        return "dedup_images"
+
+    @staticmethod
+    def get_str_dedup_window_size():
+        return "dedup_window_size"
+
+    @staticmethod
+    def get_str_dedup_window_seconds():
+        return "dedup_window_seconds"
+
+    @staticmethod
+    def get_str_compression():
+        return "compression"
+
+    @staticmethod
+    def get_str_tuple_log_capacity():
+        return "tuple_log_capacity"
+
+    @staticmethod
+    def get_str_tuple_log_sample_rate():
+        return "tuple_log_sample_rate"
+
+    @staticmethod
+    def get_str_tuple_log_directory():
+        return "tuple_log_directory"
+
+    @staticmethod
+    def get_str_tuple_log_file_bytes():
+        return "tuple_log_file_bytes"
+
+    @staticmethod
+    def get_str_tuple_log_files():
+        return "tuple_log_files"
+
+    @staticmethod
+    def get_str_container_selection():
+        return "container_selection"
+
+    @staticmethod
+    def get_str_container_max_outstanding():
+        return "container_max_outstanding"
+
+    @staticmethod
+    def get_str_container_lease_seconds():
+        return "container_lease_seconds"
+
+    @staticmethod
+    def get_str_worker_status():
+        return "worker_status"
+
+    @staticmethod
+    def get_str_worker_heartbeat_interval():
+        return "worker_heartbeat_interval"
+
+    @staticmethod
+    def get_str_phi_suspect_threshold():
+        return "phi_suspect_threshold"
+
+    @staticmethod
+    def get_str_phi_dead_threshold():
+        return "phi_dead_threshold"
+
+    @staticmethod
+    def get_str_worker_request_timeout():
+        return "worker_request_timeout"
+
+    @staticmethod
+    def get_str_rest_server():
+        return "rest_server"
+
+    @staticmethod
+    def get_str_rest_workers():
+        return "rest_workers"
+
+    @staticmethod
+    def get_str_operation_workers():
+        return "operation_workers"
+
+    @staticmethod
+    def get_str_container_create_timeout():
+        return "container_create_timeout"
+
+    @staticmethod
+    def get_str_scheduler():
+        return "scheduler"
+
+    @staticmethod
+    def get_str_scheduler_max_load():
+        return "scheduler_max_load"
+
+    @staticmethod
+    def get_str_scheduler_container_load():
+        return "scheduler_container_load"
+
+    @staticmethod
+    def get_str_scheduler_container_memory():
+        return "scheduler_container_memory"
+
+    @staticmethod
+    def get_str_launch_threads():
+        return "launch_threads"
+
+    @staticmethod
+    def get_str_launches_per_worker():
+        return "launches_per_worker"
+
+    @staticmethod
+    def get_str_job_queuer_threads():
+        return "job_queuer_threads"
+
+    @staticmethod
+    def get_str_autoscaling_interval():
+        return "autoscaling_interval"
+
+    @staticmethod
+    def get_str_autoscaling_target_delay():
+        return "autoscaling_target_delay"
+
+    @staticmethod
+    def get_str_autoscaling_min_queue_length():
+        return "autoscaling_min_queue_length"
+
+    @staticmethod
+    def get_str_autoscaling_max_step():
+        return "autoscaling_max_step"
+
+    @staticmethod
+    def get_str_autoscaling_min_containers():
+        return "autoscaling_min_containers"
+
+    @staticmethod
+    def get_str_autoscaling_max_containers():
+        return "autoscaling_max_containers"
+
+    @staticmethod
+    def get_str_autoscaling_scale_out_cooldown():
+        return "autoscaling_scale_out_cooldown"
+
+    @staticmethod
+    def get_str_autoscaling_scale_in_cooldown():
+        return "autoscaling_scale_in_cooldown"
+
+    @staticmethod
+    def get_str_autoscaling_hysteresis():
+        return "autoscaling_hysteresis"
+
+    @staticmethod
+    def get_str_autoscaling_initial_service_rate():
+        return "autoscaling_initial_service_rate"
+
+    @staticmethod
+    def get_str_reconcile_interval():
+        return "reconcile_interval"
+
+    @staticmethod
+    def get_str_replicas():
+        return "replicas"
+
+    @staticmethod
+    def get_str_warm_pool():
+        return "warm_pool"
+
+    @staticmethod
+    def get_str_warm_pool_volatile():
+        return "warm_pool_volatile"
+
+    @staticmethod
+    def get_str_image_disk_budget():
+        return "image_disk_budget"
+
+    @staticmethod
+    def get_str_pull_workers():
+        return "pull_workers"
+
+    @staticmethod
+    def get_str_prefetch_workers():
+        return "prefetch_workers"
+
+    @staticmethod
+    def get_str_prefetch_cooldown():
+        return "prefetch_cooldown"
+
+    @staticmethod
+    def get_str_priority_aging_interval():
+        return "priority_aging_interval"
+
+    @staticmethod
+    def get_str_max_batch_msg():
+        return "max_batch_msg"
+
+    @staticmethod
+    def get_str_max_batch_bytes():
+        return "max_batch_bytes"
+
+    @staticmethod
+    def get_str_batch_target_time():
+        return "batch_target_time"
+
+    @staticmethod
+    def get_str_push_mode_enabled():
+        return "push_mode_enabled"
+
+    @staticmethod
+    def get_str_push_max_connections():
+        return "push_max_connections"
+
+    @staticmethod
+    def get_str_messaging_server():
+        return "messaging_server"
+
     @staticmethod
     def get_str_load1():
         return "load1"
@@ -120,6 +387,18 @@ class Definition(object):
     def get_str_last_update():
         return "last_upd"
 
+    @staticmethod
+    def get_str_cpu_count():
+        return "cpu_count"
+
+    @staticmethod
+    def get_str_mem_total():
+        return "mem_total"
+
+    @staticmethod
+    def get_str_mem_available():
+        return "mem_available"
+
     @staticmethod
     def get_cpu_load_command():
         return ['uptime', '|', 'awk', '{ print $8 $9 $10}']
@@ -147,29 +426,40 @@ class Definition(object):
 
         @staticmethod
         def get_str_push_req_container_ext(container_name, container_os, priority, source_name, digest):
-            return  "&" + Definition.Container.get_str_con_image_name() + "=" + container_name + \
-                    "&" + Definition.Container.get_str_container_os() + "=" + container_os + \
-                    "&" + Definition.Container.get_str_container_priority() + "=" + str(priority) + \
-                    "&" + Definition.Container.get_str_data_source() + "=" + source_name + \
-                    "&" + Definition.Container.get_str_data_digest() + "=" + digest
+            return "&{0}={1}&{2}={3}&{4}={5}&{6}={7}&{8}={9}".format(Key.IMAGE_NAME, container_name,
+                                                                    Key.CONTAINER_OS, container_os,
+                                                                    Key.PRIORITY, priority,
+                                                                    Key.DATA_SOURCE, source_name,
+                                                                    Key.DATA_DIGEST, digest)
 
         @staticmethod
         def get_str_end_point(ret, sc=list()):
+            """
+            :return: JSON of the end point to stream a tuple to a container directly.
+            """
             response = dict()
-            response[Definition.get_str_node_addr()] = ret[Definition.REST.Batch.get_str_batch_addr()]
-            response[Definition.get_str_node_port()] = ret[Definition.REST.Batch.get_str_batch_port()]
-            response[Definition.get_str_node_role()] = CRole.WORKER
-            response[Definition.Master.DataLog.get_str_data_cmd()] = sc
-            return str(response)
+            response[Key.NODE_ADDR] = ret[Key.BATCH_ADDR]
+            response[Key.NODE_PORT] = ret[Key.BATCH_PORT]
+            response[Key.NODE_ROLE] = CRole.WORKER
+            response[Key.DATA_CMD] = sc
+            return to_json(response)
 
         @staticmethod
-        def get_str_end_point_MS(setting, sc=list()):
+        def get_str_end_point_MS(setting, sc=list(), compression=None):
+            """
+            :return: JSON of the end point to stream a tuple to the messaging system.
+            """
             response = dict()
-            response[Definition.get_str_node_addr()] = setting.get_node_addr()
-            response[Definition.get_str_node_port()] = setting.get_data_port_start()
-            response[Definition.get_str_node_role()] = CRole.MESSAGING_SYSTEM
-            response[Definition.Master.DataLog.get_str_data_cmd()] = sc
-            return str(response)
+            response[Key.NODE_ADDR] = setting.get_node_addr()
+            response[Key.NODE_PORT] = setting.get_data_port_start()
+            response[Key.NODE_ROLE] = CRole.MESSAGING_SYSTEM
+            response[Key.DATA_CMD] = sc
+
+            # Encoding and size threshold for the payloads of this image, if the master compresses them.
+            if compression:
+                response[Key.ENCODING] = compression[0]
+                response[Key.THRESHOLD] = compression[1]
+            return to_json(response)
 
     class REST(object):
         @staticmethod
@@ -204,6 +494,14 @@ class Definition(object):
         def get_str_local_imgs():
             return "local_images"
 
+        @staticmethod
+        def get_str_pending_operations():
+            return "pending_operations"
+
+        @staticmethod
+        def get_str_free_ports():
+            return "free_ports"
+
         class Batch(object):
             @staticmethod
             def get_str_batch_addr():
@@ -231,6 +529,50 @@ class Definition(object):
         def get_str_current_id():
             return "current_id"
 
+        @staticmethod
+        def get_str_statistics():
+            return "statistics"
+
+        @staticmethod
+        def get_str_batch_size():
+            return "batch_size"
+
+        @staticmethod
+        def get_str_batch_bytes():
+            return "batch_bytes"
+
+        @staticmethod
+        def get_str_batch_adaptive():
+            return "adaptive"
+
+        @staticmethod
+        def get_str_proc_time():
+            return "proc_time"
+
+        @staticmethod
+        def get_str_batch_count_header():
+            return "X-Batch-Count"
+
+        @staticmethod
+        def get_str_encoding():
+            return "encoding"
+
+        @staticmethod
+        def get_str_threshold():
+            return "threshold"
+
+        @staticmethod
+        def get_str_level():
+            return "level"
+
+        @staticmethod
+        def get_str_accept_encoding():
+            return "accept_encoding"
+
+        @staticmethod
+        def get_str_encoding_header():
+            return "X-Payload-Encoding"
+
     class ChannelStatus(object):
         @staticmethod
         def get_str_pe_status():
@@ -257,6 +599,26 @@ class Definition(object):
         def get_str_data_digest():
             return "digest"
 
+        @staticmethod
+        def get_str_outstanding():
+            return "outstanding"
+
+        @staticmethod
+        def get_str_num():
+            return "num"
+
+        @staticmethod
+        def get_str_desired():
+            return "desired"
+
+        @staticmethod
+        def get_str_min_replicas():
+            return "min"
+
+        @staticmethod
+        def get_str_max_replicas():
+            return "max"
+
         class Status(object):
 
             @staticmethod
@@ -301,6 +663,38 @@ class Definition(object):
         def get_str_finished():
             return "finished"
 
+        @staticmethod
+        def get_str_operation():
+            return "operation"
+
+        @staticmethod
+        def get_str_operation_id():
+            return "operation_id"
+
+        @staticmethod
+        def get_str_result():
+            return "result"
+
+        @staticmethod
+        def get_str_wait():
+            return "wait"
+
+        @staticmethod
+        def get_str_operation_ids():
+            return "operation_ids"
+
+        @staticmethod
+        def get_str_creating():
+            return "creating"
+
+        @staticmethod
+        def get_str_pull():
+            return "pull"
+
+        @staticmethod
+        def get_str_image_pulls():
+            return "image_pulls"
+
         class HDE(object):
 
             @staticmethod
@@ -342,3 +736,38 @@ class Definition(object):
             @staticmethod
             def get_str_idle_timeout():
                 return "HDE_IDLE_TIMEOUT"
+
+
+class Key(object):
+    """
+    Keys of the requests and responses handled for every tuple, resolved once from Definition instead of
+    through a chain of calls on each request.
+    """
+    TOKEN = Definition.get_str_token()
+    NODE_ADDR = Definition.get_str_node_addr()
+    NODE_PORT = Definition.get_str_node_port()
+    NODE_ROLE = Definition.get_str_node_role()
+    LAST_UPDATE = Definition.get_str_last_update()
+    DATA_CMD = Definition.Master.DataLog.get_str_data_cmd()
+    STATUS = Definition.REST.get_str_status()
+    IMAGE_NAME = Definition.Container.get_str_con_image_name()
+    CONTAINER_OS = Definition.Container.get_str_container_os()
+    PRIORITY = Definition.Container.get_str_container_priority()
+    DATA_SOURCE = Definition.Container.get_str_data_source()
+    DATA_DIGEST = Definition.Container.get_str_data_digest()
+    SID = Definition.Container.Status.get_str_sid()
+    BATCH_ADDR = Definition.REST.Batch.get_str_batch_addr()
+    BATCH_PORT = Definition.REST.Batch.get_str_batch_port()
+    BATCH_STATUS = Definition.REST.Batch.get_str_batch_status()
+    BATCH_SIZE = Definition.MessagesQueue.get_str_batch_size()
+    BATCH_ADAPTIVE = Definition.MessagesQueue.get_str_batch_adaptive()
+    ENCODING = Definition.MessagesQueue.get_str_encoding()
+    THRESHOLD = Definition.MessagesQueue.get_str_threshold()
+    ENCODING_HEADER = Definition.MessagesQueue.get_str_encoding_header()
+
+
+def to_json(data):
+    """
+    Compact JSON body of the control-plane responses.
+    """
+    return json.dumps(data, separators=(',', ':'))
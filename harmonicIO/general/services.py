@@ -85,9 +85,27 @@ class Services(object):
         body[Definition.get_str_load1()] = load1
         body[Definition.get_str_load5()] = load5
         body[Definition.get_str_load15()] = load15
+        body[Definition.get_str_cpu_count()] = os.cpu_count() or 1
+        body[Definition.get_str_mem_total()], body[Definition.get_str_mem_available()] = Services.get_memory_info()
 
         return body
 
+    @staticmethod
+    def get_memory_info():
+        """
+        :return: Tuple (total, available) memory in bytes, (None, None) where /proc/meminfo is not available.
+        """
+        info = dict()
+        try:
+            with open('/proc/meminfo', 'rt') as f:
+                for line in f:
+                    name, value = line.split(":", 1)
+                    info[name] = int(value.split()[0]) * 1024
+        except (OSError, ValueError):
+            return None, None
+
+        return info.get('MemTotal'), info.get('MemAvailable', info.get('MemFree'))
+
     @staticmethod
     def is_valid_ipv4(ip):
         import re
@@ -0,0 +1,153 @@
+"""
+This module contains the headers used by the stream connector to send tuples to the messaging system,
+and the framing of batches of tuples sent from the messaging system to the containers.
+Two stream protocols are supported: the original one sends one tuple per connection, preceded by a
+StreamHeader and terminated by closing the socket; version 2 sends length-prefixed frames on a
+long-lived connection.
+"""
+import struct
+
+
+class StreamHeader(object):
+    """
+    Header of a tuple sent to the messaging system, followed by the payload until the socket is closed.
+    Legacy header: 3 ASCII digits image name length, image name.
+    Priority header: 'P', 3 ASCII digits image name length, image name, 3 ASCII digits priority.
+    """
+    PRIORITY_MARK = b"P"
+    MAX_PRIORITY = 999
+
+    # Number of bytes get_size needs to know the length of a header.
+    prefix_size = 4
+
+    @staticmethod
+    def encode(image_name, priority=0):
+        image_name_b = bytes(image_name, 'UTF-8')
+        if len(image_name_b) > 999:
+            raise ValueError("Image name is too long for the stream header.")
+
+        header = bytes("{0:03d}".format(len(image_name_b)), 'UTF-8') + image_name_b
+
+        # A tuple without priority keeps the legacy header, so older masters can still read it.
+        if not priority:
+            return header
+
+        priority = max(0, min(int(priority), StreamHeader.MAX_PRIORITY))
+        return StreamHeader.PRIORITY_MARK + header + bytes("{0:03d}".format(priority), 'UTF-8')
+
+    @staticmethod
+    def get_size(data):
+        """
+        Length of the header at the beginning of the data, which must hold at least prefix_size bytes.
+        """
+        offset = 1 if data[0:1] == StreamHeader.PRIORITY_MARK else 0
+        size = offset + 3 + int(bytes(data[offset:offset + 3]).decode('UTF-8'))
+
+        return size + 3 if offset else size
+
+    @staticmethod
+    def decode(data):
+        """
+        Parse the header at the beginning of the data.
+        :return: Tuple (image_name, priority, header_length)
+        """
+        offset = 0
+        has_priority = data[0:1] == StreamHeader.PRIORITY_MARK
+        if has_priority:
+            offset = 1
+
+        image_name_length = int(bytes(data[offset:offset + 3]).decode('UTF-8'))
+        offset += 3
+        image_name = bytes(data[offset:offset + image_name_length]).decode('UTF-8')
+        offset += image_name_length
+
+        priority = 0
+        if has_priority:
+            priority = int(bytes(data[offset:offset + 3]).decode('UTF-8'))
+            offset += 3
+
+        return image_name, priority, offset
+
+
+class BatchFrame(object):
+    """
+    Batch of payloads in one response: every payload is prefixed by its length as 4 bytes big endian.
+    """
+    __length = struct.Struct(">I")
+
+    @staticmethod
+    def pack(items):
+        parts = []
+        for item in items:
+            parts.append(BatchFrame.__length.pack(len(item)))
+            parts.append(item)
+
+        return b"".join(parts)
+
+    @staticmethod
+    def unpack(data):
+        """
+        :return: List of memoryviews on the payloads of the batch.
+        """
+        ret = []
+        view = memoryview(data)
+        offset = 0
+        while offset < len(view):
+            length, = BatchFrame.__length.unpack_from(view, offset)
+            offset += BatchFrame.__length.size
+            ret.append(view[offset:offset + length])
+            offset += length
+
+        return ret
+
+
+class FrameHeader(object):
+    """
+    Header of a data frame in the version 2 stream protocol.
+    A connection starts with MAGIC and then carries any number of frames, each made of this header, the image
+    name and the payload. The messaging system answers every frame, in order, with a FrameAck, so a producer
+    can keep several frames in flight on one connection.
+    Header: frame type, flags, priority, image name length, payload length, MD5 digest of the payload.
+    The flags hold the Encoding of the payload, the digest is computed on the payload as sent.
+    """
+    MAGIC = b"HIO\x02"
+    DATA = 1
+
+    __header = struct.Struct(">BBHHI16s")
+    size = __header.size
+
+    @staticmethod
+    def encode(image_name, payload_length, digest, priority=0, flags=0):
+        image_name_b = bytes(image_name, 'UTF-8')
+        return FrameHeader.__header.pack(FrameHeader.DATA, flags, priority, len(image_name_b), payload_length,
+                                         digest) + image_name_b
+
+    @staticmethod
+    def decode(data, offset=0):
+        """
+        :return: Tuple (frame_type, flags, priority, image_name_length, payload_length, digest)
+        """
+        return FrameHeader.__header.unpack_from(data, offset)
+
+
+class FrameAck(object):
+    """
+    Answer of the messaging system to a data frame: status, sequence number of the frame on its connection.
+    """
+    OK = 0
+    QUEUE_FULL = 1
+    INVALID = 2
+
+    __ack = struct.Struct(">BI")
+    size = __ack.size
+
+    @staticmethod
+    def encode(status, seq):
+        return FrameAck.__ack.pack(status, seq & 0xffffffff)
+
+    @staticmethod
+    def decode(data):
+        """
+        :return: Tuple (status, seq)
+        """
+        return FrameAck.__ack.unpack(data)
@@ -0,0 +1,170 @@
+"""
+HTTP servers for the falcon APIs of the master and the workers.
+"simple" is the single threaded HTTP/1.0 wsgiref server. "threaded" serves connections on a bounded pool of
+threads and keeps HTTP/1.1 connections open between requests, so that one slow client does not hold up the
+others and polling clients do not open a connection per request.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import make_server as make_simple_server, WSGIServer, WSGIRequestHandler, ServerHandler
+
+
+class ServerMode(object):
+    SIMPLE = "simple"
+    THREADED = "threaded"
+
+    @staticmethod
+    def is_valid(mode):
+        return mode in [ServerMode.SIMPLE, ServerMode.THREADED]
+
+
+class RequestBody(object):
+    """
+    Request body stream limited to the Content-Length of the request. What the application leaves unread is
+    drained once it returns, so that the next request on the connection starts at its request line.
+    """
+
+    def __init__(self, rfile, length):
+        self.__rfile = rfile
+        self.__remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.__remaining:
+            size = self.__remaining
+
+        data = self.__rfile.read(size)
+        self.__remaining -= len(data)
+        return data
+
+    def readline(self, size=-1):
+        if size is None or size < 0 or size > self.__remaining:
+            size = self.__remaining
+
+        data = self.__rfile.readline(size)
+        self.__remaining -= len(data)
+        return data
+
+    def readlines(self, hint=-1):
+        return list(iter(self.readline, b""))
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def drain(self):
+        while self.__remaining > 0 and self.read(64 * 1024):
+            pass
+
+        return self.__remaining == 0
+
+
+class KeepAliveServerHandler(ServerHandler):
+    """
+    Server handler remembering the Content-Length of its response, which the handler clears once done.
+    """
+    content_length = None
+
+    def close(self):
+        if self.headers is not None:
+            self.content_length = self.headers.get('Content-Length')
+
+        ServerHandler.close(self)
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """
+    WSGI request handler serving several HTTP/1.1 requests per connection. A connection is closed when the
+    client asks for it, when a request has a body of unknown length, or when a response has no Content-Length.
+    """
+    # Idle keep-alive connections are closed after this time, to give their thread back to the pool.
+    timeout = 15
+
+    # Headers and body are written separately, without Nagle they are not held back waiting for an ACK.
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            self.handle_one_request()
+
+    def __is_keep_alive(self):
+        return self.request_version == "HTTP/1.1" and \
+            self.headers.get('Connection', "").lower() != "close" and \
+            not self.headers.get('Transfer-Encoding')
+
+    def handle_one_request(self):
+        self.close_connection = True
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except OSError:
+            return
+
+        if not self.raw_requestline:
+            return
+
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ''
+            self.request_version = ''
+            self.command = ''
+            self.send_error(414)
+            return
+
+        if not self.parse_request():
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            self.send_error(400)
+            return
+
+        keep_alive = self.__is_keep_alive()
+        body = RequestBody(self.rfile, length)
+        handler = KeepAliveServerHandler(body, self.wfile, self.get_stderr(), self.get_environ(), multithread=True)
+        handler.request_handler = self
+        if keep_alive:
+            handler.http_version = "1.1"
+
+        handler.run(self.server.get_app())
+
+        if keep_alive and handler.content_length is not None and body.drain():
+            self.close_connection = False
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """
+    WSGI server handing every connection to a pool of threads.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, workers):
+        WSGIServer.__init__(self, server_address, KeepAliveRequestHandler)
+        self.__pool = ThreadPoolExecutor(max_workers=workers)
+
+    def __process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        self.__pool.submit(self.__process_request, request, client_address)
+
+    def server_close(self):
+        WSGIServer.server_close(self)
+        self.__pool.shutdown(wait=False)
+
+
+def make_server(host, port, app, mode=ServerMode.SIMPLE, workers=32):
+    """
+    :param mode: ServerMode.SIMPLE or ServerMode.THREADED.
+    :param workers: Number of connections served at once in threaded mode.
+    """
+    if mode == ServerMode.THREADED:
+        server = ThreadPoolWSGIServer((host, port), workers)
+        server.set_app(app)
+        return server
+
+    return make_simple_server(host, port, app)
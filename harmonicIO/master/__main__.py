@@ -24,6 +24,51 @@ def run_queue_manager(manager):
         supervisor_thread.start()
         SysOut.out_string("Autoscaling supervisor started")
 
+    if Setting.get_prefetch_workers():
+        prefetch_thread = threading.Thread(target=manager.prefetch_supervisor)
+        prefetch_thread.daemon = True
+        prefetch_thread.start()
+        SysOut.out_string("Image prefetching started")
+
+
+
+def run_reconciler(manager):
+    """
+    Run the reconciliation of the desired replicas of images with the containers reported by the workers
+    """
+    import threading
+    from .reconciler import Reconciler
+    from .meta_table import LookUpTable
+    from harmonicIO.general.definition import Definition
+
+    for image_name, replicas in Setting.get_replicas().items():
+        LookUpTable.Replicas.set_replicas(image_name,
+                                          replicas.get(Definition.Container.get_str_desired(), 0),
+                                          replicas.get(Definition.Container.get_str_min_replicas(), 0),
+                                          replicas.get(Definition.Container.get_str_max_replicas()))
+
+    reconciler_thread = threading.Thread(target=Reconciler(manager, Setting.get_reconcile_interval()).run)
+    reconciler_thread.daemon = True
+    reconciler_thread.start()
+    SysOut.out_string("Reconciler started")
+
+
+def run_worker_monitor():
+    """
+    Run the failure detection of workers from their heartbeats
+    """
+    import threading
+    import time
+
+    def monitor():
+        while True:
+            time.sleep(1)
+            LookUpTable.check_workers(time.time())
+
+    monitor_thread = threading.Thread(target=monitor)
+    monitor_thread.daemon = True
+    monitor_thread.start()
+    SysOut.out_string("Worker failure detector started")
 
 
 def run_rest_service():
@@ -40,10 +85,14 @@ def run_msg_service():
     Run msg service to eliminate back pressure
     """
     from .configuration import Setting
-    from .server_socket import ThreadedTCPServer, ThreadedTCPRequestHandler
     import threading
-    server = ThreadedTCPServer((Setting.get_node_addr(), Setting.get_data_port_start()),
-                               ThreadedTCPRequestHandler, bind_and_activate=True)
+    if Setting.get_messaging_server() == "selector":
+        from .selector_server import SelectorTCPServer
+        server = SelectorTCPServer((Setting.get_node_addr(), Setting.get_data_port_start()))
+    else:
+        from .server_socket import ThreadedTCPServer, ThreadedTCPRequestHandler
+        server = ThreadedTCPServer((Setting.get_node_addr(), Setting.get_data_port_start()),
+                                   ThreadedTCPRequestHandler, bind_and_activate=True)
 
     # Start a thread with the server -- that thread will then start one
     server_thread = threading.Thread(target=server.serve_forever)
@@ -51,7 +100,8 @@ def run_msg_service():
     # Exit the server thread when the main thread terminates
     server_thread.daemon = True
 
-    SysOut.out_string("Enable Messaging System on port: " + str(Setting.get_data_port_start()))
+    SysOut.out_string("Enable Messaging System ({0}) on port: {1}".format(Setting.get_messaging_server(),
+                                                                          Setting.get_data_port_start()))
 
     server_thread.start()
 
@@ -75,6 +125,48 @@ if __name__ == '__main__':
     SysOut.out_string("Node address: " + Setting.get_node_addr())
     SysOut.out_string("Node port: " + str(Setting.get_node_port()))
 
+    # Apply the queue limits of the messaging system
+    from .messaging_system import MessagingConfiguration, MessagesQueue
+    MessagingConfiguration.load_setting(Setting)
+
+    # Bounded log of the tuples announced by stream connectors
+    from .meta_table import LookUpTable
+    from .tuple_log import TupleLog, TupleLogFile
+    tuple_log_file = None
+    if Setting.get_tuple_log_directory():
+        tuple_log_file = TupleLogFile(Setting.get_tuple_log_directory(),
+                                      Setting.get_tuple_log_file_bytes(),
+                                      Setting.get_tuple_log_files())
+    LookUpTable.Tuples.set_tuple_log(TupleLog(Setting.get_tuple_log_capacity(),
+                                              Setting.get_tuple_log_sample_rate(),
+                                              tuple_log_file))
+
+    # Selection of the containers tuples are routed to
+    LookUpTable.Containers.configure(Setting.get_container_selection(),
+                                     Setting.get_container_max_outstanding(),
+                                     Setting.get_container_lease_seconds())
+
+    # Failure detection of workers, from the interval of their status updates
+    LookUpTable.Workers.configure(Setting.get_worker_heartbeat_interval(),
+                                  Setting.get_phi_suspect_threshold(),
+                                  Setting.get_phi_dead_threshold())
+
+    # Rebuild the queues from the write-ahead log before accepting new tuples
+    if Setting.get_wal_directory():
+        from .write_ahead_log import WriteAheadLog
+        MessagesQueue.enable_write_ahead_log(WriteAheadLog(Setting.get_wal_directory(),
+                                                           Setting.get_wal_fsync_interval(),
+                                                           Setting.get_wal_fsync_batch(),
+                                                           Setting.get_wal_sync_commit(),
+                                                           Setting.get_wal_checkpoint_bytes()))
+
+    # Stream queued tuples to idle containers instead of waiting for them to poll
+    if Setting.get_push_mode():
+        from .push_dispatcher import PushDispatcher
+        dispatcher = PushDispatcher(Setting.get_push_max_connections())
+        dispatcher.start()
+        MessagesQueue.set_push_dispatcher(dispatcher)
+
     # Create thread for handling REST Service
     from concurrent.futures import ThreadPoolExecutor
     pool = ThreadPoolExecutor()
@@ -86,7 +178,26 @@ if __name__ == '__main__':
     pool.submit(run_rest_service)
     
     # create a job manager which is a queue manager supervising the creation of containers, both via user and auto-scaling
-    jobManager = JobManager(30, 100, 5, 1) # 30 seconds interval between checking, 100 requests in queue before increase, add 5 new containers, 1 thread for queue supervisor
+    from .scheduler import get_scheduler
+    scheduler = get_scheduler(Setting.get_scheduler(),
+                              Setting.get_scheduler_max_load(),
+                              Setting.get_scheduler_container_load(),
+                              Setting.get_scheduler_container_memory())
+    from .autoscaler import AutoScaler
+    autoscaler = AutoScaler(**Setting.get_autoscaler_setting())
+    jobManager = JobManager(Setting.get_job_queuer_threads(), autoscaler,
+                            Setting.get_worker_request_timeout(), Setting.get_container_create_timeout(),
+                            scheduler=scheduler,
+                            launch_threads=Setting.get_launch_threads(),
+                            launches_per_worker=Setting.get_launches_per_worker(),
+                            prefetch_workers=Setting.get_prefetch_workers(),
+                            prefetch_cooldown=Setting.get_prefetch_cooldown())
     
     # Run job queue manager thread
     pool.submit(run_queue_manager, jobManager)
+
+    # Keep the images with a desired state at their number of containers
+    pool.submit(run_reconciler, jobManager)
+
+    # Run the worker failure detector
+    pool.submit(run_worker_monitor)
@@ -0,0 +1,127 @@
+import math
+
+
+class ImageRates(object):
+    """
+    Smoothed arrival and service rates of the queue of one image.
+    """
+
+    def __init__(self, now, arrived, popped, service_rate):
+        self.time = now
+        self.arrived = arrived
+        self.popped = popped
+        self.arrival_rate = 0.0
+        self.service_rate = service_rate
+        self.last_scale_out = 0.0
+        self.last_scale_in = now
+
+
+class AutoScaler(object):
+    """
+    Rate based autoscaling policy for the containers of each image.
+    From one evaluation to the next, the arrival rate of an image is estimated from the tuples announced to the
+    master, whether queued or routed to a container directly, and the service rate of one container from the
+    tuples popped from the queue, while it was not empty, per container. The policy asks for enough containers
+    to serve the arrivals and drain the queue within target_delay seconds, counting the containers still
+    starting as already there. It scales out at once, but only scales in when the desired count is below the
+    current one by more than the hysteresis, and each direction has its own cooldown after an action on the
+    image.
+    """
+
+    def __init__(self, interval=30, target_delay=10.0, min_queue_length=10, max_step=5, min_containers=0,
+                 max_containers=50, scale_out_cooldown=60, scale_in_cooldown=300, hysteresis=0.25,
+                 smoothing=0.5, initial_service_rate=1.0):
+        """
+        :param interval: Seconds between two evaluations.
+        :param target_delay: Seconds a queued tuple should wait at most.
+        :param min_queue_length: Queue length from which an image is scaled out.
+        :param max_step: Containers added or removed for an image at once.
+        :param min_containers: Containers of an image that are never scaled in.
+        :param max_containers: Containers of an image that are never exceeded by scaling out.
+        :param hysteresis: Relative margin between the desired and the current count needed to scale in.
+        :param smoothing: Weight of the newest measurement in the moving averages of the rates.
+        :param initial_service_rate: Tuples per second of one container, until it is measured.
+        """
+        self.__interval = interval
+        self.__target_delay = target_delay
+        self.__min_queue_length = min_queue_length
+        self.__max_step = max_step
+        self.__min_containers = min_containers
+        self.__max_containers = max_containers
+        self.__scale_out_cooldown = scale_out_cooldown
+        self.__scale_in_cooldown = scale_in_cooldown
+        self.__hysteresis = hysteresis
+        self.__smoothing = smoothing
+        self.__initial_service_rate = initial_service_rate
+        self.__rates = dict()
+
+    def get_interval(self):
+        return self.__interval
+
+    def get_rates(self, image_name):
+        """
+        :return: Tuple (arrival rate, service rate per container) of the image, None before its first evaluation.
+        """
+        rates = self.__rates.get(image_name)
+        if rates is None:
+            return None
+
+        return rates.arrival_rate, rates.service_rate
+
+    def __update(self, rates, now, queue_length, arrived, popped, containers):
+        elapsed = now - rates.time
+        if elapsed <= 0:
+            return
+
+        arrival_rate = (arrived - rates.arrived) / elapsed
+        rates.arrival_rate += self.__smoothing * (arrival_rate - rates.arrival_rate)
+
+        # Containers only show their capacity while they have a backlog to work on.
+        if containers > 0 and queue_length > 0 and popped > rates.popped:
+            service_rate = (popped - rates.popped) / elapsed / containers
+            rates.service_rate += self.__smoothing * (service_rate - rates.service_rate)
+
+        rates.time = now
+        rates.arrived = arrived
+        rates.popped = popped
+
+    def get_desired(self, image_name, queue_length):
+        """
+        :return: Containers needed to serve the arrivals and drain the queue within the target delay.
+        """
+        rates = self.__rates[image_name]
+        demand = rates.arrival_rate + queue_length / self.__target_delay
+        desired = int(math.ceil(demand / max(rates.service_rate, 1e-9)))
+
+        return max(self.__min_containers, min(self.__max_containers, desired))
+
+    def evaluate(self, now, statistics):
+        """
+        :param statistics: Dict by image name of tuples (queue length, tuples arrived, tuples popped, containers,
+                           containers starting), the arrived and popped counts being totals since the start of the
+                           master.
+        :return: List of tuples (image name, current containers, desired containers) for the images to scale,
+                 current containers including those starting.
+        """
+        ret = []
+        for image_name, (queue_length, arrived, popped, containers, starting) in statistics.items():
+            rates = self.__rates.get(image_name)
+            if rates is None:
+                self.__rates[image_name] = ImageRates(now, arrived, popped, self.__initial_service_rate)
+                continue
+
+            self.__update(rates, now, queue_length, arrived, popped, containers)
+            desired = self.get_desired(image_name, queue_length)
+            current = containers + starting
+
+            if desired > current and queue_length >= self.__min_queue_length and \
+               now - rates.last_scale_out >= self.__scale_out_cooldown:
+                rates.last_scale_out = now
+                ret.append((image_name, current, min(desired, current + self.__max_step)))
+
+            elif not starting and desired * (1 + self.__hysteresis) < current and \
+                 now - max(rates.last_scale_in, rates.last_scale_out) >= self.__scale_in_cooldown:
+                rates.last_scale_in = now
+                ret.append((image_name, current, max(desired, current - self.__max_step)))
+
+        return ret
@@ -10,6 +10,63 @@ class Setting(object):
     __std_idle_time = None
     __token = "None"
     __autoscaling = None
+    __max_in_memory_msg = None
+    __max_in_memory_bytes = None
+    __spill_directory = None
+    __spill_segment_bytes = None
+    __max_spill_bytes = None
+    __priority_aging_interval = None
+    __max_batch_msg = None
+    __max_batch_bytes = None
+    __batch_target_time = None
+    __messaging_server = "threaded"
+    __push_mode = False
+    __push_max_connections = 4
+    __wal_directory = None
+    __wal_fsync_interval = 10
+    __wal_fsync_batch = 256
+    __wal_sync_commit = False
+    __wal_checkpoint_bytes = 256 * 1024 * 1024
+    __dedup_images = []
+    __dedup_window_size = 10000
+    __dedup_window_seconds = 60
+    __compression = {}
+    __tuple_log_capacity = 100000
+    __tuple_log_sample_rate = 1.0
+    __tuple_log_directory = None
+    __tuple_log_file_bytes = 64 * 1024 * 1024
+    __tuple_log_files = 10
+    __container_selection = "round_robin"
+    __container_max_outstanding = 1
+    __container_lease_seconds = 60
+    __worker_heartbeat_interval = 5
+    __phi_suspect_threshold = 8.0
+    __phi_dead_threshold = 20.0
+    __worker_request_timeout = 60
+    __rest_server = "simple"
+    __rest_workers = 32
+    __container_create_timeout = 600
+    __scheduler = "spread"
+    __scheduler_max_load = 0.8
+    __scheduler_container_load = 0.5
+    __scheduler_container_memory = 256 * 1024 * 1024
+    __launch_threads = 16
+    __launches_per_worker = 4
+    __job_queuer_threads = 1
+    __autoscaling_interval = 30
+    __autoscaling_target_delay = 10.0
+    __autoscaling_min_queue_length = 10
+    __autoscaling_max_step = 5
+    __autoscaling_min_containers = 0
+    __autoscaling_max_containers = 50
+    __autoscaling_scale_out_cooldown = 60
+    __autoscaling_scale_in_cooldown = 300
+    __autoscaling_hysteresis = 0.25
+    __autoscaling_initial_service_rate = 1.0
+    __reconcile_interval = 15
+    __replicas = {}
+    __prefetch_workers = 1
+    __prefetch_cooldown = 300
 
     @staticmethod
     def set_node_addr(addr=None):
@@ -63,6 +120,214 @@ class Setting(object):
     def get_autoscaling():
         return Setting.__autoscaling
 
+    @staticmethod
+    def get_max_in_memory_msg():
+        return Setting.__max_in_memory_msg
+
+    @staticmethod
+    def get_max_in_memory_bytes():
+        return Setting.__max_in_memory_bytes
+
+    @staticmethod
+    def get_spill_directory():
+        return Setting.__spill_directory
+
+    @staticmethod
+    def get_spill_segment_bytes():
+        return Setting.__spill_segment_bytes
+
+    @staticmethod
+    def get_max_spill_bytes():
+        return Setting.__max_spill_bytes
+
+    @staticmethod
+    def get_priority_aging_interval():
+        return Setting.__priority_aging_interval
+
+    @staticmethod
+    def get_max_batch_msg():
+        return Setting.__max_batch_msg
+
+    @staticmethod
+    def get_max_batch_bytes():
+        return Setting.__max_batch_bytes
+
+    @staticmethod
+    def get_batch_target_time():
+        return Setting.__batch_target_time
+
+    @staticmethod
+    def get_messaging_server():
+        return Setting.__messaging_server
+
+    @staticmethod
+    def get_push_mode():
+        return Setting.__push_mode
+
+    @staticmethod
+    def get_push_max_connections():
+        return Setting.__push_max_connections
+
+    @staticmethod
+    def get_wal_directory():
+        return Setting.__wal_directory
+
+    @staticmethod
+    def get_wal_fsync_interval():
+        # in seconds
+        return Setting.__wal_fsync_interval / 1000.0
+
+    @staticmethod
+    def get_wal_fsync_batch():
+        return Setting.__wal_fsync_batch
+
+    @staticmethod
+    def get_wal_sync_commit():
+        return Setting.__wal_sync_commit
+
+    @staticmethod
+    def get_wal_checkpoint_bytes():
+        return Setting.__wal_checkpoint_bytes
+
+    @staticmethod
+    def get_dedup_images():
+        return Setting.__dedup_images
+
+    @staticmethod
+    def get_dedup_window_size():
+        return Setting.__dedup_window_size
+
+    @staticmethod
+    def get_dedup_window_seconds():
+        return Setting.__dedup_window_seconds
+
+    @staticmethod
+    def get_compression():
+        return Setting.__compression
+
+    @staticmethod
+    def get_tuple_log_capacity():
+        return Setting.__tuple_log_capacity
+
+    @staticmethod
+    def get_tuple_log_sample_rate():
+        return Setting.__tuple_log_sample_rate
+
+    @staticmethod
+    def get_tuple_log_directory():
+        return Setting.__tuple_log_directory
+
+    @staticmethod
+    def get_tuple_log_file_bytes():
+        return Setting.__tuple_log_file_bytes
+
+    @staticmethod
+    def get_tuple_log_files():
+        return Setting.__tuple_log_files
+
+    @staticmethod
+    def get_container_selection():
+        return Setting.__container_selection
+
+    @staticmethod
+    def get_container_max_outstanding():
+        return Setting.__container_max_outstanding
+
+    @staticmethod
+    def get_container_lease_seconds():
+        return Setting.__container_lease_seconds
+
+    @staticmethod
+    def get_worker_heartbeat_interval():
+        return Setting.__worker_heartbeat_interval
+
+    @staticmethod
+    def get_phi_suspect_threshold():
+        return Setting.__phi_suspect_threshold
+
+    @staticmethod
+    def get_phi_dead_threshold():
+        return Setting.__phi_dead_threshold
+
+    @staticmethod
+    def get_worker_request_timeout():
+        return Setting.__worker_request_timeout
+
+    @staticmethod
+    def get_rest_server():
+        return Setting.__rest_server
+
+    @staticmethod
+    def get_rest_workers():
+        return Setting.__rest_workers
+
+    @staticmethod
+    def get_container_create_timeout():
+        return Setting.__container_create_timeout
+
+    @staticmethod
+    def get_scheduler():
+        return Setting.__scheduler
+
+    @staticmethod
+    def get_scheduler_max_load():
+        return Setting.__scheduler_max_load
+
+    @staticmethod
+    def get_scheduler_container_load():
+        return Setting.__scheduler_container_load
+
+    @staticmethod
+    def get_scheduler_container_memory():
+        return Setting.__scheduler_container_memory
+
+    @staticmethod
+    def get_launch_threads():
+        return Setting.__launch_threads
+
+    @staticmethod
+    def get_launches_per_worker():
+        return Setting.__launches_per_worker
+
+    @staticmethod
+    def get_job_queuer_threads():
+        return Setting.__job_queuer_threads
+
+    @staticmethod
+    def get_autoscaler_setting():
+        """
+        :return: Dict of the keyword arguments of AutoScaler.
+        """
+        return {"interval": Setting.__autoscaling_interval,
+                "target_delay": Setting.__autoscaling_target_delay,
+                "min_queue_length": Setting.__autoscaling_min_queue_length,
+                "max_step": Setting.__autoscaling_max_step,
+                "min_containers": Setting.__autoscaling_min_containers,
+                "max_containers": Setting.__autoscaling_max_containers,
+                "scale_out_cooldown": Setting.__autoscaling_scale_out_cooldown,
+                "scale_in_cooldown": Setting.__autoscaling_scale_in_cooldown,
+                "hysteresis": Setting.__autoscaling_hysteresis,
+                "initial_service_rate": Setting.__autoscaling_initial_service_rate}
+
+    @staticmethod
+    def get_reconcile_interval():
+        return Setting.__reconcile_interval
+
+    @staticmethod
+    def get_replicas():
+        """
+        :return: Dict by image name of dicts with the desired, min and max number of containers.
+        """
+        return Setting.__replicas
+
+    @staticmethod
+    def get_prefetch_workers():
+        return Setting.__prefetch_workers
+
+    @staticmethod
+    def get_prefetch_cooldown():
+        return Setting.__prefetch_cooldown
+
     @staticmethod
     def read_cfg_from_file():
         from harmonicIO.general.services import Services, SysOut
@@ -98,6 +363,96 @@ class Setting(object):
                         elif cfg[Definition.get_str_data_port_range()][0] > \
                              cfg[Definition.get_str_data_port_range()][1]:
                             SysOut.terminate_string("Start port range must greater than stop port range!")
+                        elif not isinstance(cfg.get(Definition.get_str_max_in_memory_msg(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_max_in_memory_bytes(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_spill_segment_bytes(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_max_spill_bytes(), 0), int):
+                            SysOut.terminate_string("Messaging system limits must be integer!")
+                        elif not isinstance(cfg.get(Definition.get_str_spill_directory(), ""), (str, type(None))):
+                            SysOut.terminate_string("Spill directory must be string!")
+                        elif not isinstance(cfg.get(Definition.get_str_priority_aging_interval(), 0), (int, float)):
+                            SysOut.terminate_string("Priority aging interval must be number!")
+                        elif not isinstance(cfg.get(Definition.get_str_max_batch_msg(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_max_batch_bytes(), 0), int):
+                            SysOut.terminate_string("Batch limits must be integer!")
+                        elif not isinstance(cfg.get(Definition.get_str_batch_target_time(), 0), (int, float)):
+                            SysOut.terminate_string("Batch target time must be number!")
+                        elif cfg.get(Definition.get_str_messaging_server(), "threaded") not in ["threaded", "selector"]:
+                            SysOut.terminate_string("Messaging server must be threaded or selector!")
+                        elif not isinstance(cfg.get(Definition.get_str_push_max_connections(), 0), int):
+                            SysOut.terminate_string("Push connections must be integer!")
+                        elif not isinstance(cfg.get(Definition.get_str_wal_directory(), ""), (str, type(None))):
+                            SysOut.terminate_string("Write-ahead log directory must be string!")
+                        elif not isinstance(cfg.get(Definition.get_str_wal_fsync_interval(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_wal_fsync_batch(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_wal_checkpoint_bytes(), 0), int):
+                            SysOut.terminate_string("Write-ahead log settings must be integer!")
+                        elif not isinstance(cfg.get(Definition.get_str_dedup_images(), []), list):
+                            SysOut.terminate_string("Deduplicated images must be list!")
+                        elif not isinstance(cfg.get(Definition.get_str_dedup_window_size(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_dedup_window_seconds(), 0), (int, float)):
+                            SysOut.terminate_string("Deduplication window must be number!")
+                        elif not isinstance(cfg.get(Definition.get_str_compression(), {}), dict):
+                            SysOut.terminate_string("Compression must be dict of image names!")
+                        elif not isinstance(cfg.get(Definition.get_str_tuple_log_capacity(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_tuple_log_file_bytes(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_tuple_log_files(), 0), int):
+                            SysOut.terminate_string("Tuple log limits must be integer!")
+                        elif not isinstance(cfg.get(Definition.get_str_tuple_log_sample_rate(), 0), (int, float)):
+                            SysOut.terminate_string("Tuple log sample rate must be number!")
+                        elif not isinstance(cfg.get(Definition.get_str_tuple_log_directory(), ""), (str, type(None))):
+                            SysOut.terminate_string("Tuple log directory must be string!")
+                        elif cfg.get(Definition.get_str_container_selection(), "round_robin") not in \
+                                ["round_robin", "least_outstanding"]:
+                            SysOut.terminate_string("Container selection must be round_robin or least_outstanding!")
+                        elif not isinstance(cfg.get(Definition.get_str_container_max_outstanding(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_container_lease_seconds(), 0), int):
+                            SysOut.terminate_string("Container lease settings must be integer!")
+                        elif not all(isinstance(cfg.get(key, 0), (int, float)) for key in
+                                     [Definition.get_str_worker_heartbeat_interval(),
+                                      Definition.get_str_phi_suspect_threshold(),
+                                      Definition.get_str_phi_dead_threshold(),
+                                      Definition.get_str_worker_request_timeout(),
+                                      Definition.get_str_container_create_timeout()]):
+                            SysOut.terminate_string("Worker failure detection settings must be number!")
+                        elif cfg.get(Definition.get_str_rest_server(), "simple") not in ["simple", "threaded"]:
+                            SysOut.terminate_string("REST server must be simple or threaded!")
+                        elif not isinstance(cfg.get(Definition.get_str_rest_workers(), 0), int):
+                            SysOut.terminate_string("REST workers must be integer!")
+                        elif cfg.get(Definition.get_str_scheduler(), "spread") not in ["spread", "bin_packing"]:
+                            SysOut.terminate_string("Scheduler must be spread or bin_packing!")
+                        elif not all(isinstance(cfg.get(key, 0), (int, float)) for key in
+                                     [Definition.get_str_scheduler_max_load(),
+                                      Definition.get_str_scheduler_container_load(),
+                                      Definition.get_str_scheduler_container_memory()]):
+                            SysOut.terminate_string("Scheduler settings must be number!")
+                        elif not isinstance(cfg.get(Definition.get_str_launch_threads(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_launches_per_worker(), 0), int):
+                            SysOut.terminate_string("Container launch settings must be integer!")
+                        elif not isinstance(cfg.get(Definition.get_str_job_queuer_threads(), 0), int) or \
+                             not all(isinstance(cfg.get(key, 0), int) for key in
+                                     [Definition.get_str_autoscaling_max_step(),
+                                      Definition.get_str_autoscaling_min_containers(),
+                                      Definition.get_str_autoscaling_max_containers()]):
+                            SysOut.terminate_string("Job queuer threads and autoscaling counts must be integer!")
+                        elif not all(isinstance(cfg.get(key, 0), (int, float)) for key in
+                                     [Definition.get_str_autoscaling_interval(),
+                                      Definition.get_str_autoscaling_target_delay(),
+                                      Definition.get_str_autoscaling_min_queue_length(),
+                                      Definition.get_str_autoscaling_scale_out_cooldown(),
+                                      Definition.get_str_autoscaling_scale_in_cooldown(),
+                                      Definition.get_str_autoscaling_hysteresis(),
+                                      Definition.get_str_autoscaling_initial_service_rate()]):
+                            SysOut.terminate_string("Autoscaling settings must be number!")
+                        elif not isinstance(cfg.get(Definition.get_str_reconcile_interval(), 0), (int, float)):
+                            SysOut.terminate_string("Reconcile interval must be number!")
+                        elif not isinstance(cfg.get(Definition.get_str_replicas(), {}), dict) or \
+                             not all(isinstance(value, dict) and all(isinstance(count, int) for count in value.values())
+                                     for value in cfg.get(Definition.get_str_replicas(), {}).values()):
+                            SysOut.terminate_string("Replicas must be dict of image names to integer counts!")
+                        elif not isinstance(cfg.get(Definition.get_str_prefetch_workers(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_prefetch_cooldown(), 0), (int, float)):
+                            SysOut.terminate_string("Prefetch workers must be integer and cooldown number!")
                         else:
                             Setting.__node_name = cfg[Definition.get_str_node_name()].strip()
                             Setting.__node_port = cfg[Definition.get_str_node_port()]
@@ -105,6 +460,105 @@ class Setting(object):
                             Setting.__node_data_port_stop = cfg[Definition.get_str_data_port_range()][1]
                             Setting.__std_idle_time = cfg[Definition.get_str_idle_time()]
                             Setting.__autoscaling = cfg.get('auto_scaling_enabled')
+                            Setting.__max_in_memory_msg = cfg.get(Definition.get_str_max_in_memory_msg())
+                            Setting.__max_in_memory_bytes = cfg.get(Definition.get_str_max_in_memory_bytes())
+                            Setting.__spill_directory = cfg.get(Definition.get_str_spill_directory())
+                            Setting.__spill_segment_bytes = cfg.get(Definition.get_str_spill_segment_bytes())
+                            Setting.__max_spill_bytes = cfg.get(Definition.get_str_max_spill_bytes())
+                            Setting.__priority_aging_interval = cfg.get(Definition.get_str_priority_aging_interval())
+                            Setting.__max_batch_msg = cfg.get(Definition.get_str_max_batch_msg())
+                            Setting.__max_batch_bytes = cfg.get(Definition.get_str_max_batch_bytes())
+                            Setting.__batch_target_time = cfg.get(Definition.get_str_batch_target_time())
+                            Setting.__messaging_server = cfg.get(Definition.get_str_messaging_server(),
+                                                                 Setting.__messaging_server)
+                            Setting.__push_mode = bool(cfg.get(Definition.get_str_push_mode_enabled()))
+                            Setting.__push_max_connections = cfg.get(Definition.get_str_push_max_connections(),
+                                                                     Setting.__push_max_connections)
+                            Setting.__wal_directory = cfg.get(Definition.get_str_wal_directory())
+                            Setting.__wal_fsync_interval = cfg.get(Definition.get_str_wal_fsync_interval(),
+                                                                   Setting.__wal_fsync_interval)
+                            Setting.__wal_fsync_batch = cfg.get(Definition.get_str_wal_fsync_batch(),
+                                                                Setting.__wal_fsync_batch)
+                            Setting.__wal_sync_commit = bool(cfg.get(Definition.get_str_wal_sync_commit()))
+                            Setting.__wal_checkpoint_bytes = cfg.get(Definition.get_str_wal_checkpoint_bytes(),
+                                                                     Setting.__wal_checkpoint_bytes)
+                            Setting.__dedup_images = cfg.get(Definition.get_str_dedup_images(), Setting.__dedup_images)
+                            Setting.__dedup_window_size = cfg.get(Definition.get_str_dedup_window_size(),
+                                                                  Setting.__dedup_window_size)
+                            Setting.__dedup_window_seconds = cfg.get(Definition.get_str_dedup_window_seconds(),
+                                                                     Setting.__dedup_window_seconds)
+                            Setting.__compression = cfg.get(Definition.get_str_compression(), Setting.__compression)
+                            Setting.__tuple_log_capacity = cfg.get(Definition.get_str_tuple_log_capacity(),
+                                                                   Setting.__tuple_log_capacity)
+                            Setting.__tuple_log_sample_rate = cfg.get(Definition.get_str_tuple_log_sample_rate(),
+                                                                      Setting.__tuple_log_sample_rate)
+                            Setting.__tuple_log_directory = cfg.get(Definition.get_str_tuple_log_directory())
+                            Setting.__tuple_log_file_bytes = cfg.get(Definition.get_str_tuple_log_file_bytes(),
+                                                                     Setting.__tuple_log_file_bytes)
+                            Setting.__tuple_log_files = cfg.get(Definition.get_str_tuple_log_files(),
+                                                                Setting.__tuple_log_files)
+                            Setting.__container_selection = cfg.get(Definition.get_str_container_selection(),
+                                                                    Setting.__container_selection)
+                            Setting.__container_max_outstanding = cfg.get(
+                                Definition.get_str_container_max_outstanding(), Setting.__container_max_outstanding)
+                            Setting.__container_lease_seconds = cfg.get(Definition.get_str_container_lease_seconds(),
+                                                                        Setting.__container_lease_seconds)
+                            Setting.__worker_heartbeat_interval = cfg.get(
+                                Definition.get_str_worker_heartbeat_interval(), Setting.__worker_heartbeat_interval)
+                            Setting.__phi_suspect_threshold = cfg.get(Definition.get_str_phi_suspect_threshold(),
+                                                                      Setting.__phi_suspect_threshold)
+                            Setting.__phi_dead_threshold = cfg.get(Definition.get_str_phi_dead_threshold(),
+                                                                   Setting.__phi_dead_threshold)
+                            Setting.__worker_request_timeout = cfg.get(Definition.get_str_worker_request_timeout(),
+                                                                       Setting.__worker_request_timeout)
+                            Setting.__rest_server = cfg.get(Definition.get_str_rest_server(), Setting.__rest_server)
+                            Setting.__rest_workers = cfg.get(Definition.get_str_rest_workers(), Setting.__rest_workers)
+                            Setting.__container_create_timeout = cfg.get(Definition.get_str_container_create_timeout(),
+                                                                         Setting.__container_create_timeout)
+                            Setting.__scheduler = cfg.get(Definition.get_str_scheduler(), Setting.__scheduler)
+                            Setting.__scheduler_max_load = cfg.get(Definition.get_str_scheduler_max_load(),
+                                                                   Setting.__scheduler_max_load)
+                            Setting.__scheduler_container_load = cfg.get(Definition.get_str_scheduler_container_load(),
+                                                                         Setting.__scheduler_container_load)
+                            Setting.__scheduler_container_memory = cfg.get(
+                                Definition.get_str_scheduler_container_memory(), Setting.__scheduler_container_memory)
+                            Setting.__launch_threads = cfg.get(Definition.get_str_launch_threads(),
+                                                               Setting.__launch_threads)
+                            Setting.__launches_per_worker = cfg.get(Definition.get_str_launches_per_worker(),
+                                                                    Setting.__launches_per_worker)
+                            Setting.__job_queuer_threads = cfg.get(Definition.get_str_job_queuer_threads(),
+                                                                   Setting.__job_queuer_threads)
+                            Setting.__autoscaling_interval = cfg.get(Definition.get_str_autoscaling_interval(),
+                                                                     Setting.__autoscaling_interval)
+                            Setting.__autoscaling_target_delay = cfg.get(Definition.get_str_autoscaling_target_delay(),
+                                                                         Setting.__autoscaling_target_delay)
+                            Setting.__autoscaling_min_queue_length = cfg.get(
+                                Definition.get_str_autoscaling_min_queue_length(),
+                                Setting.__autoscaling_min_queue_length)
+                            Setting.__autoscaling_max_step = cfg.get(Definition.get_str_autoscaling_max_step(),
+                                                                     Setting.__autoscaling_max_step)
+                            Setting.__autoscaling_min_containers = cfg.get(
+                                Definition.get_str_autoscaling_min_containers(), Setting.__autoscaling_min_containers)
+                            Setting.__autoscaling_max_containers = cfg.get(
+                                Definition.get_str_autoscaling_max_containers(), Setting.__autoscaling_max_containers)
+                            Setting.__autoscaling_scale_out_cooldown = cfg.get(
+                                Definition.get_str_autoscaling_scale_out_cooldown(),
+                                Setting.__autoscaling_scale_out_cooldown)
+                            Setting.__autoscaling_scale_in_cooldown = cfg.get(
+                                Definition.get_str_autoscaling_scale_in_cooldown(),
+                                Setting.__autoscaling_scale_in_cooldown)
+                            Setting.__autoscaling_hysteresis = cfg.get(Definition.get_str_autoscaling_hysteresis(),
+                                                                       Setting.__autoscaling_hysteresis)
+                            Setting.__autoscaling_initial_service_rate = cfg.get(
+                                Definition.get_str_autoscaling_initial_service_rate(),
+                                Setting.__autoscaling_initial_service_rate)
+                            Setting.__reconcile_interval = cfg.get(Definition.get_str_reconcile_interval(),
+                                                                   Setting.__reconcile_interval)
+                            Setting.__replicas = cfg.get(Definition.get_str_replicas(), Setting.__replicas)
+                            Setting.__prefetch_workers = cfg.get(Definition.get_str_prefetch_workers(),
+                                                                 Setting.__prefetch_workers)
+                            Setting.__prefetch_cooldown = cfg.get(Definition.get_str_prefetch_cooldown(),
+                                                                  Setting.__prefetch_cooldown)
                             SysOut.out_string("Load setting successful.")
 
                         try:
@@ -0,0 +1,58 @@
+import math
+from collections import deque
+
+
+class PhiAccrualDetector(object):
+    """
+    Phi accrual failure detector for the heartbeats of one node (Hayashibara et al.).
+    Heartbeat intervals are assumed to be normally distributed, with mean and deviation estimated over the
+    last window intervals. phi is the -log10 probability that a heartbeat is still to come after the time
+    elapsed since the last one: phi 1 means a 10% chance of a false suspicion, phi 8 a 1e-8 chance.
+    """
+
+    def __init__(self, expected_interval, window=100, min_std_deviation=None):
+        self.__intervals = deque()
+        self.__window = window
+        self.__sum = 0.0
+        self.__sum_squares = 0.0
+        self.__min_std_deviation = min_std_deviation if min_std_deviation is not None else expected_interval / 5.0
+        self.__last = None
+
+        # Until real intervals are known, assume the expected interval with a quarter of it as deviation.
+        self.__add(expected_interval - expected_interval / 4.0)
+        self.__add(expected_interval + expected_interval / 4.0)
+
+    def __add(self, interval):
+        if len(self.__intervals) >= self.__window:
+            oldest = self.__intervals.popleft()
+            self.__sum -= oldest
+            self.__sum_squares -= oldest * oldest
+
+        self.__intervals.append(interval)
+        self.__sum += interval
+        self.__sum_squares += interval * interval
+
+    def heartbeat(self, now):
+        if self.__last is not None:
+            self.__add(now - self.__last)
+
+        self.__last = now
+
+    def get_last_heartbeat(self):
+        return self.__last
+
+    def phi(self, now):
+        if self.__last is None:
+            return 0.0
+
+        mean = self.__sum / len(self.__intervals)
+        variance = max(0.0, self.__sum_squares / len(self.__intervals) - mean * mean)
+        std_deviation = max(math.sqrt(variance), self.__min_std_deviation)
+
+        # Logistic approximation of the normal cumulative distribution function.
+        y = max(-10.0, (now - self.__last - mean) / std_deviation)
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if now - self.__last > mean:
+            return -math.log10(max(e / (1.0 + e), 1e-300))
+
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
@@ -1,118 +1,304 @@
 import queue
 import json
-from urllib.request import urlopen
+import threading
+import urllib3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .meta_table import LookUpTable
-from harmonicIO.general.definition import Definition, JobStatus
+from harmonicIO.general.definition import Definition, JobStatus, OperationStatus, CStatus
 from harmonicIO.general.services import SysOut
 import time
 from .messaging_system import MessagesQueue
+from .scheduler import SpreadScheduler
+from .autoscaler import AutoScaler
+from .prefetcher import ImagePrefetcher
 
 class JobManager:
     
-    def __init__(self, interval, threshold, increment, queuers):
-        self.__supervisor_interval = interval
-        self.__supervisor_increment = increment
-        self.__supervisor_threshold = threshold
+    def __init__(self, queuers, autoscaler=None, request_timeout=60, create_timeout=600, poll_interval=1,
+                 scheduler=None, launch_threads=16, launches_per_worker=4, prefetch_workers=0, prefetch_cooldown=300):
+        self.__autoscaler = autoscaler if autoscaler is not None else AutoScaler()
+        self.__request_timeout = request_timeout
+        self.__create_timeout = create_timeout
+        self.__poll_interval = poll_interval
+        self.__scheduler = scheduler if scheduler is not None else SpreadScheduler()
         self.queuer_threads = queuers
+
+        # Containers of a job are started in parallel, at most launches_per_worker at a time on one worker,
+        # over connections kept open to the workers.
+        self.__launcher = ThreadPoolExecutor(max_workers=launch_threads)
+        self.__launches_per_worker = launches_per_worker
+        self.__worker_limits = dict()
+        self.__worker_limits_lock = threading.Lock()
+        self.__http = urllib3.PoolManager(maxsize=launches_per_worker, retries=False)
+
+        # Images are pulled ahead of time on prefetch_workers spare workers, none if 0
+        self.__prefetcher = ImagePrefetcher(self, prefetch_workers, prefetch_cooldown) if prefetch_workers else None
     
 
-    def find_available_worker(self, container):
-        candidates = []
-        workers = LookUpTable.Workers.verbose()
+    def find_available_worker(self, container, num=1, excluded=()):
+        """
+        Place num containers of an image on the schedulable workers.
+        :param excluded: End points of workers not to use, such as those that failed to start a container.
+        :return: List of worker end points (addr, port), one per container, shorter than num if the workers
+                 cannot host all of them.
+        """
+        workers = LookUpTable.Workers.get_schedulable_workers() # suspected workers are left out
         SysOut.debug_string("Found workers: " + str(workers))
         if not workers:
-            return None
+            return []
 
-        # loop through workers and make tuples of worker IP, load and if requested container is available locally
-        for worker in workers:
+        return self.__scheduler.place(workers, container, num, excluded)
 
-            curr_worker = workers[worker]
-            if container in curr_worker[Definition.REST.get_str_local_imgs()]:
-                candidates.append(((curr_worker[Definition.get_str_node_addr()], curr_worker[Definition.get_str_node_port()]), curr_worker[Definition.get_str_load5()], True))
-            else:
-                candidates.append(((curr_worker[Definition.get_str_node_addr()], curr_worker[Definition.get_str_node_port()]), curr_worker[Definition.get_str_load5()], False))
+    def create_containers(self, target, image_name, num=1, volatile=False):
+        """
+        Ask a worker to create a batch of containers of an image, it does so in the background.
+        :return: List of the ids of the creation operations on the worker, empty if the worker refused.
+        """
+        worker_url = "http://{}:{}/docker?token=None&command=create&wait=false".format(target[0], target[1])
+        req_data = bytes(json.dumps({Definition.Container.get_str_con_image_name(): image_name,
+                                     Definition.Container.get_str_num(): num,
+                                     'volatile': volatile}), 'utf-8')
+        resp = self.__http.request('POST', worker_url, body=req_data, timeout=self.__request_timeout)
+        if resp.status != 202:
+            return []
+
+        data = json.loads(str(resp.data, 'utf-8'))
+        return data.get(Definition.Docker.get_str_operation_ids(), [data[Definition.Docker.get_str_operation_id()]])
 
-        candidates.sort(key=lambda x: (-x[2], x[1])) # sort candidate workers first on availability of image, then on load (avg load last 5 mins)
-        for candidate in list(candidates):
-            if not float(candidate[1]) < 0.5: 
-                candidates.remove(candidate) # remove candidates with higher than 50% cpu load
-        
-        return candidates
+    def pull_image(self, target, image_name):
+        """
+        Ask a worker to pull an image, it does so in the background.
+        :return: True if the worker accepted the request.
+        """
+        worker_url = "http://{}:{}/docker?token=None&command=pull".format(target[0], target[1])
+        req_data = bytes(json.dumps({Definition.Container.get_str_con_image_name(): image_name}), 'utf-8')
+        try:
+            resp = self.__http.request('POST', worker_url, body=req_data, timeout=self.__request_timeout)
+        except Exception as e:
+            SysOut.warn_string("Cannot pull image on worker {}: {}".format(target, e))
+            return False
+
+        return resp.status == 202
 
     def start_job(self, target, job_data):
-        # send request to worker
-        worker_url = "http://{}:{}/docker?token=None&command=create".format(target[0], target[1])
-        req_data = bytes(json.dumps(job_data), 'utf-8') 
-        resp = urlopen(worker_url, req_data) # NOTE: might need increase in timeout to allow download of large container images!!!
-
-        if resp.getcode() == 200: # container was created
-            sid = str(resp.read(), 'utf-8')
-            SysOut.debug_string("Received sid from container: " + sid)
-            return sid
+        # send request to worker, which creates the container in the background
+        operation_ids = self.create_containers(target, job_data.get(Definition.Container.get_str_con_image_name()),
+                                               1, bool(job_data.get('volatile')))
+        if not operation_ids:
+            return False
+
+        operation_id = operation_ids[0]
+
+        # poll the operation instead of holding the connection open while the worker pulls the image
+        poll_url = "http://{}:{}/docker?token=None&command=operation&operation_id={}".format(target[0], target[1],
+                                                                                            operation_id)
+        deadline = time.time() + self.__create_timeout
+        while time.time() < deadline:
+            time.sleep(self.__poll_interval)
+            resp = self.__http.request('GET', poll_url, timeout=self.__request_timeout)
+            if resp.status != 200:
+                return False
+
+            operation = json.loads(str(resp.data, 'utf-8'))
+            status = operation[Definition.Docker.get_str_status()]
+            if status == OperationStatus.DONE: # container was created
+                sid = operation[Definition.Docker.get_str_result()]
+                SysOut.debug_string("Received sid from container: " + sid)
+                return sid
+            elif status == OperationStatus.FAILED:
+                return False
+
+        SysOut.warn_string("Container creation on worker {} timed out.".format(target))
         return False
 
+    def __get_worker_limit(self, target):
+        with self.__worker_limits_lock:
+            limit = self.__worker_limits.get(target)
+            if limit is None:
+                limit = self.__worker_limits[target] = threading.BoundedSemaphore(self.__launches_per_worker)
+
+            return limit
+
+    def __launch(self, target, job_data):
+        with self.__get_worker_limit(target):
+            SysOut.debug_string("Attempting to send request to worker: " + str(target))
+            return self.start_job(target, job_data)
+
     def job_queuer(self):
         while True:
             job_data = JobQueue.q.get()
             num_of_conts = job_data.get('num')
+            image_name = job_data.get(Definition.Container.get_str_con_image_name())
             job_sids = []
-            targets = self.find_available_worker(job_data.get(Definition.Container.get_str_con_image_name()))
-            SysOut.debug_string("Candidate workers: " + str(targets))
-            n = 0
+            excluded = set()
             while len(job_sids) < num_of_conts:
-                target = targets[n][0]
-                SysOut.debug_string("Attempting to send request to worker: " + str(target))
-                try:
-                    sid = self.start_job(target, job_data)
+                targets = self.find_available_worker(image_name, num_of_conts - len(job_sids), excluded)
+                SysOut.debug_string("Candidate workers: " + str(targets))
+                if not targets:
+                    SysOut.warn_string("No available worker to host " + str(image_name))
+                    break
+
+                # workers that may host the next containers pull the image meanwhile
+                if self.__prefetcher is not None and not job_sids and not excluded:
+                    self.__launcher.submit(self.__prefetcher.prefetch, image_name, set(targets))
+
+                # start all placed containers at once, the failed ones are placed again without their worker
+                launches = {self.__launcher.submit(self.__launch, target, job_data): target for target in targets}
+                for launch in as_completed(launches):
+                    try:
+                        sid = launch.result()
+                    except Exception as e:
+                        SysOut.debug_string("Response from worker threw exception: " + str(e))
+                        sid = False
+
                     if sid:
                         job_sids.append(sid)
-                    else: # not sure how urllib handles a 400 response, but this needs to happen either in case of exception or sid = False
-                        if n < len(targets)-1: # other candidates are available
-                            n+= 1
-                            continue
-                        else:
-                            job_data['job_status'] = JobStatus.FAILED
-                            break
-                    
-                    if len(job_sids) == num_of_conts:
-                        job_data['job_status'] = JobStatus.READY
-                        job_data[Definition.Container.Status.get_str_sid()] = job_sids #TODO: add this in metatable
-
-                except:
-                    SysOut.debug_string("Response from worker threw exception!")
-                    if n < len(targets)-1: # other candidates are available
-                        SysOut.usr_string("We got to other candidates available!!!!!!! -------------------------------------")
-                        n+= 1
-                        continue
                     else:
-                        job_data['job_status'] = JobStatus.FAILED
-                        break # break makes it stop trying to create new containers as soon as one fails, is this desireable? Probaby as now it is unlikely that there is any hosting capability
-            
-            ## NOTE: can get really ugly, need to cleanup containers that started (rollback) OR let user know how many were started instead?? or retry failed ones?
+                        excluded.add(launches[launch])
+
+            job_data[Definition.Container.Status.get_str_sid()] = job_sids #TODO: add this in metatable
+            if job_data.get('volatile'):
+                LookUpTable.Containers.set_volatile(image_name, job_sids)
+
+            if len(job_sids) == num_of_conts:
+                job_data['job_status'] = JobStatus.READY
+                job_data['time_to_ready'] = time.time() - job_data.get('queued_at', time.time())
+                SysOut.out_string("Job {} with {} containers of {} ready in {:.1f} s".format(
+                    job_data.get('job_id'), num_of_conts, image_name, job_data['time_to_ready']))
+            else:
+                ## NOTE: containers that started are left running, the job reports how many did in its sids
+                job_data['job_status'] = JobStatus.FAILED
+
+            JobQueue.set_started(job_data)
             LookUpTable.Jobs.update_job(job_data)
             JobQueue.q.task_done()
 
+    def stop_containers(self, target, short_ids):
+        """
+        Ask a worker to stop some of its containers, it does so in the background.
+        :return: True if the worker accepted the request.
+        """
+        worker_url = "http://{}:{}/docker?token=None&command=remove".format(target[0], target[1])
+        req_data = bytes(json.dumps({Definition.Container.Status.get_str_sid(): short_ids}), 'utf-8')
+        try:
+            resp = self.__http.request('POST', worker_url, body=req_data, timeout=self.__request_timeout)
+        except Exception as e:
+            SysOut.warn_string("Cannot stop containers on worker {}: {}".format(target, e))
+            return False
+
+        return resp.status == 202
+
+    def remove_containers(self, image_name, num):
+        """
+        Scale in an image by num containers, idle ones first. Only volatile containers are removed, those a user
+        started as non volatile are left running. The containers are taken out of the routing table at once, so
+        that no more tuples are routed to them, and their workers are asked to stop them.
+        :return: Number of containers removed from the routing table.
+        """
+        containers = [container for container in LookUpTable.Containers.verbose().get(image_name, [])
+                      if container.get('volatile')]
+        containers.sort(key=lambda container: (
+            container[Definition.REST.Batch.get_str_batch_status()] != CStatus.AVAILABLE,
+            container[Definition.Container.get_str_outstanding()]))
+        workers = LookUpTable.Workers.verbose()
+
+        short_ids = dict()
+        for container in containers:
+            if sum(len(value) for value in short_ids.values()) >= num:
+                break
+
+            worker = workers.get(container[Definition.REST.Batch.get_str_batch_addr()])
+            if worker is None:
+                continue
+
+            short_id = container[Definition.Container.Status.get_str_sid()]
+            LookUpTable.remove_container(image_name, short_id)
+            target = (worker[Definition.get_str_node_addr()], worker[Definition.get_str_node_port()])
+            short_ids.setdefault(target, []).append(short_id)
+
+        for target, target_short_ids in short_ids.items():
+            self.__launcher.submit(self.stop_containers, target, target_short_ids)
+
+        return sum(len(value) for value in short_ids.values())
+
+    def get_scaling_statistics(self):
+        """
+        :return: Dict by image name of tuples (queue length, tuples arrived, tuples popped, containers,
+                 containers starting), as evaluated by the autoscaler.
+        """
+        containers = LookUpTable.Containers.verbose()
+        ret = dict()
+        for image_name, (length, _, popped, arrived) in MessagesQueue.get_queues_counters().items():
+            ret[image_name] = (length, arrived, popped, len(containers.get(image_name, [])),
+                               JobQueue.get_starting(image_name))
+
+        return ret
+
     def queue_supervisor(self):
         """
         Thread that handles autoscaling
         """
         while True:
-            time.sleep(self.__supervisor_interval) ## NOTE: this is probably a very tuneable parameter for later
-            msg_queue = MessagesQueue.verbose()
-            for container in msg_queue:
-                if int(msg_queue[container]) > self.__supervisor_threshold:
+            time.sleep(self.__autoscaler.get_interval())
+            statistics = self.get_scaling_statistics()
+            for image_name, current, desired in self.__autoscaler.evaluate(time.time(), statistics):
+                SysOut.out_string("Scaling {} from {} to {} containers, rates {}".format(
+                    image_name, current, desired, self.__autoscaler.get_rates(image_name)))
+
+                # images with a desired state are scaled by their reconciler
+                if LookUpTable.Replicas.scale(image_name, desired) is not None:
+                    continue
+
+                if desired > current:
                     job_data = {
-                        Definition.Container.get_str_con_image_name() : container,
-                        'num' : self.__supervisor_increment,
+                        Definition.Container.get_str_con_image_name() : image_name,
+                        'num' : desired - current,
                         'volatile' : True
                     }
                     JobQueue.queue_new_job(job_data)
+                else:
+                    self.remove_containers(image_name, current - desired)
+
+
+    def prefetch_supervisor(self):
+        """
+        Thread that prefetches the images whose queue grows, whether autoscaling is enabled or not
+        """
+        if self.__prefetcher is None:
+            return
+
+        while True:
+            time.sleep(self.__autoscaler.get_interval())
+            try:
+                self.__prefetcher.observe(self.get_scaling_statistics())
+            except Exception as e:
+                SysOut.err_string("Prefetching images failed: {}".format(e))
 
-            
 
 class JobQueue:
     q = queue.Queue()
+    # Containers of the queued and running jobs by image name, until the job is done
+    starting = dict()
+    starting_lock = threading.Lock()
 
     @staticmethod
     def queue_new_job(job_data):
-        JobQueue.q.put(job_data)
\ No newline at end of file
+        job_data['queued_at'] = time.time()
+        with JobQueue.starting_lock:
+            image_name = job_data.get(Definition.Container.get_str_con_image_name())
+            JobQueue.starting[image_name] = JobQueue.starting.get(image_name, 0) + job_data.get('num', 0)
+
+        JobQueue.q.put(job_data)
+
+    @staticmethod
+    def set_started(job_data):
+        with JobQueue.starting_lock:
+            image_name = job_data.get(Definition.Container.get_str_con_image_name())
+            JobQueue.starting[image_name] = JobQueue.starting.get(image_name, 0) - job_data.get('num', 0)
+            if JobQueue.starting[image_name] <= 0:
+                del JobQueue.starting[image_name]
+
+    @staticmethod
+    def get_starting(image_name):
+        with JobQueue.starting_lock:
+            return JobQueue.starting.get(image_name, 0)
@@ -1,11 +1,28 @@
-import socket
-from concurrent.futures import ProcessPoolExecutor
+import time
+import hashlib
+import threading
+from collections import deque, OrderedDict
 from harmonicIO.general.services import SysOut
+from harmonicIO.general.compression import Encoding, Compression
+from .segment_log import SegmentLog
+from .state_lock import StateLock
 
 
 class MessagingConfiguration(object):
     __queue_threshold = 4
     __max_in_memory_msg = 500
+    __max_in_memory_bytes = 512 * 1024 * 1024
+    __spill_directory = None
+    __spill_segment_bytes = 64 * 1024 * 1024
+    __max_spill_bytes = 16 * 1024 * 1024 * 1024
+    __priority_aging_interval = 0
+    __max_batch_msg = 256
+    __max_batch_bytes = 16 * 1024 * 1024
+    __batch_target_time = 1.0
+    __dedup_images = []
+    __dedup_window_size = 10000
+    __dedup_window_seconds = 60
+    __compression = dict()
 
     @staticmethod
     def get_queue_threshold():
@@ -15,107 +32,786 @@ class MessagingConfiguration(object):
     def get_max_in_memory_msg():
         return MessagingConfiguration.__max_in_memory_msg
 
+    @staticmethod
+    def get_max_in_memory_bytes():
+        return MessagingConfiguration.__max_in_memory_bytes
+
+    @staticmethod
+    def get_spill_directory():
+        return MessagingConfiguration.__spill_directory
+
+    @staticmethod
+    def get_spill_segment_bytes():
+        return MessagingConfiguration.__spill_segment_bytes
+
+    @staticmethod
+    def get_max_spill_bytes():
+        return MessagingConfiguration.__max_spill_bytes
+
+    @staticmethod
+    def get_priority_aging_interval():
+        return MessagingConfiguration.__priority_aging_interval
+
+    @staticmethod
+    def get_max_batch_msg():
+        return MessagingConfiguration.__max_batch_msg
+
+    @staticmethod
+    def get_max_batch_bytes():
+        return MessagingConfiguration.__max_batch_bytes
+
+    @staticmethod
+    def get_batch_target_time():
+        return MessagingConfiguration.__batch_target_time
+
+    @staticmethod
+    def get_dedup_images():
+        return MessagingConfiguration.__dedup_images
+
+    @staticmethod
+    def get_dedup_window_size():
+        return MessagingConfiguration.__dedup_window_size
+
+    @staticmethod
+    def get_dedup_window_seconds():
+        return MessagingConfiguration.__dedup_window_seconds
+
+    @staticmethod
+    def get_compression(image_name):
+        """
+        :return: Tuple (encoding, threshold, level) for the payloads of the image, or None if they are not
+                 compressed.
+        """
+        ret = MessagingConfiguration.__compression.get(image_name)
+        if ret is None:
+            return MessagingConfiguration.__compression.get("*")
+
+        return ret
+
+    @staticmethod
+    def __load_compression(compression):
+        from harmonicIO.general.definition import Definition
+        for image_name, value in compression.items():
+            try:
+                encoding = Encoding.get_encoding(value[Definition.MessagesQueue.get_str_encoding()])
+                threshold = int(value.get(Definition.MessagesQueue.get_str_threshold(), 0))
+                level = value.get(Definition.MessagesQueue.get_str_level())
+            except (AttributeError, KeyError, ValueError):
+                SysOut.terminate_string("Invalid compression setting for {0}!".format(image_name))
+                continue
+
+            if encoding != Encoding.IDENTITY:
+                MessagingConfiguration.__compression[image_name] = (encoding, threshold, level)
+
+    @staticmethod
+    def load_setting(setting):
+        """
+        Override the queue limits with the values from the master configuration.
+        """
+        if setting.get_max_in_memory_msg():
+            MessagingConfiguration.__max_in_memory_msg = setting.get_max_in_memory_msg()
+
+        if setting.get_max_in_memory_bytes():
+            MessagingConfiguration.__max_in_memory_bytes = setting.get_max_in_memory_bytes()
+
+        if setting.get_spill_directory():
+            MessagingConfiguration.__spill_directory = setting.get_spill_directory()
+
+        if setting.get_spill_segment_bytes():
+            MessagingConfiguration.__spill_segment_bytes = setting.get_spill_segment_bytes()
+
+        if setting.get_max_spill_bytes():
+            MessagingConfiguration.__max_spill_bytes = setting.get_max_spill_bytes()
+
+        if setting.get_priority_aging_interval():
+            MessagingConfiguration.__priority_aging_interval = setting.get_priority_aging_interval()
+
+        if setting.get_max_batch_msg():
+            MessagingConfiguration.__max_batch_msg = setting.get_max_batch_msg()
+
+        if setting.get_max_batch_bytes():
+            MessagingConfiguration.__max_batch_bytes = setting.get_max_batch_bytes()
+
+        if setting.get_batch_target_time():
+            MessagingConfiguration.__batch_target_time = setting.get_batch_target_time()
+
+        if setting.get_dedup_images():
+            MessagingConfiguration.__dedup_images = setting.get_dedup_images()
+
+        if setting.get_dedup_window_size():
+            MessagingConfiguration.__dedup_window_size = setting.get_dedup_window_size()
+
+        if setting.get_dedup_window_seconds():
+            MessagingConfiguration.__dedup_window_seconds = setting.get_dedup_window_seconds()
+
+        if setting.get_compression():
+            MessagingConfiguration.__load_compression(setting.get_compression())
+
+
+class ImageQueue(object):
+    """
+    Bounded priority queue of payloads for a single image.
+    Payloads are kept in one FIFO per priority level, so push and pop are O(1) in the number of queued
+    messages, and the highest priority level is served first. With an aging interval, the priority of a
+    waiting message grows by one per interval so that low priority messages are not starved.
+    The queue keeps track of the number of messages and their total size in bytes, so that new tuples can
+    be refused before the master runs out of memory. When a spill log is given, payloads beyond the
+    in-memory budget are appended to disk instead, in the FIFO of their priority level, and read back as the
+    in-memory budget allows. Spilled levels take part in priority selection, so an urgent spilled payload
+    is not served after less urgent payloads held in memory.
+    All methods are thread safe, the queues of different images do not share a lock.
+    """
+
+    def __init__(self, max_msg, max_bytes, spill=None, aging_interval=0, lock=None):
+        self.__levels = dict()
+        self.__length = 0
+        self.__size_bytes = 0
+        self.__max_msg = max_msg
+        self.__max_bytes = max_bytes
+        self.__spill = spill
+        self.__aging_interval = aging_interval
+        self.__pushed = 0
+        self.__popped = 0
+        self.__arrived = 0
+        self.__lock = lock if lock is not None else threading.Lock()
+
+    def __len__(self):
+        with self.__lock:
+            if self.__spill is not None:
+                return self.__length + len(self.__spill)
+
+            return self.__length
+
+    def get_size_bytes(self):
+        with self.__lock:
+            if self.__spill is not None:
+                return self.__size_bytes + self.__spill.get_size_bytes()
+
+            return self.__size_bytes
+
+    def get_spilled_length(self):
+        with self.__lock:
+            if self.__spill is not None:
+                return len(self.__spill)
+
+            return 0
+
+    def add_arrival(self):
+        """
+        Count a tuple of the image announced to the master, queued or routed to a container directly.
+        """
+        with self.__lock:
+            self.__arrived += 1
+
+    def get_counters(self):
+        """
+        :return: Tuple (length, items pushed, items popped, tuples arrived), the counts being totals since the
+                 queue was created.
+        """
+        with self.__lock:
+            length = self.__length
+            if self.__spill is not None:
+                length += len(self.__spill)
+
+            return length, self.__pushed, self.__popped, self.__arrived
+
+    def __is_memory_available(self, item_size):
+        return self.__length < self.__max_msg and self.__size_bytes + item_size <= self.__max_bytes
+
+    def is_available(self, item_size=0):
+        with self.__lock:
+            if self.__spill is not None:
+                return self.__is_memory_available(item_size) or self.__spill.is_available(item_size)
+
+            return self.__is_memory_available(item_size)
+
+    def __append(self, entry):
+        level = self.__levels.get(entry[2])
+        if level is None:
+            level = self.__levels[entry[2]] = deque()
+
+        level.append(entry)
+        self.__length += 1
+        self.__size_bytes += len(entry[1])
+
+    def __refill(self):
+        # Move spilled messages back to memory, highest priority first and in order within a level, as long as
+        # the next one fits in the in-memory budget.
+        for priority in sorted(self.__spill.get_priorities(), reverse=True):
+            while True:
+                header = self.__spill.peek(priority)
+                if header is None:
+                    break
+
+                if not self.__is_memory_available(header[4]):
+                    return
+
+                self.__append(self.__spill.pop(priority))
+
+    def __get_head_time(self, level):
+        # The in-memory part of a level is older than its spilled part.
+        if level in self.__levels:
+            return self.__levels[level][0][3]
+
+        return self.__spill.peek(level)[3]
+
+    def __select_level(self):
+        """
+        :return: The most urgent priority level, in memory or spilled, or None if the queue is empty.
+        """
+        levels = set(self.__levels)
+        if self.__spill is not None:
+            levels.update(self.__spill.get_priorities())
+
+        if not levels:
+            return None
+
+        if not self.__aging_interval:
+            return max(levels)
+
+        now = time.time()
+        return max(levels, key=lambda level: level + (now - self.__get_head_time(level)) / self.__aging_interval)
+
+    def push(self, item, msg_id=0, priority=0, encoding=Encoding.IDENTITY):
+        """
+        Append an item to the tail of its priority level.
+        :return: False when the queue is full and the item has been rejected.
+        """
+        entry = (msg_id, item, priority, time.time(), encoding)
+        with self.__lock:
+            # Once a priority level has started spilling, its new items go to disk to keep its FIFO order.
+            if self.__spill is not None and \
+               (self.__spill.peek(priority) is not None or not self.__is_memory_available(len(item))):
+                if not self.__spill.push(entry):
+                    return False
+
+                self.__pushed += 1
+                return True
+
+            if not self.__is_memory_available(len(item)):
+                return False
+
+            self.__append(entry)
+            self.__pushed += 1
+
+        return True
+
+    def requeue(self, entry):
+        """
+        Put back an entry taken by pop, at the head of its priority level, keeping its enqueue time for aging.
+        If memory is full, the entry is spilled at the tail of its level instead.
+        :return: False when the queue is full and the entry has been rejected.
+        """
+        with self.__lock:
+            if self.__is_memory_available(len(entry[1])):
+                level = self.__levels.get(entry[2])
+                if level is None:
+                    level = self.__levels[entry[2]] = deque()
+
+                level.appendleft(entry)
+                self.__length += 1
+                self.__size_bytes += len(entry[1])
+            elif self.__spill is None or not self.__spill.push(entry):
+                return False
+
+            # The entry was not served
+            self.__popped -= 1
+
+        return True
+
+    def pop(self):
+        """
+        Remove the head of the most urgent priority level.
+        :return: Tuple (msg_id, item, priority, enqueue_time, encoding) or None if the queue is empty.
+        """
+        entries = self.pop_batch(1)
+        if not entries:
+            return None
+
+        return entries[0]
+
+    def pop_batch(self, max_msg, max_bytes=None):
+        """
+        Remove up to max_msg entries in priority order, stopping before max_bytes would be exceeded.
+        At least one entry is returned if the queue is not empty.
+        :return: List of tuples (msg_id, item, priority, enqueue_time, encoding).
+        """
+        ret = []
+        size_bytes = 0
+        with self.__lock:
+            while len(ret) < max_msg:
+                if self.__spill is not None:
+                    self.__refill()
+
+                priority = self.__select_level()
+                if priority is None:
+                    break
+
+                level = self.__levels.get(priority)
+                if level is None:
+                    # The level is only on disk, its head did not fit in the in-memory budget.
+                    if ret and max_bytes is not None and size_bytes + self.__spill.peek(priority)[4] > max_bytes:
+                        break
+
+                    entry = self.__spill.pop(priority)
+                else:
+                    if ret and max_bytes is not None and size_bytes + len(level[0][1]) > max_bytes:
+                        break
+
+                    entry = level.popleft()
+                    if not level:
+                        del self.__levels[priority]
+
+                    self.__length -= 1
+                    self.__size_bytes -= len(entry[1])
+
+                size_bytes += len(entry[1])
+                ret.append(entry)
+
+            self.__popped += len(ret)
+
+        return ret
+
+
+class BatchSizer(object):
+    """
+    Adaptive batch size per container, from the processing time per message reported by the container.
+    The batch is sized so that processing it takes about the target time.
+    """
+    __max_containers = 4096
+
+    def __init__(self, target_time, max_msg, smoothing=0.3):
+        self.__target_time = target_time
+        self.__max_msg = max_msg
+        self.__smoothing = smoothing
+        self.__proc_times = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def update(self, container_id, proc_time):
+        with self.__lock:
+            previous = self.__proc_times.pop(container_id, None)
+            if previous is not None:
+                proc_time = previous + self.__smoothing * (proc_time - previous)
+
+            self.__proc_times[container_id] = proc_time
+            if len(self.__proc_times) > BatchSizer.__max_containers:
+                self.__proc_times.popitem(last=False)
+
+    def get_batch_size(self, container_id):
+        with self.__lock:
+            proc_time = self.__proc_times.get(container_id)
+
+        if not proc_time:
+            return 1
+
+        return max(1, min(self.__max_msg, int(self.__target_time / proc_time)))
+
+
+class DedupWindow(object):
+    """
+    Digests of the payloads recently received for an image, evicted in order of arrival once the window
+    holds more than max_entries digests or a digest is older than max_age seconds.
+    """
+
+    def __init__(self, max_entries, max_age):
+        self.__max_entries = max_entries
+        self.__max_age = max_age
+        self.__digests = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__tuples_saved = 0
+        self.__bytes_saved = 0
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__digests)
+
+    def __evict(self, now):
+        while self.__digests:
+            digest, arrival = next(iter(self.__digests.items()))
+            if len(self.__digests) <= self.__max_entries and now - arrival <= self.__max_age:
+                break
+
+            self.__digests.popitem(last=False)
+
+    def check(self, digest, size):
+        """
+        Record the digest of a payload.
+        :return: True if the same digest is already in the window.
+        """
+        now = time.time()
+        with self.__lock:
+            self.__evict(now)
+            if digest in self.__digests:
+                self.__tuples_saved += 1
+                self.__bytes_saved += size
+                return True
+
+            self.__digests[digest] = now
+            return False
+
+    def discard(self, digest):
+        """
+        Remove the digest of a payload that was not queued, so that the producer can send it again.
+        """
+        with self.__lock:
+            self.__digests.pop(digest, None)
+
+    def verbose(self):
+        with self.__lock:
+            return {'window': len(self.__digests),
+                    'tuples_saved': self.__tuples_saved,
+                    'bytes_saved': self.__bytes_saved}
+
+
+class PayloadStatistics(object):
+    """
+    Counters of the payload bytes received from producers, served to containers, and copied in user space
+    by the master on the way. Payloads of version 2 frames are received straight into a buffer of the
+    declared size; the remaining copies are joining the chunks of a tuple of the original protocol, whose
+    size is unknown until the producer closes the socket, and building batch responses.
+    """
+    __lock = threading.Lock()
+    __tuples_received = 0
+    __bytes_received = 0
+    __bytes_copied_in = 0
+    __tuples_served = 0
+    __bytes_served = 0
+    __bytes_copied_out = 0
+
+    @staticmethod
+    def add_received(size, copied=0):
+        with PayloadStatistics.__lock:
+            PayloadStatistics.__tuples_received += 1
+            PayloadStatistics.__bytes_received += size
+            PayloadStatistics.__bytes_copied_in += copied
+
+    @staticmethod
+    def add_served(size, copied=0, tuples=1):
+        with PayloadStatistics.__lock:
+            PayloadStatistics.__tuples_served += tuples
+            PayloadStatistics.__bytes_served += size
+            PayloadStatistics.__bytes_copied_out += copied
+
+    @staticmethod
+    def get_bytes(item):
+        """
+        Response body for a payload, WSGI servers only accept bytes objects.
+        """
+        if isinstance(item, bytes):
+            PayloadStatistics.add_served(len(item))
+            return item
+
+        PayloadStatistics.add_served(len(item), len(item))
+        return bytes(item)
+
+    @staticmethod
+    def verbose():
+        with PayloadStatistics.__lock:
+            return {'tuples_received': PayloadStatistics.__tuples_received,
+                    'bytes_received': PayloadStatistics.__bytes_received,
+                    'bytes_copied_in': PayloadStatistics.__bytes_copied_in,
+                    'copied_in_per_tuple': PayloadStatistics.__bytes_copied_in /
+                                           max(1, PayloadStatistics.__tuples_received),
+                    'tuples_served': PayloadStatistics.__tuples_served,
+                    'bytes_served': PayloadStatistics.__bytes_served,
+                    'bytes_copied_out': PayloadStatistics.__bytes_copied_out,
+                    'copied_out_per_tuple': PayloadStatistics.__bytes_copied_out /
+                                            max(1, PayloadStatistics.__tuples_served)}
+
 
 class MessagesQueue(object):
+    """
+    Queues of the master by image name. The dict of queues is only locked to add an image, every queue has
+    its own lock, so tuples of different images are queued and served without contending.
+    """
     __msg_queue = dict()
-    __pool = ProcessPoolExecutor()
+    __lock = StateLock("queues")
+    __wal = None
+    __dispatcher = None
+    __dedup = dict()
+
+    @staticmethod
+    def __get_queue(image_name):
+        queue = MessagesQueue.__msg_queue.get(image_name)
+        if queue is None:
+            with MessagesQueue.__lock:
+                queue = MessagesQueue.__msg_queue.get(image_name)
+                if queue is None:
+                    spill = None
+                    if MessagingConfiguration.get_spill_directory():
+                        spill = SegmentLog(MessagingConfiguration.get_spill_directory(),
+                                           image_name,
+                                           MessagingConfiguration.get_spill_segment_bytes(),
+                                           MessagingConfiguration.get_max_spill_bytes())
+
+                    queue = ImageQueue(MessagingConfiguration.get_max_in_memory_msg(),
+                                       MessagingConfiguration.get_max_in_memory_bytes(),
+                                       spill,
+                                       MessagingConfiguration.get_priority_aging_interval(),
+                                       StateLock("queue/" + image_name))
+                    MessagesQueue.__msg_queue[image_name] = queue
+
+        return queue
 
     @staticmethod
-    def push_to_queue(image_name, item):
-        if not isinstance(item, bytearray):
+    def push_to_queue(image_name, item, priority=0, encoding=None):
+        """
+        Queue a payload for the given image, messages with a higher priority are served first.
+        :param encoding: Encoding of the payload. None for a payload as sent by a producer, which is then
+                         compressed if the image is configured for it.
+        :return: False if the payload was not queued, because the queue of the image is full or because the
+                 write-ahead log could not commit it.
+        """
+        if not isinstance(item, (bytes, bytearray)):
             raise Exception("Invalid implementation! requires byte array but got something else.")
 
-        if image_name in MessagesQueue.__msg_queue:
-            MessagesQueue.__msg_queue[image_name].append(item)
-        else:
-            MessagesQueue.__msg_queue[image_name] = [item]
+        if encoding is None:
+            encoding = Encoding.IDENTITY
+            compression = MessagingConfiguration.get_compression(image_name)
+            if compression:
+                item, encoding = Compression.encode(item, *compression)
+
+        if not MessagesQueue.__wal:
+            if not MessagesQueue.__get_queue(image_name).push(item, priority=priority, encoding=encoding):
+                return False
+
+            MessagesQueue.notify_consumer(image_name)
+            return True
+
+        # Log the arrival before queuing, so that its removal can never precede it in the log. With synchronous
+        # commits, the payload is only queued once its arrival is durable, a payload that failed to commit is
+        # marked as removed in case part of it reached the disk.
+        msg_id, seq = MessagesQueue.__wal.append_push(image_name, item, priority, encoding)
+
+        if not MessagesQueue.__wal.wait_for_commit(seq) or \
+           not MessagesQueue.__get_queue(image_name).push(item, msg_id, priority, encoding):
+            MessagesQueue.__wal.append_pop(msg_id)
+            return False
+
+        MessagesQueue.notify_consumer(image_name)
+        return True
+
+    @staticmethod
+    def __get_dedup_window(image_name):
+        window = MessagesQueue.__dedup.get(image_name)
+        if window is None:
+            images = MessagingConfiguration.get_dedup_images()
+            if image_name not in images and "*" not in images:
+                return None
+
+            with MessagesQueue.__lock:
+                window = MessagesQueue.__dedup.get(image_name)
+                if window is None:
+                    window = DedupWindow(MessagingConfiguration.get_dedup_window_size(),
+                                         MessagingConfiguration.get_dedup_window_seconds())
+                    MessagesQueue.__dedup[image_name] = window
+
+        return window
+
+    @staticmethod
+    def is_duplicate(image_name, item, digest=None):
+        """
+        Check an incoming payload against the deduplication window of its image, if the image has one.
+        Duplicates are to be acknowledged to the producer without being queued.
+        :param digest: MD5 digest of the payload if known, otherwise it is computed.
+        """
+        window = MessagesQueue.__get_dedup_window(image_name)
+        if window is None:
+            return False
+
+        if digest is None:
+            digest = hashlib.md5(item).digest()
 
-        MessagesQueue.__check_for_scale()
+        return window.check(digest, len(item))
+
+    @staticmethod
+    def discard_digest(image_name, item, digest=None):
+        """
+        Forget a payload recorded by is_duplicate that could not be queued, a retry is then not taken for a
+        duplicate.
+        """
+        window = MessagesQueue.__get_dedup_window(image_name)
+        if window is None:
+            return
+
+        if digest is None:
+            digest = hashlib.md5(item).digest()
+
+        window.discard(digest)
+
+    @staticmethod
+    def get_dedup_statistics():
+        ret = dict()
+        for key, value in list(MessagesQueue.__dedup.items()):
+            ret[key] = value.verbose()
+
+        return ret
+
+    @staticmethod
+    def set_push_dispatcher(dispatcher):
+        """
+        Deliver queued messages to idle containers through the given dispatcher, instead of waiting for polls.
+        """
+        MessagesQueue.__dispatcher = dispatcher
+
+    @staticmethod
+    def notify_consumer(image_name):
+        """
+        Signal that a message or an idle container of the image may be waiting, in push mode.
+        """
+        if MessagesQueue.__dispatcher:
+            MessagesQueue.__dispatcher.notify(image_name)
+
+    @staticmethod
+    def enable_write_ahead_log(wal):
+        """
+        Rebuild the queues from the write-ahead log and record every further queue operation in it.
+        """
+        restored = 0
+        for msg_id, image_name, item, priority, encoding in wal.recover():
+            if not MessagesQueue.__get_queue(image_name).push(item, msg_id, priority, encoding):
+                SysOut.warn_string("Cannot restore message {0} of {1}, queue is full.".format(msg_id, image_name))
+                wal.append_pop(msg_id)
+                continue
+
+            restored += 1
+
+        wal.start()
+        MessagesQueue.__wal = wal
+        SysOut.out_string("Restored {0} messages from the write-ahead log.".format(restored))
 
     @staticmethod
     def get_queues_length(image_name):
-        if image_name in MessagesQueue.__msg_queue:
-            return len(MessagesQueue.__msg_queue[image_name])
+        queue = MessagesQueue.__msg_queue.get(image_name)
+        if queue is not None:
+            return len(queue)
 
         return None
 
     @staticmethod
     def get_queues_all():
         ret = {}
-        for key, value in MessagesQueue.__msg_queue.items():
+        for key, value in list(MessagesQueue.__msg_queue.items()):
             ret[key] = len(value)
 
         return ret
 
     @staticmethod
-    def pop_queue(image_name, index=0):
-        if image_name in MessagesQueue.__msg_queue:
-            if len(MessagesQueue.__msg_queue[image_name]) > 0:
-                return MessagesQueue.__msg_queue[image_name].pop(index)
+    def pop_queue(image_name):
+        message = MessagesQueue.pop_message(image_name)
+        if message is None:
+            return None
 
-        return None
+        return Compression.decompress(message[0], message[2])
 
     @staticmethod
-    def is_queue_available(image_name):
-        if image_name in MessagesQueue.__msg_queue:
-            if len(MessagesQueue.__msg_queue[image_name]) < MessagingConfiguration.get_max_in_memory_msg():
-                return True
+    def pop_message(image_name):
+        """
+        Remove the next payload of an image, together with its priority and its encoding.
+        :return: Tuple (item, priority, encoding) or None if the queue is empty.
+        """
+        item = None
+        queue = MessagesQueue.__msg_queue.get(image_name)
+        if queue is not None:
+            item = queue.pop()
+
+        if item is None:
+            return None
+
+        if MessagesQueue.__wal:
+            MessagesQueue.__wal.append_pop(item[0])
 
-        return False
+        return item[1], item[2], item[4]
 
     @staticmethod
-    def __check_for_scale():
-        tmp = "MSGs "
-        for key, value in MessagesQueue.__msg_queue.items():
-            tmp += "({0} -> {1}) ".format(key, len(value))
+    def lease_message(image_name):
+        """
+        Remove the next entry of an image for a delivery that may fail, its removal is not logged yet. The
+        delivery ends with complete_message, or with requeue_message if it failed.
+        :return: Tuple (msg_id, item, priority, enqueue_time, encoding) or None if the queue is empty.
+        """
+        queue = MessagesQueue.__msg_queue.get(image_name)
+        if queue is None:
+            return None
 
-        SysOut.debug_string(tmp)
+        return queue.pop()
 
     @staticmethod
-    def verbose():
-        ret = dict()
-        for key, value in MessagesQueue.__msg_queue.items():
-            ret[key] = len(value)
+    def complete_message(entry):
+        """
+        Log the removal of an entry taken by lease_message.
+        """
+        if MessagesQueue.__wal:
+            MessagesQueue.__wal.append_pop(entry[0])
 
-        return ret
+    @staticmethod
+    def requeue_message(image_name, entry):
+        """
+        Put back an entry taken by lease_message with its message id and enqueue time, its arrival is already
+        in the write-ahead log.
+        :return: False if the queue is full, the removal of the entry is then logged.
+        """
+        if not MessagesQueue.__get_queue(image_name).requeue(entry):
+            MessagesQueue.complete_message(entry)
+            return False
+
+        MessagesQueue.notify_consumer(image_name)
+        return True
 
     @staticmethod
-    async def stream_to_batch(c_addr, c_port, image_name):
-
-        data = MessagesQueue.pop_queue(image_name)
-
-        def __push_stream_end_point(c_addr, c_port, data):
-            # Create a client socket to connect to server
-
-            s = None
-            for res in socket.getaddrinfo(c_addr, c_port, socket.AF_UNSPEC, socket.SOCK_STREAM):
-                af, socktype, proto, canonname, sa = res
-                try:
-                    s = socket.socket(af, socktype, proto)
-                except OSError as msg:
-                    print('error creating client socket')
-                    print(msg)
-                    s = None
-                    continue
-                try:
-                    s.connect(sa)
-                except OSError as msg:
-                    print('error connecting client socket')
-                    print(msg)
-                    s.close()
-                    s = None
-                    continue
-                break
-            if s is None:
-                print('could not open socket')
-                return False
+    def pop_batch(image_name, max_msg, max_bytes=None):
+        """
+        Remove several payloads of an image at once.
+        :return: List of tuples (item, encoding) in priority order, empty if the queue is empty.
+        """
+        queue = MessagesQueue.__msg_queue.get(image_name)
+        if queue is None:
+            return []
+
+        max_msg = min(max_msg, MessagingConfiguration.get_max_batch_msg())
+        if max_bytes is None:
+            max_bytes = MessagingConfiguration.get_max_batch_bytes()
+        else:
+            max_bytes = min(max_bytes, MessagingConfiguration.get_max_batch_bytes())
 
-            with s:
-                s.sendall(data)
-                s.sendall(b'')
-                s.close()
+        entries = queue.pop_batch(max_msg, max_bytes)
+        if MessagesQueue.__wal:
+            for entry in entries:
+                MessagesQueue.__wal.append_pop(entry[0])
 
-            return True
+        return [(entry[1], entry[4]) for entry in entries]
+
+    @staticmethod
+    def is_queue_available(image_name, item_size=0):
+        queue = MessagesQueue.__msg_queue.get(image_name)
+        if queue is not None:
+            return queue.is_available(item_size)
+
+        return True
+
+    @staticmethod
+    def add_arrival(image_name):
+        """
+        Count a tuple announced by a stream connector, including those routed to a container without queuing.
+        """
+        MessagesQueue.__get_queue(image_name).add_arrival()
+
+    @staticmethod
+    def get_queues_counters():
+        """
+        :return: Dict by image name of tuples (length, items pushed, items popped, tuples arrived), for estimating
+                 arrival and service rates from the difference between two calls.
+        """
+        ret = dict()
+        for key, value in list(MessagesQueue.__msg_queue.items()):
+            ret[key] = value.get_counters()
+
+        return ret
 
-        MessagesQueue.__pool.map(__push_stream_end_point(c_addr, c_port, data))
-        # while not __push_stream_end_point(c_target, data): pass
+    @staticmethod
+    def verbose():
+        ret = dict()
+        for key, value in list(MessagesQueue.__msg_queue.items()):
+            ret[key] = len(value)
+
+        return ret
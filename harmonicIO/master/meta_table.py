@@ -1,6 +1,11 @@
+import time
 import queue
+from collections import OrderedDict
 from harmonicIO.general.services import Services, SysOut
-from harmonicIO.general.definition import Definition, CTuple
+from harmonicIO.general.definition import Definition, Key, CTuple, CStatus, WorkerStatus
+from .tuple_log import TupleLog
+from .failure_detector import PhiAccrualDetector
+from .state_lock import StateLock
 
 
 class DataStatStatus(object):
@@ -9,120 +14,413 @@ class DataStatStatus(object):
     RESTREAM = 2
 
 
+class ImageContainers(object):
+    """
+    Containers of one image, indexed by short id.
+    A container can take a tuple while it reported itself available and has less than max_outstanding tuples
+    routed to it. Such containers are kept in round-robin order, in one ring per number of outstanding tuples
+    for least-outstanding selection, so selecting a container does not scan the image. Selection takes a
+    lease on the container instead of removing it; the lease ends when the container reports again.
+    Containers started by the master as volatile are flagged, they may register after the master learns their
+    short id.
+    All methods are thread safe, the containers of different images do not share a lock.
+    """
+
+    def __init__(self, max_outstanding, least_outstanding, lock=None):
+        self.__containers = dict()
+        self.__volatile = set()
+        self.__max_outstanding = max_outstanding
+        self.__rings = [OrderedDict() for _ in range(max_outstanding if least_outstanding else 1)]
+        self.__lock = lock if lock is not None else StateLock("containers")
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__containers)
+
+    def get_containers(self):
+        """
+        :return: List of copies of the container dicts.
+        """
+        with self.__lock:
+            return [dict(container) for container in self.__containers.values()]
+
+    def __get_ring(self, container):
+        outstanding = container[Definition.Container.get_str_outstanding()]
+        if container[Definition.REST.Batch.get_str_batch_status()] != CStatus.AVAILABLE or \
+           outstanding >= self.__max_outstanding:
+            return None
+
+        return self.__rings[min(outstanding, len(self.__rings) - 1)]
+
+    def __unindex(self, container):
+        ring = self.__get_ring(container)
+        if ring is not None:
+            ring.pop(container[Definition.Container.Status.get_str_sid()], None)
+
+    def __index(self, container):
+        ring = self.__get_ring(container)
+        if ring is not None:
+            ring[container[Definition.Container.Status.get_str_sid()]] = None
+
+    def __remove(self, short_id):
+        self.__volatile.discard(short_id)
+        container = self.__containers.pop(short_id, None)
+        if container is not None:
+            self.__unindex(container)
+
+    def update(self, dict_input, now):
+        short_id = dict_input[Definition.Container.Status.get_str_sid()]
+        with self.__lock:
+            container = self.__containers.get(short_id)
+            if container is None:
+                container = self.__containers[short_id] = dict(dict_input)
+                container[Definition.Container.get_str_outstanding()] = 0
+                container['volatile'] = short_id in self.__volatile
+            else:
+                self.__unindex(container)
+                container.update(dict_input)
+
+            # A container that reports itself available has finished the tuples routed to it.
+            if container[Definition.REST.Batch.get_str_batch_status()] == CStatus.AVAILABLE:
+                container[Definition.Container.get_str_outstanding()] = 0
+
+            container[Definition.get_str_last_update()] = now
+            self.__index(container)
+
+    def select(self, expired_before):
+        """
+        :return: Copy of the selected container dict or None.
+        """
+        with self.__lock:
+            for ring in self.__rings:
+                while ring:
+                    short_id, _ = ring.popitem(last=False)
+                    container = self.__containers[short_id]
+                    if container[Definition.get_str_last_update()] < expired_before:
+                        self.__remove(short_id)
+                        continue
+
+                    container[Definition.Container.get_str_outstanding()] += 1
+                    if container[Definition.Container.get_str_outstanding()] >= self.__max_outstanding:
+                        container[Definition.REST.Batch.get_str_batch_status()] = CStatus.BUSY
+
+                    self.__index(container)
+                    return dict(container)
+
+        return None
+
+    def release(self, short_id):
+        with self.__lock:
+            container = self.__containers.get(short_id)
+            if container is None or not container[Definition.Container.get_str_outstanding()]:
+                return
+
+            self.__unindex(container)
+            container[Definition.Container.get_str_outstanding()] -= 1
+            container[Definition.REST.Batch.get_str_batch_status()] = CStatus.AVAILABLE
+            self.__index(container)
+
+    def set_volatile(self, short_ids):
+        with self.__lock:
+            for short_id in short_ids:
+                self.__volatile.add(short_id)
+                container = self.__containers.get(short_id)
+                if container is not None:
+                    container['volatile'] = True
+
+    def remove(self, short_id):
+        with self.__lock:
+            self.__remove(short_id)
+
+    def remove_by_address(self, addr):
+        """
+        :return: Number of containers removed.
+        """
+        with self.__lock:
+            short_ids = [short_id for short_id, container in self.__containers.items()
+                         if container[Definition.REST.Batch.get_str_batch_addr()] == addr]
+            for short_id in short_ids:
+                self.__remove(short_id)
+
+        return len(short_ids)
+
+    def expire(self, expired_before):
+        with self.__lock:
+            for short_id in [short_id for short_id, container in self.__containers.items()
+                             if container[Definition.get_str_last_update()] < expired_before]:
+                self.__remove(short_id)
+
+
 class LookUpTable(object):
 
     class Workers(object):
         __workers = {}
+        __schedulable = {}
+        __detectors = {}
+        __lock = StateLock("workers")
+        __heartbeat_interval = 5
+        __phi_suspect = 8.0
+        __phi_dead = 20.0
+
+        @staticmethod
+        def configure(heartbeat_interval=5, phi_suspect=8.0, phi_dead=20.0):
+            """
+            :param heartbeat_interval: Expected time between two status updates of a worker.
+            :param phi_suspect: Suspicion level from which a worker is no longer offered for scheduling.
+            :param phi_dead: Suspicion level from which a worker is considered dead and removed.
+            """
+            LookUpTable.Workers.__heartbeat_interval = heartbeat_interval
+            LookUpTable.Workers.__phi_suspect = phi_suspect
+            LookUpTable.Workers.__phi_dead = phi_dead
 
         @staticmethod
         def verbose():
-            return LookUpTable.Workers.__workers
+            """
+            :return: Dict of copies of the worker dicts by address.
+            """
+            with LookUpTable.Workers.__lock:
+                return {addr: dict(worker) for addr, worker in LookUpTable.Workers.__workers.items()}
+
+        @staticmethod
+        def get_schedulable_workers():
+            """
+            :return: Dict of copies of the dicts of the workers that are not suspected, by address.
+            """
+            with LookUpTable.Workers.__lock:
+                return {addr: dict(worker) for addr, worker in LookUpTable.Workers.__schedulable.items()}
 
         @staticmethod
         def add_worker(dict_input):
+            addr = dict_input[Definition.get_str_node_addr()]
             dict_input[Definition.get_str_last_update()] = Services.get_current_timestamp()
-            LookUpTable.Workers.__workers[dict_input[Definition.get_str_node_addr()]] = dict_input
+            dict_input[Definition.get_str_worker_status()] = WorkerStatus.ALIVE
+
+            with LookUpTable.Workers.__lock:
+                detector = LookUpTable.Workers.__detectors.get(addr)
+                if detector is None:
+                    detector = PhiAccrualDetector(LookUpTable.Workers.__heartbeat_interval)
+                    LookUpTable.Workers.__detectors[addr] = detector
+
+                detector.heartbeat(time.time())
+                LookUpTable.Workers.__workers[addr] = dict_input
+                LookUpTable.Workers.__schedulable[addr] = dict_input
 
         @staticmethod
         def del_worker(worker_addr):
             # TODO: implement actual worker termination?
-            del LookUpTable.Workers.__workers[worker_addr]
+            with LookUpTable.Workers.__lock:
+                LookUpTable.Workers.__workers.pop(worker_addr, None)
+                LookUpTable.Workers.__schedulable.pop(worker_addr, None)
+                LookUpTable.Workers.__detectors.pop(worker_addr, None)
+
+        @staticmethod
+        def check_liveness(now):
+            """
+            Update the status of every worker from the time since its last heartbeat. Suspected workers are
+            taken out of scheduling until they report again, dead workers are removed.
+            :return: List of the addresses of the workers found dead.
+            """
+            dead = []
+            with LookUpTable.Workers.__lock:
+                for addr, detector in list(LookUpTable.Workers.__detectors.items()):
+                    phi = detector.phi(now)
+                    worker = LookUpTable.Workers.__workers[addr]
+
+                    if phi >= LookUpTable.Workers.__phi_dead:
+                        del LookUpTable.Workers.__workers[addr]
+                        del LookUpTable.Workers.__detectors[addr]
+                        LookUpTable.Workers.__schedulable.pop(addr, None)
+                        dead.append(addr)
+
+                    elif phi >= LookUpTable.Workers.__phi_suspect and \
+                         worker[Definition.get_str_worker_status()] != WorkerStatus.SUSPECT:
+                        worker[Definition.get_str_worker_status()] = WorkerStatus.SUSPECT
+                        LookUpTable.Workers.__schedulable.pop(addr, None)
+                        SysOut.warn_string("Worker {0} is suspected to have failed (phi {1:.1f}).".format(addr, phi))
+
+            return dead
 
     class Containers(object):
+        # The dict of images is only locked to add an image, the containers of each image have their own lock.
         __containers = {}
+        __lock = StateLock("containers")
+        __max_outstanding = 1
+        __least_outstanding = False
+        __lease_seconds = 60
+        __last_sweep = 0
+
+        @staticmethod
+        def configure(selection="round_robin", max_outstanding=1, lease_seconds=60):
+            """
+            :param selection: "round_robin" or "least_outstanding" among the containers that can take a tuple.
+            :param max_outstanding: Tuples routed to a container before it is leased as busy.
+            :param lease_seconds: Time after which a container that has not reported is dropped.
+            """
+            LookUpTable.Containers.__least_outstanding = selection == "least_outstanding"
+            LookUpTable.Containers.__max_outstanding = max(1, max_outstanding)
+            LookUpTable.Containers.__lease_seconds = lease_seconds
 
         @staticmethod
         def get_container_object(req):
             ret = dict()
-            ret[Definition.REST.Batch.get_str_batch_addr()] = req.params[Definition.REST.Batch.get_str_batch_addr()].strip()
-            ret[Definition.REST.Batch.get_str_batch_port()] = int(req.params[Definition.REST.Batch.get_str_batch_port()])
-            ret[Definition.REST.Batch.get_str_batch_status()] = int(req.params[Definition.REST.Batch.get_str_batch_status()])
-            ret[Definition.Container.get_str_con_image_name()] = req.params[Definition.Container.get_str_con_image_name()].strip()
-            ret[Definition.Container.Status.get_str_sid()] = req.params[Definition.Container.Status.get_str_sid()]
+            ret[Key.BATCH_ADDR] = req.params[Key.BATCH_ADDR].strip()
+            ret[Key.BATCH_PORT] = int(req.params[Key.BATCH_PORT])
+            ret[Key.BATCH_STATUS] = int(req.params[Key.BATCH_STATUS])
+            ret[Key.IMAGE_NAME] = req.params[Key.IMAGE_NAME].strip()
+            ret[Key.SID] = req.params[Key.SID]
             
             return ret
 
         @staticmethod
         def verbose():
-            return LookUpTable.Containers.__containers
+            ret = dict()
+            for image_name, containers in list(LookUpTable.Containers.__containers.items()):
+                ret[image_name] = containers.get_containers()
+
+            return ret
 
         @staticmethod
-        def update_container(dict_input):
+        def __get_image(image_name, create=False):
+            containers = LookUpTable.Containers.__containers.get(image_name)
+            if containers is None and create:
+                with LookUpTable.Containers.__lock:
+                    containers = LookUpTable.Containers.__containers.get(image_name)
+                    if containers is None:
+                        containers = ImageContainers(LookUpTable.Containers.__max_outstanding,
+                                                     LookUpTable.Containers.__least_outstanding,
+                                                     StateLock("containers/" + image_name))
+                        LookUpTable.Containers.__containers[image_name] = containers
+
+            return containers
 
-            def cont_in_table(dict_input):
-                conts = LookUpTable.Containers.__containers[dict_input[Definition.Container.get_str_con_image_name()]]
-                for cont in conts:
-                    if dict_input.get(Definition.Container.Status.get_str_sid()) == cont.get(Definition.Container.Status.get_str_sid()):
-                        return cont
-                return None
-            
-            if dict_input[Definition.Container.get_str_con_image_name()] not in LookUpTable.Containers.__containers: # no containers for this image exist
-                new_cont = [dict_input]
-                LookUpTable.Containers.__containers[dict_input[Definition.Container.get_str_con_image_name()]] = new_cont
-            else:
-                cont = cont_in_table(dict_input)
-                if not cont: # this specific container is not already in table
-                    LookUpTable.Containers.__containers[dict_input[Definition.Container.get_str_con_image_name()]].append(dict_input)
-                else: # container was already in table, update timestamp
-                    cont[Definition.get_str_last_update()] = Services.get_current_timestamp()
+        @staticmethod
+        def __sweep(now):
+            # Drop the containers whose lease has expired, at most once per lease period.
+            if now - LookUpTable.Containers.__last_sweep < LookUpTable.Containers.__lease_seconds:
+                return
+
+            LookUpTable.Containers.__last_sweep = now
+            for containers in list(LookUpTable.Containers.__containers.values()):
+                containers.expire(now - LookUpTable.Containers.__lease_seconds)
+
+        @staticmethod
+        def update_container(dict_input):
+            """
+            Register a container or renew its lease with the status it reported.
+            """
+            now = Services.get_current_timestamp()
+            LookUpTable.Containers.__sweep(now)
+            LookUpTable.Containers.__get_image(dict_input[Definition.Container.get_str_con_image_name()],
+                                               True).update(dict_input, now)
 
         @staticmethod
         def get_candidate_container(image_name):
-            if image_name not in LookUpTable.Containers.__containers:
+            """
+            Select a container of the image to route a tuple to, the container stays registered.
+            :return: Copy of the container dict or None if no container can take a tuple.
+            """
+            containers = LookUpTable.Containers.__get_image(image_name)
+            if containers is None:
                 return None
 
-            if len(LookUpTable.Containers.__containers[image_name]) > 0:
-                return LookUpTable.Containers.__containers[image_name].pop()
+            now = Services.get_current_timestamp()
+            return containers.select(now - LookUpTable.Containers.__lease_seconds)
 
-            return None
+        @staticmethod
+        def set_volatile(image_name, short_ids):
+            """
+            Flag containers started by the master as volatile, registered or not yet.
+            """
+            LookUpTable.Containers.__get_image(image_name, True).set_volatile(short_ids)
 
         @staticmethod
-        def del_container(container_name, short_id):
-            conts = LookUpTable.Containers.__containers.get(container_name)
-            if not conts:
-                return False
-            else: 
-                # conts is list of containers with same c_name
-                
-                # List filter code based on: https://stackoverflow.com/questions/1235618/python-remove-dictionary-from-list
-                # Removes item with specified short_id from list
-                conts[:] = [con for con in conts if con.get(Definition.Container.Status.get_str_sid()) != short_id]
-            
-            return True
+        def release_container(dict_input):
+            """
+            Return a tuple lease taken by get_candidate_container that was not used.
+            """
+            containers = LookUpTable.Containers.__get_image(dict_input[Definition.Container.get_str_con_image_name()])
+            if containers is not None:
+                containers.release(dict_input[Definition.Container.Status.get_str_sid()])
 
+        @staticmethod
+        def del_worker_containers(addr):
+            """
+            Remove the containers hosted on a worker from every image.
+            :return: Number of containers removed.
+            """
+            return sum(containers.remove_by_address(addr)
+                       for containers in list(LookUpTable.Containers.__containers.values()))
 
+        @staticmethod
+        def del_container(container_name, short_id):
+            containers = LookUpTable.Containers.__get_image(container_name)
+            if containers is None:
+                return False
 
+            containers.remove(short_id)
+            return True
 
     class Tuples(object):
-        __tuples = {}
+        __tuples = TupleLog()
+        __verbose_limit = 1000
 
         @staticmethod
         def get_tuple_object(req):
             # parameters
             ret = dict()
-            ret[Definition.Container.get_str_data_digest()] = req.params[Definition.Container.get_str_data_digest()].strip()
-            ret[Definition.Container.get_str_con_image_name()] = req.params[Definition.Container.get_str_con_image_name()].strip()
-            ret[Definition.Container.get_str_container_os()] = req.params[Definition.Container.get_str_container_os()].strip()
-            ret[Definition.Container.get_str_data_source()] = req.params[Definition.Container.get_str_data_source()].strip()
-            ret[Definition.Container.get_str_container_priority()] = 0
-            ret[Definition.REST.get_str_status()] = CTuple.SC
-            ret[Definition.get_str_last_update()] = Services.get_current_timestamp()
+            ret[Key.DATA_DIGEST] = req.params[Key.DATA_DIGEST].strip()
+            ret[Key.IMAGE_NAME] = req.params[Key.IMAGE_NAME].strip()
+            ret[Key.CONTAINER_OS] = req.params[Key.CONTAINER_OS].strip()
+            ret[Key.DATA_SOURCE] = req.params[Key.DATA_SOURCE].strip()
+            ret[Key.PRIORITY] = 0
+            ret[Key.STATUS] = CTuple.SC
+            ret[Key.LAST_UPDATE] = Services.get_current_timestamp()
             return ret
 
         @staticmethod
-        def get_tuple_id(tuple_info):
-            return tuple_info[Definition.Container.get_str_data_digest()][0:12] + ":" + str(tuple_info[Definition.get_str_last_update()])
+        def set_tuple_log(tuple_log):
+            LookUpTable.Tuples.__tuples = tuple_log
+
+        @staticmethod
+        def get_tuple_id(digest, seq):
+            return digest[0:12] + ":" + str(seq)
 
         @staticmethod
         def add_tuple_info(tuple_info):
-            LookUpTable.Tuples.__tuples[LookUpTable.Tuples.get_tuple_id(tuple_info)] = tuple_info
+            """
+            Log a tuple announced by a stream connector.
+            :return: Tuple id, made of the digest and a sequence number so that it never collides.
+            """
+            seq = LookUpTable.Tuples.__tuples.add(tuple_info[Definition.Container.get_str_data_source()],
+                                                  tuple_info[Definition.Container.get_str_con_image_name()],
+                                                  tuple_info[Definition.Container.get_str_data_digest()],
+                                                  tuple_info[Definition.Container.get_str_container_priority()],
+                                                  tuple_info[Definition.get_str_last_update()],
+                                                  tuple_info[Definition.REST.get_str_status()])
+
+            return LookUpTable.Tuples.get_tuple_id(tuple_info[Definition.Container.get_str_data_digest()], seq)
 
         @staticmethod
         def verbose():
-            return LookUpTable.Tuples.__tuples
+            """
+            :return: Dict of the newest logged tuples by tuple id.
+            """
+            ret = dict()
+            for seq, source, image_name, digest, priority, timestamp, status in \
+                    LookUpTable.Tuples.__tuples.get_rows(LookUpTable.Tuples.__verbose_limit):
+                ret[LookUpTable.Tuples.get_tuple_id(digest, seq)] = {
+                    Definition.Container.get_str_data_digest(): digest,
+                    Definition.Container.get_str_con_image_name(): image_name,
+                    Definition.Container.get_str_data_source(): source,
+                    Definition.Container.get_str_container_priority(): priority,
+                    Definition.REST.get_str_status(): status,
+                    Definition.get_str_last_update(): timestamp}
+
+            return ret
 
     class Jobs(object):
         __jobs = {}
+        __lock = StateLock("jobs")
 
         # create new job from request dictionary
         @staticmethod
@@ -142,35 +440,124 @@ class LookUpTable(object):
             new_item[Definition.Container.get_str_con_image_name()] = request.get(Definition.Container.get_str_con_image_name())
             new_item['user_token'] = request.get(Definition.get_str_token())
             new_item['volatile'] = request.get('volatile')
-            LookUpTable.Jobs.__jobs[new_id] = new_item
+            with LookUpTable.Jobs.__lock:
+                if new_id in LookUpTable.Jobs.__jobs:
+                    SysOut.warn_string("Job already exists in system, can't create!")
+                    return False
+
+                LookUpTable.Jobs.__jobs[new_id] = new_item
 
             return True
 
         @staticmethod
         def update_job(request):
             job_id = request.get('job_id')
-            if not job_id in LookUpTable.Jobs.__jobs:
-                SysOut.warn_string("Couldn't update job, no existing job matching ID!")
-                return False
+            with LookUpTable.Jobs.__lock:
+                old_job = LookUpTable.Jobs.__jobs.get(job_id)
+                if old_job is None:
+                    SysOut.warn_string("Couldn't update job, no existing job matching ID!")
+                    return False
 
-            tkn = request.get(Definition.get_str_token())
-            if not tkn == LookUpTable.Jobs.__jobs[job_id]['user_token']:
-                SysOut.warn_string("Incorrect token, refusing update.")
-                return False
+                tkn = request.get(Definition.get_str_token())
+                if not tkn == old_job['user_token']:
+                    SysOut.warn_string("Incorrect token, refusing update.")
+                    return False
 
-            old_job = LookUpTable.Jobs.__jobs[job_id]
-            old_job['job_status'] = request.get('job_status')
+                old_job['job_status'] = request.get('job_status')
+                if 'time_to_ready' in request:
+                    old_job['time_to_ready'] = request['time_to_ready']
 
             return True
 
+        @staticmethod
+        def get_job(job_id):
+            """
+            :return: Copy of the job dict or None.
+            """
+            with LookUpTable.Jobs.__lock:
+                job = LookUpTable.Jobs.__jobs.get(job_id)
+                return dict(job) if job is not None else None
+
+        @staticmethod
+        def verbose():
+            """
+            :return: Dict of copies of the job dicts by job id.
+            """
+            with LookUpTable.Jobs.__lock:
+                return {job_id: dict(job) for job_id, job in LookUpTable.Jobs.__jobs.items()}
+
+    class Replicas(object):
+        """
+        Desired number of containers by image, between a minimum and a maximum, which the reconciler converges to.
+        """
+        __replicas = {}
+        __lock = StateLock("replicas")
+
+        @staticmethod
+        def set_replicas(image_name, desired, min_replicas=0, max_replicas=None):
+            """
+            Manage the containers of an image, or change its bounds.
+            :param max_replicas: Upper bound, by default the larger of desired and min_replicas.
+            :return: Desired count, within the bounds.
+            """
+            if max_replicas is None:
+                max_replicas = max(desired, min_replicas)
+
+            desired = max(min_replicas, min(max_replicas, desired))
+            replicas = {Definition.Container.get_str_desired(): desired,
+                        Definition.Container.get_str_min_replicas(): min_replicas,
+                        Definition.Container.get_str_max_replicas(): max_replicas}
+            with LookUpTable.Replicas.__lock:
+                LookUpTable.Replicas.__replicas[image_name] = replicas
+
+            return desired
+
+        @staticmethod
+        def scale(image_name, desired):
+            """
+            Change the desired count of a managed image, within its bounds.
+            :return: Desired count, or None if the image is not managed.
+            """
+            with LookUpTable.Replicas.__lock:
+                replicas = LookUpTable.Replicas.__replicas.get(image_name)
+                if replicas is None:
+                    return None
+
+                desired = max(replicas[Definition.Container.get_str_min_replicas()],
+                              min(replicas[Definition.Container.get_str_max_replicas()], desired))
+                replicas[Definition.Container.get_str_desired()] = desired
+
+            return desired
+
+        @staticmethod
+        def del_replicas(image_name):
+            """
+            Stop managing the containers of an image, they are left running.
+            """
+            with LookUpTable.Replicas.__lock:
+                return LookUpTable.Replicas.__replicas.pop(image_name, None) is not None
+
         @staticmethod
         def verbose():
-            return LookUpTable.Jobs.__jobs
+            """
+            :return: Dict of copies of the desired states by image name.
+            """
+            with LookUpTable.Replicas.__lock:
+                return {image_name: dict(replicas) for image_name, replicas in LookUpTable.Replicas.__replicas.items()}
 
     @staticmethod
     def update_worker(dict_input):
         LookUpTable.Workers.add_worker(dict_input)
 
+    @staticmethod
+    def check_workers(now):
+        """
+        Remove the workers found dead by the failure detector, together with their containers.
+        """
+        for addr in LookUpTable.Workers.check_liveness(now):
+            removed = LookUpTable.Containers.del_worker_containers(addr)
+            SysOut.warn_string("Worker {0} is dead, removed it and its {1} containers.".format(addr, removed))
+
     @staticmethod
     def get_candidate_container(image_name):
         return LookUpTable.Containers.get_candidate_container(image_name)
@@ -185,7 +572,7 @@ class LookUpTable(object):
 
     @staticmethod
     def poll_id(id):
-        return id in LookUpTable.Jobs.verbose()
+        return LookUpTable.Jobs.get_job(id) is not None
 
     @staticmethod
     def remove_container(c_name, csid):
@@ -198,5 +585,6 @@ class LookUpTable(object):
         ret['CONTAINERS'] = LookUpTable.Containers.verbose()
         ret['TUPLES'] = LookUpTable.Tuples.verbose()
         ret['JOBS'] = LookUpTable.Jobs.verbose()
+        ret['REPLICAS'] = LookUpTable.Replicas.verbose()
 
         return ret
@@ -0,0 +1,102 @@
+import time
+import threading
+from harmonicIO.general.definition import Definition, OperationStatus
+from harmonicIO.general.services import SysOut
+from .meta_table import LookUpTable
+
+
+class ImagePrefetcher(object):
+    """
+    Pulls images ahead of time on workers that are likely to host their next containers, so that a scale out
+    finds the image local instead of waiting for the pull. When a job of an image is started or its queue grows,
+    it keeps spare_workers workers that have the image, or are pulling it, without running a container of it.
+    Spare workers are picked the way the scheduler would place the next containers. Workers report the progress
+    of their pulls in their status; a worker asked to pull an image is not asked again before the cooldown.
+    """
+
+    def __init__(self, manager, spare_workers=1, cooldown=300):
+        """
+        :param manager: JobManager placing containers and sending the pull requests.
+        :param spare_workers: Number of workers without a container of an image that should have it.
+        :param cooldown: Seconds before asking a worker to pull the same image again.
+        """
+        self.__manager = manager
+        self.__spare_workers = spare_workers
+        self.__cooldown = cooldown
+        self.__requested = dict()
+        self.__lengths = dict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def has_image(worker, image_name):
+        """
+        :return: True if the worker reported the image as local or being pulled.
+        """
+        if image_name in worker.get(Definition.REST.get_str_local_imgs(), []):
+            return True
+
+        pull = (worker.get(Definition.Docker.get_str_image_pulls()) or {}).get(image_name)
+        return pull is not None and pull.get("status") in [OperationStatus.PENDING, OperationStatus.RUNNING]
+
+    def __select_workers(self, image_name, excluded, now):
+        workers = LookUpTable.Workers.get_schedulable_workers()
+        hosting = set(container[Definition.REST.Batch.get_str_batch_addr()]
+                      for container in LookUpTable.Containers.verbose().get(image_name, []))
+
+        excluded = set(excluded)
+        spare = 0
+        for addr, worker in workers.items():
+            end_point = (worker[Definition.get_str_node_addr()], worker[Definition.get_str_node_port()])
+            if self.has_image(worker, image_name) or \
+               now - self.__requested.get((addr, image_name), -self.__cooldown) < self.__cooldown:
+                if addr not in hosting and end_point not in excluded:
+                    spare += 1
+
+                excluded.add(end_point)
+
+        # one worker at a time, the scheduler may place several containers on the same worker
+        ret = []
+        while len(ret) < self.__spare_workers - spare:
+            targets = self.__manager.find_available_worker(image_name, 1, excluded)
+            if not targets:
+                break
+
+            excluded.add(targets[0])
+            ret.append(targets[0])
+
+        return ret
+
+    def prefetch(self, image_name, excluded=()):
+        """
+        Ask workers to pull the image until it has enough spare workers.
+        :param excluded: End points of workers not to count as spare, such as those a job is being started on.
+        :return: Number of workers asked to pull the image.
+        """
+        now = time.time()
+        with self.__lock:
+            targets = self.__select_workers(image_name, excluded, now)
+            for target in targets:
+                self.__requested[(target[0], image_name)] = now
+
+        requested = 0
+        for target in targets:
+            if self.__manager.pull_image(target, image_name):
+                requested += 1
+                SysOut.out_string("Prefetching image {} on worker {}".format(image_name, target))
+            else:
+                with self.__lock:
+                    self.__requested.pop((target[0], image_name), None)
+
+        return requested
+
+    def observe(self, statistics):
+        """
+        Prefetch the images whose queue grew since the last call.
+        :param statistics: Dict by image name of tuples starting with the queue length, as given to the autoscaler.
+        """
+        for image_name, counters in statistics.items():
+            length = counters[0]
+            grew = length > self.__lengths.get(image_name, 0)
+            self.__lengths[image_name] = length
+            if grew:
+                self.prefetch(image_name)
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+from harmonicIO.general.services import SysOut
+from harmonicIO.general.definition import Definition
+from harmonicIO.general.compression import Encoding, Compression
+from .messaging_system import MessagesQueue, PayloadStatistics
+from .meta_table import LookUpTable
+
+
+class PushDispatcher(object):
+    """
+    Push mode of the messaging system: streams queued tuples to idle containers as soon as both are
+    available, instead of waiting for the next poll of the container.
+    All deliveries run on a single asyncio loop in a dedicated thread. The data port of a container reads
+    one tuple per connection, until the connection is closed, so connections cannot be kept open between
+    tuples; instead the number of concurrent connections per container end-point is bounded.
+    A tuple is leased from its queue while it is pushed, its removal is logged once delivered, and it is put
+    back unchanged if the push fails.
+    """
+
+    def __init__(self, max_connections=4, timeout=5):
+        self.__max_connections = max_connections
+        self.__timeout = timeout
+        self.__loop = asyncio.new_event_loop()
+        self.__limits = dict()
+        self.__pending = set()
+        self.__lock = threading.Lock()
+
+    def start(self):
+        loop_thread = threading.Thread(target=self.__run)
+        loop_thread.daemon = True
+        loop_thread.start()
+
+        SysOut.out_string("Push dispatcher started")
+
+    def __run(self):
+        asyncio.set_event_loop(self.__loop)
+        self.__loop.run_forever()
+
+    def notify(self, image_name):
+        """
+        Schedule a dispatch round for an image, thread-safe. Rounds are coalesced per image.
+        """
+        with self.__lock:
+            if image_name in self.__pending:
+                return
+            self.__pending.add(image_name)
+
+        self.__loop.call_soon_threadsafe(self.__schedule, image_name)
+
+    def __schedule(self, image_name):
+        asyncio.ensure_future(self.__dispatch(image_name), loop=self.__loop)
+
+    def __get_limit(self, end_point):
+        """
+        :return: List [semaphore, number of pushes using it] of the end point.
+        """
+        limit = self.__limits.get(end_point)
+        if limit is None:
+            limit = self.__limits[end_point] = [asyncio.Semaphore(self.__max_connections), 0]
+
+        limit[1] += 1
+        return limit
+
+    def __put_limit(self, end_point, limit):
+        # A semaphore nobody uses is at its initial value, dropping it keeps removed containers from piling up.
+        limit[1] -= 1
+        if not limit[1]:
+            del self.__limits[end_point]
+
+    async def __dispatch(self, image_name):
+        with self.__lock:
+            self.__pending.discard(image_name)
+
+        # Pair queued tuples with registered containers until either runs out.
+        while MessagesQueue.get_queues_length(image_name):
+            container = LookUpTable.get_candidate_container(image_name)
+            if not container:
+                return
+
+            entry = MessagesQueue.lease_message(image_name)
+            if entry is None:
+                LookUpTable.Containers.release_container(container)
+                return
+
+            asyncio.ensure_future(self.__send(image_name, container, entry), loop=self.__loop)
+
+    async def __send(self, image_name, container, entry):
+        """
+        :param entry: Queue entry (msg_id, item, priority, enqueue_time, encoding) leased for the push.
+        """
+        addr = container[Definition.REST.Batch.get_str_batch_addr()]
+        port = container[Definition.REST.Batch.get_str_batch_port()]
+        item, encoding = entry[1], entry[4]
+
+        delivered = False
+        limit = self.__get_limit((addr, port))
+        async with limit[0]:
+            try:
+                # Containers receive the payload as sent by the producer, the push connection has no header.
+                payload = item
+                if encoding != Encoding.IDENTITY:
+                    payload = await self.__loop.run_in_executor(None, Compression.decompress, item, encoding)
+
+                _, writer = await asyncio.wait_for(asyncio.open_connection(addr, port), self.__timeout)
+                writer.write(payload)
+                await asyncio.wait_for(writer.drain(), self.__timeout)
+                delivered = True
+                writer.close()
+                MessagesQueue.complete_message(entry)
+                PayloadStatistics.add_served(len(payload))
+
+            except (OSError, asyncio.TimeoutError) as e:
+                SysOut.warn_string("Cannot push tuple to {0}:{1}, requeue it ({2}).".format(addr, port, e))
+
+            except Exception as e:
+                SysOut.err_string("Cannot push tuple to {0}:{1}, requeue it ({2}).".format(addr, port, e))
+
+            finally:
+                if not delivered:
+                    # Whatever went wrong, the lease ends with the container taken out of routing until it
+                    # registers again, and the tuple goes back to the queue, so that a tuple that cannot be
+                    # delivered is not pushed to the same container over and over.
+                    LookUpTable.remove_container(image_name, container[Definition.Container.Status.get_str_sid()])
+                    if not MessagesQueue.requeue_message(image_name, entry):
+                        SysOut.err_string("Queue for {0} is full, tuple is lost.".format(image_name))
+
+                self.__put_limit((addr, port), limit)
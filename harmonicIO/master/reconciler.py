@@ -0,0 +1,142 @@
+import time
+from collections import Counter
+from harmonicIO.general.definition import Definition, CStatus
+from harmonicIO.general.services import SysOut
+from .meta_table import LookUpTable
+
+
+class Reconciler(object):
+    """
+    Keeps the containers of every image in LookUpTable.Replicas at their desired count.
+    Every round compares the desired count with the containers the workers reported in their last status, running
+    or still being created, and converges with at most one batched create and one batched remove request per
+    worker. Containers that crash or exit are thus replaced on the next round. After acting on an image, it is left
+    alone until every worker it acted on has reported again, so that the same difference is not acted on twice.
+    """
+    # Docker statuses of the containers that count as live, containers created but not started such as those of a
+    # warm pool do not count
+    live_statuses = ["running", "restarting"]
+
+    def __init__(self, manager, interval=15):
+        """
+        :param manager: JobManager placing, creating and stopping the containers.
+        :param interval: Seconds between two rounds.
+        """
+        self.__manager = manager
+        self.__interval = interval
+        self.__actions = dict()
+
+    @staticmethod
+    def get_live_containers(workers):
+        """
+        :param workers: Dict of worker dicts by address, as reported in their status.
+        :return: Dict by image name of lists of tuples (worker address, short id) of the live containers.
+        """
+        ret = dict()
+        for addr, worker in workers.items():
+            for container in worker.get(Definition.REST.get_str_docker()) or []:
+                image_name = container.get(Definition.Container.get_str_con_image_name())
+                if image_name and container.get(Definition.Container.Status.get_str_status()) in \
+                        Reconciler.live_statuses:
+                    ret.setdefault(image_name, []).append((addr, container[Definition.Container.Status.get_str_sid()]))
+
+        return ret
+
+    @staticmethod
+    def get_creating_containers(workers):
+        """
+        :return: Counter of the containers being created on the workers by image name.
+        """
+        ret = Counter()
+        for worker in workers.values():
+            ret.update(worker.get(Definition.Docker.get_str_creating()) or {})
+
+        return ret
+
+    def __is_settled(self, image_name, workers):
+        actions = self.__actions.get(image_name)
+        if not actions:
+            return True
+
+        for addr, requested in actions.items():
+            worker = workers.get(addr)
+            if worker is not None and worker[Definition.get_str_last_update()] <= requested:
+                return False
+
+        del self.__actions[image_name]
+        return True
+
+    def __create(self, image_name, num, now):
+        targets = Counter(self.__manager.find_available_worker(image_name, num))
+        if sum(targets.values()) < num:
+            SysOut.warn_string("Workers can only host {} of the {} missing containers of {}".format(
+                sum(targets.values()), num, image_name))
+
+        for target, target_num in targets.items():
+            try:
+                created = len(self.__manager.create_containers(target, image_name, target_num))
+            except Exception as e:
+                SysOut.warn_string("Cannot create containers on worker {}: {}".format(target, e))
+                continue
+
+            if created:
+                self.__actions.setdefault(image_name, dict())[target[0]] = now
+
+    def __remove(self, image_name, containers, num, workers, now):
+        # Containers that are idle go first, then those not registered yet, then the busy ones.
+        statuses = {container[Definition.Container.Status.get_str_sid()]:
+                    container[Definition.REST.Batch.get_str_batch_status()]
+                    for container in LookUpTable.Containers.verbose().get(image_name, [])}
+
+        def get_order(container):
+            status = statuses.get(container[1])
+            if status is None:
+                return 1
+
+            return 0 if status == CStatus.AVAILABLE else 2
+
+        short_ids = dict()
+        for addr, short_id in sorted(containers, key=get_order)[:num]:
+            LookUpTable.remove_container(image_name, short_id)
+            short_ids.setdefault(addr, []).append(short_id)
+
+        for addr, addr_short_ids in short_ids.items():
+            worker = workers[addr]
+            target = (worker[Definition.get_str_node_addr()], worker[Definition.get_str_node_port()])
+            if self.__manager.stop_containers(target, addr_short_ids):
+                self.__actions.setdefault(image_name, dict())[addr] = now
+
+    def reconcile(self, now):
+        """
+        Run one round over the managed images.
+        """
+        workers = LookUpTable.Workers.verbose()
+        live = self.get_live_containers(workers)
+        creating = self.get_creating_containers(workers)
+
+        for image_name, replicas in LookUpTable.Replicas.verbose().items():
+            if not self.__is_settled(image_name, workers):
+                continue
+
+            desired = replicas[Definition.Container.get_str_desired()]
+            containers = live.get(image_name, [])
+            current = len(containers) + creating[image_name]
+
+            if current < desired:
+                SysOut.out_string("Reconciling {}: {} containers, creating {}".format(image_name, current,
+                                                                                     desired - current))
+                self.__create(image_name, desired - current, now)
+
+            # Containers being created are not removed, the surplus is removed once they are live.
+            elif len(containers) > desired and not creating[image_name]:
+                SysOut.out_string("Reconciling {}: {} containers, removing {}".format(image_name, current,
+                                                                                     current - desired))
+                self.__remove(image_name, containers, current - desired, workers, now)
+
+    def run(self):
+        while True:
+            time.sleep(self.__interval)
+            try:
+                self.reconcile(time.time())
+            except Exception as e:
+                SysOut.err_string("Reconciliation failed: {}".format(e))
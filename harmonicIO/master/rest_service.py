@@ -1,9 +1,12 @@
 import falcon
 from .configuration import Setting
-from harmonicIO.general.definition import Definition, CStatus, CRole, JobStatus
-from .messaging_system import MessagesQueue
+from harmonicIO.general.definition import Definition, Key, CStatus, CRole, JobStatus, to_json
+from .messaging_system import MessagesQueue, MessagingConfiguration, BatchSizer, PayloadStatistics
+from harmonicIO.general.wire_protocol import BatchFrame
+from harmonicIO.general.compression import Encoding, Compression
 from harmonicIO.general.services import SysOut, Services as LService
 from .meta_table import LookUpTable
+from .state_lock import StateLock
 
 from urllib.request import urlopen
 from urllib3.request import urlencode
@@ -17,6 +20,12 @@ def format_response_string(res, http_code, msg):
     res.content_type = "String"
     return res
 
+def format_response_json(res, http_code, data):
+    res.body = to_json(data)
+    res.status = http_code
+    res.content_type = "application/json"
+    return res
+
 class RequestStatus(object):
 
     def __init__(self):
@@ -32,7 +41,7 @@ class RequestStatus(object):
 
         if req.params[Definition.get_str_token()] == Setting.get_token():
             result = LService.get_machine_status(Setting, CRole.MASTER)
-            format_response_string(res, falcon.HTTP_200, str(result))
+            format_response_json(res, falcon.HTTP_200, result)
             
         else:
             format_response_string(res, falcon.HTTP_401,"Invalid token ID")
@@ -80,7 +89,93 @@ class RequestStatus(object):
 
 class MessageStreaming(object):
     def __init__(self):
-        pass
+        self.__batch_sizer = BatchSizer(MessagingConfiguration.get_batch_target_time(),
+                                        MessagingConfiguration.get_max_batch_msg())
+
+    @staticmethod
+    def __get_accepted_encodings(req):
+        """
+        Encodings the container can decode, from accept_encoding=zlib,lzma.
+        :return: Set of encodings, None for a container that did not negotiate.
+        """
+        value = req.params.get(Definition.MessagesQueue.get_str_accept_encoding())
+        if value is None:
+            return None
+
+        if isinstance(value, list):
+            value = ",".join(value)
+
+        ret = set()
+        for name in value.split(","):
+            try:
+                ret.add(Encoding.get_encoding(name))
+            except ValueError:
+                pass
+
+        return ret
+
+    @staticmethod
+    def __decode_for(item, encoding, accepted):
+        """
+        Decompress a queued payload unless the container accepts its encoding.
+        :return: Tuple (payload, encoding)
+        """
+        if encoding == Encoding.IDENTITY or (accepted and encoding in accepted):
+            return item, encoding
+
+        return Compression.decompress(item, encoding), Encoding.IDENTITY
+
+    def __get_batch_parameters(self, req, ret):
+        """
+        POST: /streamRequest?token=None&...&batch_size={n}&batch_bytes={m}&adaptive=1&proc_time={seconds}
+        In adaptive mode the batch size is derived from the processing time per message reported by the container.
+        :return: Tuple (batch size, batch bytes) or None if the parameters are invalid.
+        """
+        batch_size = req.params.get(Key.BATCH_SIZE, "1")
+        batch_bytes = req.params.get(Definition.MessagesQueue.get_str_batch_bytes())
+        proc_time = req.params.get(Definition.MessagesQueue.get_str_proc_time())
+
+        try:
+            batch_size = int(batch_size)
+            if batch_bytes is not None:
+                batch_bytes = int(batch_bytes)
+            if proc_time is not None:
+                proc_time = float(proc_time)
+        except ValueError:
+            return None
+
+        if Key.BATCH_ADAPTIVE in req.params:
+            container_id = ret[Key.SID]
+            if proc_time:
+                self.__batch_sizer.update(container_id, proc_time)
+            batch_size = self.__batch_sizer.get_batch_size(container_id)
+
+        return max(1, batch_size), batch_bytes
+
+    def __stream_batch(self, req, res, ret, batch_size, batch_bytes):
+        """
+        Respond with up to batch_size messages or batch_bytes bytes in one response, framed by BatchFrame.
+        """
+        popped = MessagesQueue.pop_batch(ret[Key.IMAGE_NAME], batch_size, batch_bytes)
+        if not popped:
+            # The push dispatcher or another request drained the queue since its length was read
+            ret[Key.BATCH_STATUS] = CStatus.AVAILABLE
+            self.__respond_no_item(res, ret)
+            return
+
+        accepted = self.__get_accepted_encodings(req)
+        entries = [self.__decode_for(item, encoding, accepted) for item, encoding in popped]
+        items = [entry[0] for entry in entries]
+
+        if accepted is not None:
+            res.set_header(Key.ENCODING_HEADER,
+                           ",".join(Encoding.get_name(entry[1]) for entry in entries))
+
+        res.data = BatchFrame.pack(items)
+        PayloadStatistics.add_served(len(res.data), len(res.data), len(items))
+        res.set_header(Definition.MessagesQueue.get_str_batch_count_header(), str(len(items)))
+        res.content_type = "Bytes-Batch"
+        res.status = falcon.HTTP_203
 
     def on_get(self, req, res):
         """
@@ -89,26 +184,26 @@ class MessageStreaming(object):
         This function is mainly respond with the available channel for streaming from data source.
         """
 
-        if not Definition.get_str_token() in req.params:
+        if not Key.TOKEN in req.params:
             res.body = "Token is required."
             res.content_type = "String"
             res.status = falcon.HTTP_401
             return
 
         # Check for required parameter.
-        if not Definition.Container.get_str_con_image_name() in req.params:
+        if not Key.IMAGE_NAME in req.params:
             res.body = "Container name is required."
             res.content_type = "String"
             res.status = falcon.HTTP_401
             return
 
-        if not Definition.Container.get_str_container_os() in req.params:
+        if not Key.CONTAINER_OS in req.params:
             res.body = "Container os is required."
             res.content_type = "String"
             res.status = falcon.HTTP_401
             return
 
-        if not Definition.Container.get_str_data_source() in req.params:
+        if not Key.DATA_SOURCE in req.params:
             res.body = "Data digest is required."
             res.content_type = "String"
             res.status = falcon.HTTP_401
@@ -117,9 +212,9 @@ class MessageStreaming(object):
         # Parse to dict object
         ret = LookUpTable.Tuples.get_tuple_object(req)
 
-        if Definition.Container.get_str_container_priority() in req.params:
-            if LService.is_str_is_digit(req.params[Definition.Container.get_str_container_priority()]):
-                ret[Definition.Container.get_str_container_priority()] = int(req.params[Definition.Container.get_str_container_priority()])
+        if Key.PRIORITY in req.params:
+            if LService.is_str_is_digit(req.params[Key.PRIORITY]):
+                ret[Key.PRIORITY] = int(req.params[Key.PRIORITY])
 
             else:
                 res.body = "Container priority is not digit."
@@ -131,61 +226,112 @@ class MessageStreaming(object):
         LookUpTable.Tuples.add_tuple_info(ret)
 
         # Check for the availability of the container
-        ret = LookUpTable.get_candidate_container(ret[Definition.Container.get_str_con_image_name()])
+        ret_image = ret[Key.IMAGE_NAME]
+        ret = LookUpTable.get_candidate_container(ret_image)
 
         if ret:
+            # Tuples routed to a container directly never enter the queue, they are arrivals all the same
+            MessagesQueue.add_arrival(ret_image)
             res.body = Definition.Master.get_str_end_point(ret)
-            res.content_type = "String"
+            res.content_type = "application/json"
             res.status = falcon.HTTP_200
             return
+        elif not MessagesQueue.is_queue_available(ret_image):
+            # No streaming end-point available and the queue of this image is full
+            res.body = "Queue in master is full."
+            res.content_type = "String"
+            res.status = falcon.HTTP_406
+            return
         else:
             # No streaming end-point available
-            res.body = Definition.Master.get_str_end_point_MS(Setting)
-            res.content_type = "String"
+            MessagesQueue.add_arrival(ret_image)
+            compression = MessagingConfiguration.get_compression(ret_image)
+            if compression:
+                compression = (Encoding.get_name(compression[0]), compression[1])
+
+            res.body = Definition.Master.get_str_end_point_MS(Setting, compression=compression)
+            res.content_type = "application/json"
             res.status = falcon.HTTP_200
             return
 
+    @staticmethod
+    def __respond_no_item(res, ret):
+        """
+        Register the container with the status it reported, as there is nothing to stream to it.
+        """
+        LookUpTable.Containers.update_container(ret)
+        if ret[Key.BATCH_STATUS] == CStatus.AVAILABLE:
+            # In push mode, a tuple arriving meanwhile is streamed to the container right away
+            MessagesQueue.notify_consumer(ret[Key.IMAGE_NAME])
+
+        SysOut.debug_string("No item in queue!")
+        res.body = "No item in queue"
+        res.content_type = "String"
+        res.status = falcon.HTTP_200
+
     def on_post(self, req, res):
         """
         POST: /streamRequest?token=None
         This function invoked by the driver in micro-batch in the container.
         It responds with getting a stream from data source or from messaging system.
         """
-        if not Definition.get_str_token() in req.params:
+        if not Key.TOKEN in req.params:
             res.body = "Token is required."
             res.content_type = "String"
             res.status = falcon.HTTP_401
             return
 
         # Check that the PE is existing or not, if not insert and respond
-        if Definition.REST.Batch.get_str_batch_addr() in req.params and \
-           Definition.REST.Batch.get_str_batch_port() in req.params and \
-           Definition.REST.Batch.get_str_batch_status() in req.params and \
-           Definition.Container.get_str_con_image_name() in req.params and \
-           Definition.Container.Status.get_str_sid() in req.params:
+        if Key.BATCH_ADDR in req.params and \
+           Key.BATCH_PORT in req.params and \
+           Key.BATCH_STATUS in req.params and \
+           Key.IMAGE_NAME in req.params and \
+           Key.SID in req.params:
 
             # Check for data type
-            if req.params[Definition.REST.Batch.get_str_batch_port()].isdigit() and \
-               req.params[Definition.REST.Batch.get_str_batch_status()].isdigit():
+            if req.params[Key.BATCH_PORT].isdigit() and \
+               req.params[Key.BATCH_STATUS].isdigit():
 
                 ret = LookUpTable.Containers.get_container_object(req)
 
                 # If queue contain data, ignore update and stream from queue
-                length = MessagesQueue.get_queues_length(ret[Definition.Container.get_str_con_image_name()])
+                length = MessagesQueue.get_queues_length(ret[Key.IMAGE_NAME])
 
                 if not length:
-                    LookUpTable.Containers.update_container(ret)
-                    SysOut.debug_string("No item in queue!")
-                    res.body = "No item in queue"
-                    res.content_type = "String"
-                    res.status = falcon.HTTP_200
+                    self.__respond_no_item(res, ret)
                     return
 
-                if length > 0 and ret[Definition.REST.Batch.get_str_batch_status()] == CStatus.AVAILABLE:
-                    # ret[Definition.REST.Batch.get_str_batch_status()] = CStatus.BUSY
-                    # LookUpTable.Containers.update_container(ret)
+                if length > 0 and ret[Key.BATCH_STATUS] == CStatus.AVAILABLE:
+                    batch = None
+                    if Key.BATCH_SIZE in req.params or \
+                       Key.BATCH_ADAPTIVE in req.params:
+                        batch = self.__get_batch_parameters(req, ret)
+                        if batch is None:
+                            format_response_string(res, falcon.HTTP_406, "Invalid batch parameters!")
+                            return
+
+                    # The container is busy with the tuples it gets from the queue until it reports again
+                    ret[Key.BATCH_STATUS] = CStatus.BUSY
+                    LookUpTable.Containers.update_container(ret)
+
+                    if batch is not None:
+                        self.__stream_batch(req, res, ret, *batch)
+                        return
+
+                    message = MessagesQueue.pop_message(ret[Key.IMAGE_NAME])
+                    if message is None:
+                        # The push dispatcher or another request drained the queue since its length was read
+                        ret[Key.BATCH_STATUS] = CStatus.AVAILABLE
+                        self.__respond_no_item(res, ret)
+                        return
 
-                    res.data = bytes(MessagesQueue.pop_queue(ret[Definition.Container.get_str_con_image_name()]))
+                    accepted = self.__get_accepted_encodings(req)
+                    item, _, encoding = message
+                    item, encoding = self.__decode_for(item, encoding, accepted)
+                    if accepted is not None:
+                        res.set_header(Key.ENCODING_HEADER, Encoding.get_name(encoding))
+
+                    res.data = PayloadStatistics.get_bytes(item)
                     res.content_type = "Bytes"
                     res.status = falcon.HTTP_203
                     return
@@ -230,9 +376,7 @@ class MessagesQuery(object):
             return
 
         if req.params[Definition.MessagesQueue.get_str_command()] == Definition.MessagesQueue.get_str_queue_length():
-            res.body = str(MessagesQueue.get_queues_all())
-            res.content_type = "String"
-            res.status = falcon.HTTP_200
+            format_response_json(res, falcon.HTTP_200, MessagesQueue.get_queues_all())
             return
 
         if req.params[Definition.MessagesQueue.get_str_command()] == Definition.MessagesQueue.get_str_current_id():
@@ -241,15 +385,19 @@ class MessagesQuery(object):
             res.status = falcon.HTTP_200
             return
 
+        if req.params[Definition.MessagesQueue.get_str_command()] == Definition.MessagesQueue.get_str_statistics():
+            data = PayloadStatistics.verbose()
+            data['DEDUP'] = MessagesQueue.get_dedup_statistics()
+            data['COMPRESSION'] = Compression.verbose()
+            data['LOCKS'] = StateLock.verbose()
+            format_response_json(res, falcon.HTTP_200, data)
+            return
+
         if req.params[Definition.MessagesQueue.get_str_command()] == "verbose":
             data = LookUpTable.verbose()
             data['MSG'] = MessagesQueue.verbose()
-            if req.params.get('format') == 'JSON':
-                data = json.dumps(data)
-
-            res.body = str(data)
-            res.content_type = "String"
-            res.status = falcon.HTTP_200
+            format_response_json(res, falcon.HTTP_200, data)
+            return
 
         if req.params[Definition.MessagesQueue.get_str_command()] == "verbose_html":
             data = LookUpTable.verbose()
@@ -282,14 +430,29 @@ class JobManager(object):
         # user wants to know if containers are ready for provided job ID
         if req.params['type'] == "poll_job":
             id = req.params.get('job_id')
-            if not id in LookUpTable.Jobs.verbose():
+            job = LookUpTable.Jobs.get_job(id)
+            if job is None:
                 format_response_string(res, falcon.HTTP_404, "Specified job not available.")
                 return
 
-            jobs = LookUpTable.Jobs.verbose()
-            stat = str(jobs[id].get('job_status'))
+            stat = str(job.get('job_status'))
+            if job.get('time_to_ready') is not None:
+                stat += ", ready in {:.1f} s".format(job['time_to_ready'])
             format_response_string(res, falcon.HTTP_200, ("Job status: " + stat))
 
+        # desired replicas of the managed images, with the containers the workers report for them
+        if req.params['type'] == "replicas":
+            from .reconciler import Reconciler
+            workers = LookUpTable.Workers.verbose()
+            live = Reconciler.get_live_containers(workers)
+            creating = Reconciler.get_creating_containers(workers)
+            body = LookUpTable.Replicas.verbose()
+            for image_name, replicas in body.items():
+                replicas['live'] = len(live.get(image_name, []))
+                replicas[Definition.Docker.get_str_creating()] = creating[image_name]
+
+            format_response_json(res, falcon.HTTP_200, body)
+
         return 
 
     def on_post(self, req, res):
@@ -319,12 +482,41 @@ class JobManager(object):
             format_response_string(res, falcon.HTTP_200, "Job request received, container status: {}\nJob ID: {}".format(job_status, job.get('job_id')))
             return
 
+        # request to keep a number of containers of an image, the reconciler creates and removes them
+        if req.params['type'] == 'set_replicas':
+            image_name = req_data.get(Definition.Container.get_str_con_image_name())
+            desired = req_data.get(Definition.Container.get_str_desired(), 0)
+            min_replicas = req_data.get(Definition.Container.get_str_min_replicas(), 0)
+            max_replicas = req_data.get(Definition.Container.get_str_max_replicas())
+            if not image_name or not all(isinstance(value, int) and value >= 0
+                                         for value in [desired, min_replicas, max_replicas] if value is not None):
+                format_response_string(res, falcon.HTTP_400, "Image name and non-negative integer counts required.")
+                return
+
+            if max_replicas is not None and max_replicas < min_replicas:
+                format_response_string(res, falcon.HTTP_400, "Maximum below minimum.")
+                return
+
+            desired = LookUpTable.Replicas.set_replicas(image_name, desired, min_replicas, max_replicas)
+            format_response_string(res, falcon.HTTP_200, "Desired replicas of {}: {}".format(image_name, desired))
+            return
+
+        # request to stop managing an image, its containers are left running
+        if req.params['type'] == 'remove_replicas':
+            image_name = req_data.get(Definition.Container.get_str_con_image_name())
+            if not LookUpTable.Replicas.del_replicas(image_name):
+                format_response_string(res, falcon.HTTP_404, "Image is not managed.")
+                return
+
+            format_response_string(res, falcon.HTTP_200, "Stopped managing the replicas of {}".format(image_name))
+            return
+
         return
 
 class RESTService(object):
     def __init__(self):
         # Initialize REST Services
-        from wsgiref.simple_server import make_server
+        from harmonicIO.general.wsgi_server import make_server
         api = falcon.API()
 
         # Add route for getting status update
@@ -340,10 +532,11 @@ class RESTService(object):
         api.add_route('/' + Definition.REST.get_str_job_mgr(), JobManager())
 
         # Establishing a REST server
-        self.__server = make_server(Setting.get_node_addr(), Setting.get_node_port(), api)
+        self.__server = make_server(Setting.get_node_addr(), Setting.get_node_port(), api,
+                                    Setting.get_rest_server(), Setting.get_rest_workers())
 
     def run(self):
-        SysOut.out_string("REST Ready.....")
+        SysOut.out_string("REST Ready ({0}).....".format(Setting.get_rest_server()))
 
         self.__server.serve_forever()
 
@@ -0,0 +1,147 @@
+import abc
+from harmonicIO.general.definition import Definition
+
+
+class WorkerCapacity(object):
+    """
+    Resources of a worker as reported in its last status, minus the containers placed on it so far.
+    Metrics a worker does not report are not constrained.
+    """
+
+    def __init__(self, worker, image_name, container_load, container_memory):
+        self.end_point = (worker[Definition.get_str_node_addr()], worker[Definition.get_str_node_port()])
+        self.cpus = max(1, int(worker.get(Definition.get_str_cpu_count()) or 1))
+        self.load = float(worker.get(Definition.get_str_load5()) or 0)
+        self.mem_total = worker.get(Definition.get_str_mem_total())
+        self.mem_available = worker.get(Definition.get_str_mem_available())
+        self.free_ports = worker.get(Definition.REST.get_str_free_ports())
+        self.total_ports = self.free_ports
+        self.has_image = image_name in worker.get(Definition.REST.get_str_local_imgs(), [])
+        self.__container_load = container_load
+        self.__container_memory = container_memory
+
+    def get_cpu_utilization(self, placed=0):
+        return (self.load + placed * self.__container_load) / self.cpus
+
+    def get_memory_utilization(self, placed=0):
+        if not self.mem_total or self.mem_available is None:
+            return 0.0
+
+        return 1.0 - (self.mem_available - placed * self.__container_memory) / self.mem_total
+
+    def get_port_utilization(self, placed=0):
+        if not self.total_ports:
+            return 0.0 if self.free_ports is None else 1.0
+
+        return 1.0 - (self.free_ports - placed) / self.total_ports
+
+    def get_utilization(self, placed=0):
+        """
+        :return: Highest of the CPU, memory and port utilization, between 0 and 1 for a worker that fits.
+        """
+        return max(self.get_cpu_utilization(placed), self.get_memory_utilization(placed),
+                   self.get_port_utilization(placed))
+
+    def fits(self, max_load):
+        """
+        :return: True if one more container can be placed on the worker.
+        """
+        if self.free_ports is not None and self.free_ports < 1:
+            return False
+
+        if self.mem_available is not None and self.mem_available < self.__container_memory:
+            return False
+
+        return self.get_cpu_utilization(1) <= max_load
+
+    def place(self):
+        self.load += self.__container_load
+        if self.free_ports is not None:
+            self.free_ports -= 1
+        if self.mem_available is not None:
+            self.mem_available -= self.__container_memory
+
+
+class Scheduler(object, metaclass=abc.ABCMeta):
+    """
+    Places the containers of a job on workers, one container at a time on the worker with the best score,
+    so that the containers placed earlier in the job count against the capacity of their worker.
+    Subclasses define the score; a worker can host a container while it has a free data port, the memory
+    of a container and the CPU load of the containers stays below max_load per core.
+    Workers that reported the image as local get a locality bonus. Containers placed earlier in the same job
+    do not turn it on, otherwise the first worker picked would take every container of the job.
+    """
+    locality_weight = 0.25
+
+    def __init__(self, max_load=0.8, container_load=0.5, container_memory=256 * 1024 * 1024):
+        """
+        :param max_load: Load average per core up to which containers are placed on a worker.
+        :param container_load: Load average expected from one container.
+        :param container_memory: Memory in bytes expected to be used by one container.
+        """
+        self.__max_load = max_load
+        self.__container_load = container_load
+        self.__container_memory = container_memory
+
+    @abc.abstractmethod
+    def score(self, worker):
+        """
+        :param worker: WorkerCapacity with the containers placed so far.
+        :return: Score of placing one more container on the worker, the highest score wins.
+        """
+
+    def place(self, workers, image_name, num, excluded=()):
+        """
+        :param workers: Dict of worker dicts, as reported in their status.
+        :param excluded: End points (addr, port) of workers not to place containers on.
+        :return: List of end points (addr, port), one per placed container. Shorter than num when the workers
+                 cannot host all the containers.
+        """
+        capacities = []
+        for worker in workers.values():
+            capacity = WorkerCapacity(worker, image_name, self.__container_load, self.__container_memory)
+            if capacity.end_point not in excluded:
+                capacities.append(capacity)
+
+        ret = []
+        while len(ret) < num:
+            candidates = [capacity for capacity in capacities if capacity.fits(self.__max_load)]
+            if not candidates:
+                break
+
+            best = max(candidates, key=self.score)
+            best.place()
+            ret.append(best.end_point)
+
+        return ret
+
+
+class SpreadScheduler(Scheduler):
+    """
+    Prefers the least utilized workers, spreading the containers of a job over the cluster.
+    """
+
+    def score(self, worker):
+        return (1.0 - worker.get_utilization(1)) + (self.locality_weight if worker.has_image else 0.0)
+
+
+class BinPackingScheduler(Scheduler):
+    """
+    Prefers the most utilized workers that still fit, keeping as many workers as possible free.
+    """
+
+    def score(self, worker):
+        return worker.get_utilization(1) + (self.locality_weight if worker.has_image else 0.0)
+
+
+SCHEDULERS = {"spread": SpreadScheduler, "bin_packing": BinPackingScheduler}
+
+
+def get_scheduler(name, *args, **kwargs):
+    """
+    :return: Scheduler registered in SCHEDULERS under the given name.
+    """
+    if name not in SCHEDULERS:
+        raise ValueError("Unknown scheduler: " + str(name))
+
+    return SCHEDULERS[name](*args, **kwargs)
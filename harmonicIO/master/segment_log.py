@@ -0,0 +1,194 @@
+import os
+import mmap
+import shutil
+import struct
+import hashlib
+from collections import deque
+
+
+class Segment(object):
+    """
+    Fixed size, memory-mapped, append-only file holding length prefixed records.
+    Records are appended at the write offset and read back in order from the read offset.
+    """
+    # message id, priority, encoding, enqueue time, payload length
+    __header = struct.Struct(">QHBdI")
+
+    def __init__(self, path, capacity):
+        self.__path = path
+        self.__capacity = capacity
+        self.__file = open(path, 'w+b')
+        self.__file.truncate(capacity)
+        self.__map = mmap.mmap(self.__file.fileno(), capacity)
+        self.__write_pos = 0
+        self.__read_pos = 0
+
+    @staticmethod
+    def get_record_size(item):
+        return Segment.__header.size + len(item)
+
+    def is_consumed(self):
+        return self.__read_pos >= self.__write_pos
+
+    def append(self, msg_id, item, priority, enqueue_time, encoding):
+        """
+        Append a record to the segment.
+        :return: False if the record does not fit in the remaining space.
+        """
+        end = self.__write_pos + Segment.get_record_size(item)
+        if end > self.__capacity:
+            return False
+
+        Segment.__header.pack_into(self.__map, self.__write_pos, msg_id, priority, encoding, enqueue_time, len(item))
+        self.__map[self.__write_pos + Segment.__header.size:end] = item
+        self.__write_pos = end
+
+        return True
+
+    def peek(self):
+        """
+        :return: Tuple (msg_id, priority, encoding, enqueue_time, payload length) of the next record to read, or
+                 None if the segment is consumed.
+        """
+        if self.is_consumed():
+            return None
+
+        return Segment.__header.unpack_from(self.__map, self.__read_pos)
+
+    def read(self):
+        if self.is_consumed():
+            return None
+
+        msg_id, priority, encoding, enqueue_time, length = Segment.__header.unpack_from(self.__map, self.__read_pos)
+        start = self.__read_pos + Segment.__header.size
+        item = self.__map[start:start + length]
+        self.__read_pos = start + length
+
+        return msg_id, item, priority, enqueue_time, encoding
+
+    def delete(self):
+        self.__map.close()
+        self.__file.close()
+        os.remove(self.__path)
+
+
+class SegmentLog(object):
+    """
+    Disk spill tier of an image queue.
+    Payloads are appended to one chain of memory-mapped segment files per priority level and read back in
+    FIFO order within their level, segments are deleted as soon as all of their records have been consumed.
+    """
+
+    def __init__(self, directory, image_name, segment_size, max_bytes):
+        self.__directory = os.path.join(directory, hashlib.sha1(bytes(image_name, 'UTF-8')).hexdigest()[0:16])
+        self.__segment_size = segment_size
+        self.__max_bytes = max_bytes
+        # priority -> [segments, number of records]
+        self.__levels = dict()
+        self.__next_segment = 0
+        self.__length = 0
+        self.__size_bytes = 0
+
+        # Anything left from a previous run is stale, recovery is done by the write-ahead log.
+        if os.path.isdir(self.__directory):
+            shutil.rmtree(self.__directory)
+        os.makedirs(self.__directory)
+
+    def __len__(self):
+        return self.__length
+
+    def get_size_bytes(self):
+        return self.__size_bytes
+
+    def is_available(self, item_size=0):
+        return self.__size_bytes + item_size <= self.__max_bytes
+
+    def get_priorities(self):
+        """
+        :return: Priority levels holding spilled records.
+        """
+        return list(self.__levels)
+
+    def __new_segment(self, segments, item):
+        path = os.path.join(self.__directory, "{0:020d}.seg".format(self.__next_segment))
+        self.__next_segment += 1
+        segment = Segment(path, max(self.__segment_size, Segment.get_record_size(item)))
+        segments.append(segment)
+
+        return segment
+
+    def push(self, entry):
+        """
+        Append a queue entry (msg_id, item, priority, enqueue_time, encoding) to the chain of its priority.
+        :return: False if the spill budget is exhausted.
+        """
+        if not self.is_available(len(entry[1])):
+            return False
+
+        level = self.__levels.get(entry[2])
+        if level is None:
+            level = self.__levels[entry[2]] = [deque(), 0]
+
+        segments = level[0]
+        if not segments or not segments[-1].append(*entry):
+            self.__new_segment(segments, entry[1]).append(*entry)
+
+        level[1] += 1
+        self.__length += 1
+        self.__size_bytes += len(entry[1])
+
+        return True
+
+    def peek(self, priority):
+        """
+        :return: Tuple (msg_id, priority, encoding, enqueue_time, payload length) of the next record of the
+                 priority level, or None if the level holds no record.
+        """
+        level = self.__levels.get(priority)
+        if level is None:
+            return None
+
+        for segment in level[0]:
+            header = segment.peek()
+            if header is not None:
+                return header
+
+        return None
+
+    def pop(self, priority=None):
+        """
+        Remove the next record of the given priority level, by default of the highest one.
+        :return: Tuple (msg_id, item, priority, enqueue_time, encoding) or None if the level holds no record.
+        """
+        if priority is None:
+            if not self.__levels:
+                return None
+            priority = max(self.__levels)
+
+        level = self.__levels.get(priority)
+        if level is None:
+            return None
+
+        segments = level[0]
+        while segments:
+            entry = segments[0].read()
+            if entry is not None:
+                break
+
+            segments.popleft().delete()
+        else:
+            return None
+
+        level[1] -= 1
+        self.__length -= 1
+        self.__size_bytes -= len(entry[1])
+
+        # Release the head segment once it is drained and no longer written to, and the whole level once empty.
+        if level[1] == 0:
+            for segment in segments:
+                segment.delete()
+            del self.__levels[priority]
+        elif segments[0].is_consumed() and len(segments) > 1:
+            segments.popleft().delete()
+
+        return entry
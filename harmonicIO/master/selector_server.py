@@ -0,0 +1,247 @@
+import socket
+import selectors
+from harmonicIO.general.services import SysOut
+from harmonicIO.general.wire_protocol import StreamHeader, FrameHeader, FrameAck
+from .server_socket import queue_tuple, queue_frame, check_frame_size
+
+
+class Connection(object):
+    """
+    State of a producer connection.
+    The receive buffer is grown by doubling and filled in place with recv_into. Until the first bytes have
+    been read the protocol is unknown; version 2 connections are parsed frame by frame as data arrives,
+    original connections hold one tuple which is complete when the producer closes the socket.
+    The payload of a frame that does not fit in the buffer is received into its own buffer of the declared
+    size, and the payload of a tuple is collected as the chunks returned by recv once its header is known.
+    """
+    UNKNOWN = 0
+    TUPLE = 1
+    FRAMES = 2
+
+    def __init__(self, buffer_size):
+        self.buffer = bytearray(buffer_size)
+        self.length = 0
+        self.mode = Connection.UNKNOWN
+        self.seq = 0
+        self.acks = bytearray()
+
+        # Tuple header, or decoded frame header and image name, of the payload being received.
+        self.header = None
+        self.image_name = None
+        self.chunks = None
+        self.payload = None
+        self.received = 0
+        self.copied = 0
+
+    def get_free_view(self):
+        if self.length == len(self.buffer):
+            self.buffer.extend(bytes(len(self.buffer)))
+
+        return memoryview(self.buffer)[self.length:]
+
+    def get_data(self):
+        return memoryview(self.buffer)[0:self.length]
+
+    def consume(self, size):
+        """
+        Drop the given number of bytes from the head of the buffer.
+        """
+        remaining = self.length - size
+        self.buffer[0:remaining] = self.buffer[size:self.length]
+        self.length = remaining
+
+
+class SelectorTCPServer(object):
+    """
+    Messaging system server which multiplexes all producer connections on a single thread with selectors,
+    instead of spawning one thread per incoming tuple as ThreadedTCPServer does.
+    Note that queue operations run on the selector thread, so a synchronous write-ahead log commit delays
+    every connection.
+    """
+
+    def __init__(self, server_address, buffer_size=64 * 1024, backlog=1024):
+        self.__buffer_size = buffer_size
+        self.__selector = selectors.DefaultSelector()
+
+        self.__socket = socket.socket(socket.AF_INET6 if ':' in server_address[0] else socket.AF_INET,
+                                      socket.SOCK_STREAM)
+        self.__socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__socket.bind(server_address)
+        self.__socket.listen(backlog)
+        self.__socket.setblocking(False)
+        self.__selector.register(self.__socket, selectors.EVENT_READ, None)
+
+    def serve_forever(self):
+        while True:
+            for key, mask in self.__selector.select():
+                if key.data is None:
+                    self.__accept()
+                    continue
+
+                if mask & selectors.EVENT_WRITE:
+                    self.__write(key.fileobj, key.data)
+                if mask & selectors.EVENT_READ and key.fileobj.fileno() != -1:
+                    self.__read(key.fileobj, key.data)
+
+    def __accept(self):
+        try:
+            conn, _ = self.__socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+
+        conn.setblocking(False)
+        self.__selector.register(conn, selectors.EVENT_READ, Connection(self.__buffer_size))
+
+    def __close(self, conn):
+        self.__selector.unregister(conn)
+        conn.close()
+
+    def __read(self, conn, state):
+        try:
+            if state.payload is not None:
+                received = conn.recv_into(memoryview(state.payload)[state.received:])
+            elif state.chunks is not None:
+                chunk = conn.recv(self.__buffer_size)
+                received = len(chunk)
+                if chunk:
+                    state.chunks.append(chunk)
+            else:
+                received = conn.recv_into(state.get_free_view())
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            SysOut.warn_string("Producer connection failed: {0}".format(e))
+            self.__close(conn)
+            return
+        except MemoryError:
+            SysOut.err_string("Insufficient memory for storing g object.")
+            self.__close(conn)
+            return
+
+        if not received:
+            # The producer closed the connection.
+            self.__close(conn)
+            self.__end(state)
+            return
+
+        if state.payload is not None:
+            state.received += received
+            if state.received == len(state.payload):
+                self.__queue_frame(state, state.header, state.image_name, state.payload, state.copied)
+                state.payload = None
+                self.__write(conn, state)
+            return
+
+        if state.chunks is not None:
+            return
+
+        state.length += received
+        if state.mode == Connection.UNKNOWN and state.length >= len(FrameHeader.MAGIC):
+            if state.get_data()[0:len(FrameHeader.MAGIC)] == FrameHeader.MAGIC:
+                state.mode = Connection.FRAMES
+                state.consume(len(FrameHeader.MAGIC))
+            else:
+                state.mode = Connection.TUPLE
+
+        try:
+            if state.mode == Connection.FRAMES:
+                self.__parse_frames(conn, state)
+            elif state.mode == Connection.TUPLE:
+                self.__parse_tuple_header(state)
+        except Exception as e:
+            SysOut.err_string("Cannot read tuple from the stream: {0}".format(e))
+            self.__close(conn)
+
+    def __end(self, state):
+        if state.mode == Connection.FRAMES:
+            if state.length or state.payload is not None:
+                SysOut.warn_string("Producer connection closed within a frame.")
+            return
+
+        if state.chunks is None:
+            SysOut.err_string("Cannot read tuple from the stream: connection closed within the header.")
+            return
+
+        try:
+            queue_tuple(state.header, state.chunks)
+        except Exception as e:
+            SysOut.err_string("Cannot read tuple from the stream: {0}".format(e))
+
+    @staticmethod
+    def __parse_tuple_header(state):
+        if state.length < StreamHeader.prefix_size:
+            return
+
+        data = state.get_data()
+        size = StreamHeader.get_size(data)
+        if state.length >= size:
+            state.header = bytes(data[0:size])
+            state.chunks = [bytes(data[size:])] if state.length > size else []
+
+        data.release()
+        if state.chunks is not None:
+            # The rest of the tuple is read in chunks, the buffer is no longer used.
+            state.buffer = None
+            state.length = 0
+
+    @staticmethod
+    def __queue_frame(state, header, image_name, payload, copied):
+        status = queue_frame(header, image_name, payload, copied)
+        state.acks += FrameAck.encode(status, state.seq)
+        state.seq += 1
+
+    def __parse_frames(self, conn, state):
+        offset = 0
+        data = state.get_data()
+        while state.length - offset >= FrameHeader.size:
+            header = FrameHeader.decode(data, offset)
+            check_frame_size(header)
+            start = offset + FrameHeader.size
+            payload_start = start + header[3]
+            if payload_start > state.length:
+                break
+
+            image_name = str(data[start:payload_start], 'UTF-8')
+            end = payload_start + header[4]
+            if end > state.length:
+                # Receive the rest of the payload straight into a buffer of the declared size.
+                state.header = header
+                state.image_name = image_name
+                state.payload = bytearray(header[4])
+                state.received = state.length - payload_start
+                state.copied = state.received
+                state.payload[0:state.received] = data[payload_start:state.length]
+                offset = state.length
+                break
+
+            self.__queue_frame(state, header, image_name, bytes(data[payload_start:end]), header[4])
+            offset = end
+
+        data.release()
+        if offset:
+            state.consume(offset)
+
+        if state.acks:
+            self.__write(conn, state)
+
+    def __write(self, conn, state):
+        try:
+            sent = conn.send(state.acks)
+            del state.acks[0:sent]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError as e:
+            SysOut.warn_string("Cannot acknowledge frames: {0}".format(e))
+            self.__close(conn)
+            return
+
+        # Wait for the socket to become writable while acknowledgements are pending.
+        events = selectors.EVENT_READ
+        if state.acks:
+            events |= selectors.EVENT_WRITE
+        if self.__selector.get_key(conn).events != events:
+            self.__selector.modify(conn, events, state)
+
+    def server_close(self):
+        self.__selector.close()
+        self.__socket.close()
@@ -1,6 +1,74 @@
+import socket
+import hashlib
 import socketserver
-from .messaging_system import MessagesQueue
+from .messaging_system import MessagesQueue, MessagingConfiguration, PayloadStatistics
 from harmonicIO.general.services import SysOut
+from harmonicIO.general.wire_protocol import StreamHeader, FrameHeader, FrameAck
+from harmonicIO.general.compression import Encoding
+
+
+def queue_tuple(header, chunks):
+    """
+    Queue a tuple of the original protocol.
+    :param header: StreamHeader of the tuple, with image name and priority.
+    :param chunks: Payload as read from the socket. The size of the payload is only known once the producer
+                   closes the connection, so the chunks are joined, which copies them unless there is only one.
+    :return: False if the queue of the image is full and the tuple was dropped.
+    """
+    image_name_string, priority, _ = StreamHeader.decode(header)
+    payload = b"".join(chunks)
+    PayloadStatistics.add_received(len(payload), len(payload) if len(chunks) > 1 else 0)
+
+    if MessagesQueue.is_duplicate(image_name_string, payload):
+        SysOut.debug_string("Duplicate tuple for {0}, not queued.".format(image_name_string))
+        return True
+
+    # Then, push data messaging system.
+    if not MessagesQueue.push_to_queue(image_name_string, payload, priority):
+        SysOut.warn_string("Drop tuple for {0}, queue is full.".format(image_name_string))
+        MessagesQueue.discard_digest(image_name_string, payload)
+        return False
+
+    return True
+
+
+def check_frame_size(header):
+    """
+    Refuse a frame before receiving its payload if the payload is larger than the in-memory budget of a queue,
+    so that a malformed or hostile header cannot make the master allocate the size it declares.
+    :param header: Tuple decoded by FrameHeader.decode
+    """
+    if header[4] > MessagingConfiguration.get_max_in_memory_bytes():
+        raise Exception("Frame payload of {0} bytes exceeds the limit of {1} bytes.".format(
+            header[4], MessagingConfiguration.get_max_in_memory_bytes()))
+
+
+def queue_frame(header, image_name, payload, copied=0):
+    """
+    Queue the payload of a version 2 data frame, the flags of the frame hold the encoding of the payload.
+    :param header: Tuple decoded by FrameHeader.decode
+    :param copied: Number of payload bytes copied in user space while receiving the frame.
+    :return: FrameAck status for the frame.
+    """
+    frame_type, flags, priority, _, _, digest = header
+    if frame_type != FrameHeader.DATA or not Encoding.is_valid(flags) or hashlib.md5(payload).digest() != digest:
+        SysOut.warn_string("Drop invalid frame for {0}.".format(image_name))
+        return FrameAck.INVALID
+
+    PayloadStatistics.add_received(len(payload), copied)
+    if MessagesQueue.is_duplicate(image_name, payload, digest):
+        SysOut.debug_string("Duplicate tuple for {0}, not queued.".format(image_name))
+        return FrameAck.OK
+
+    # Payloads the producer did not compress are compressed by the master if the image is configured for it.
+    encoding = flags if flags != Encoding.IDENTITY else None
+    if not MessagesQueue.push_to_queue(image_name, payload, priority, encoding):
+        SysOut.warn_string("Drop tuple for {0}, queue is full.".format(image_name))
+        MessagesQueue.discard_digest(image_name, payload, digest)
+        return FrameAck.QUEUE_FULL
+
+    return FrameAck.OK
+
 
 class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     """
@@ -14,32 +82,98 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
     This class is the main class that handle with requests from clients.
     the actual mechanism that pass the data to clients.
     """
+    recv_size = 256 * 1024
 
-    def handle(self):
-        # Receive and interpret the request data
-        data = bytearray()
+    def __recv_into(self, buffer):
+        """
+        Fill the buffer from the socket.
+        :return: Number of bytes received, less than the buffer size if the connection was closed.
+        """
+        view = memoryview(buffer)
+        received = 0
+        while received < len(view):
+            n = self.request.recv_into(view[received:])
+            if n == 0:
+                break
+            received += n
 
+        return received
+
+    def __recv_payload(self, length):
+        """
+        Receive a payload of known length. With MSG_WAITALL the kernel fills a bytes object of the declared
+        size in one call, so the payload is neither copied nor converted afterwards; if the call returns
+        early the rest is read in chunks and joined.
+        :return: Tuple (payload, number of bytes copied)
         """
-        Discard heading for now
-        data += self.request.recv(16)
+        payload = self.request.recv(length, socket.MSG_WAITALL)
+        if len(payload) == length:
+            return payload, 0
 
-        # Interpret the header for file size
-        file_size = struct.unpack(">Q", data[8:16])[0]
+        chunks = [payload]
+        received = len(payload)
+        while received < length:
+            chunk = self.request.recv(min(length - received, ThreadedTCPRequestHandler.recv_size))
+            if not chunk:
+                raise Exception("Connection closed within a frame.")
+
+            chunks.append(chunk)
+            received += len(chunk)
+
+        return b"".join(chunks), length
+
+    def __handle_frames(self):
         """
+        Version 2 protocol, read frames until the producer closes the connection.
+        """
+        seq = 0
+        header = bytearray(FrameHeader.size)
+        while True:
+            received = self.__recv_into(header)
+            if received == 0:
+                return
+            if received < len(header):
+                raise Exception("Connection closed within a frame header.")
+
+            decoded = FrameHeader.decode(header)
+            check_frame_size(decoded)
+            image_name = bytearray(decoded[3])
+            if self.__recv_into(image_name) < len(image_name):
+                raise Exception("Connection closed within a frame.")
+
+            payload, copied = self.__recv_payload(decoded[4])
+            status = queue_frame(decoded, str(image_name, 'UTF-8'), payload, copied)
+            self.request.sendall(FrameAck.encode(status, seq))
+            seq += 1
+
+    def handle(self):
+        # Receive and interpret the request data
+        data = bytearray(len(FrameHeader.MAGIC))
+
         try:
-            c = True
-            while c != b"":
-                c = self.request.recv(2048)
-                data += c
+            received = self.__recv_into(data)
+            if received == len(data) and data == FrameHeader.MAGIC:
+                self.__handle_frames()
+                return
+
+            # Original protocol, one tuple terminated by closing the connection.
+            if received < StreamHeader.prefix_size:
+                raise Exception("Connection closed within the header.")
 
-            # Extract byte header 3 bytes
-            image_name_length = int(data[0:3].decode('UTF-8'))
-            tcr = image_name_length + 3
-            image_name_string = data[3:tcr].decode('UTF-8')
+            header = data + bytearray(StreamHeader.get_size(data) - received)
+            if self.__recv_into(memoryview(header)[received:]) < len(header) - received:
+                raise Exception("Connection closed within the header.")
 
-            # Then, push data messaging system.
-            MessagesQueue.push_to_queue(image_name_string, data[tcr:])
+            chunks = []
+            c = self.request.recv(ThreadedTCPRequestHandler.recv_size)
+            while c != b"":
+                chunks.append(c)
+                c = self.request.recv(ThreadedTCPRequestHandler.recv_size)
 
-        except:
-            from harmonicIO.general.services import Services
+            queue_tuple(header, chunks)
+
+        except MemoryError:
             SysOut.err_string("Insufficient memory for storing g object.")
+
+        except Exception as e:
+            SysOut.err_string("Cannot read tuple from the stream: {0}".format(e))
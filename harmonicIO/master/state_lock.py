@@ -0,0 +1,61 @@
+import time
+import threading
+
+
+class StateLock(object):
+    """
+    Lock guarding one part of the master state, such as the queue or the containers of one image.
+    Every lock counts how often it was taken and how often a thread had to wait for it, and for how long,
+    so that the statistics command shows whether the state is split finely enough for the load.
+    Locks are registered by name; locks sharing a name share their counters.
+    """
+    __registry = dict()
+    __registry_lock = threading.Lock()
+
+    def __init__(self, name):
+        self.__lock = threading.Lock()
+        with StateLock.__registry_lock:
+            counters = StateLock.__registry.get(name)
+            if counters is None:
+                counters = StateLock.__registry[name] = [0, 0, 0.0]
+
+        self.__counters = counters
+
+    def acquire(self):
+        if not self.__lock.acquire(False):
+            start = time.perf_counter()
+            self.__lock.acquire()
+
+            # Counters are only updated while holding the lock. Locks sharing a name may miss a count.
+            self.__counters[1] += 1
+            self.__counters[2] += time.perf_counter() - start
+
+        self.__counters[0] += 1
+        return True
+
+    def release(self):
+        self.__lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    @staticmethod
+    def verbose():
+        """
+        :return: Dict of the counters of every lock by name.
+        """
+        ret = dict()
+        with StateLock.__registry_lock:
+            items = list(StateLock.__registry.items())
+
+        for name, (acquired, contended, wait_time) in items:
+            ret[name] = {
+                'acquired': acquired,
+                'contended': contended,
+                'contention_ratio': contended / max(1, acquired),
+                'wait_seconds': wait_time}
+
+        return ret
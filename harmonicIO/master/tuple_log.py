@@ -0,0 +1,196 @@
+import os
+import gzip
+import queue
+import array
+import hashlib
+import threading
+from harmonicIO.general.services import SysOut
+from .state_lock import StateLock
+
+
+class TupleLogFile(object):
+    """
+    Background writer of evicted tuple log entries to gzip files, a new file is started once the current one
+    holds file_bytes of uncompressed entries and only the newest max_files files are kept.
+    """
+
+    def __init__(self, directory, file_bytes, max_files):
+        self.__directory = directory
+        self.__file_bytes = file_bytes
+        self.__max_files = max_files
+        self.__blocks = queue.Queue()
+        self.__file = None
+        self.__file_size = 0
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        files = self.__list_files()
+        self.__next_index = files[-1] + 1 if files else 0
+
+        writer = threading.Thread(target=self.__write_loop)
+        writer.daemon = True
+        writer.start()
+
+    def __list_files(self):
+        ret = []
+        for name in os.listdir(self.__directory):
+            if name.startswith("tuples-") and name.endswith(".log.gz") and name[7:-7].isdigit():
+                ret.append(int(name[7:-7]))
+
+        return sorted(ret)
+
+    def __rotate(self):
+        if self.__file:
+            self.__file.close()
+
+        path = os.path.join(self.__directory, "tuples-{0:06d}.log.gz".format(self.__next_index))
+        self.__next_index += 1
+        self.__file = gzip.open(path, 'wb')
+        self.__file_size = 0
+
+        for index in self.__list_files()[0:-self.__max_files]:
+            os.remove(os.path.join(self.__directory, "tuples-{0:06d}.log.gz".format(index)))
+
+    def write(self, block):
+        self.__blocks.put(block)
+
+    def __write_loop(self):
+        while True:
+            block = self.__blocks.get()
+            try:
+                if not self.__file or self.__file_size >= self.__file_bytes:
+                    self.__rotate()
+
+                self.__file.write(block)
+                self.__file.flush()
+                self.__file_size += len(block)
+            except OSError as e:
+                SysOut.err_string("Cannot write the tuple log: {0}".format(e))
+
+
+class TupleLog(object):
+    """
+    Fixed capacity ring buffer of the tuples announced by stream connectors.
+    Entries are stored column by column in arrays, with source and image names interned, instead of one dict
+    per tuple. Every tuple gets a sequence number, sampled tuples are logged, and when the ring is full the
+    oldest entries are overwritten, after being handed in blocks to an optional TupleLogFile.
+    """
+    __digest_size = 16
+
+    def __init__(self, capacity=100000, sample_rate=1.0, log_file=None):
+        self.__capacity = max(1, capacity)
+        self.__sample_rate = sample_rate
+        self.__log_file = log_file
+        self.__block = max(1, self.__capacity // 16)
+        self.__lock = StateLock("tuples")
+
+        self.__ids = array.array('Q', bytes(8 * self.__capacity))
+        self.__timestamps = array.array('q', bytes(8 * self.__capacity))
+        self.__sources = array.array('I', bytes(4 * self.__capacity))
+        self.__images = array.array('I', bytes(4 * self.__capacity))
+        self.__priorities = array.array('H', bytes(2 * self.__capacity))
+        self.__statuses = array.array('B', bytes(self.__capacity))
+        self.__digests = bytearray(TupleLog.__digest_size * self.__capacity)
+
+        self.__strings = []
+        self.__string_index = dict()
+        self.__next_id = 0
+        self.__position = 0
+        self.__length = 0
+
+    def __len__(self):
+        return self.__length
+
+    def get_next_id(self):
+        return self.__next_id
+
+    def __is_sampled(self, digest):
+        if self.__sample_rate >= 1:
+            return True
+
+        # Sample on the digest, so that every retry of a tuple is either logged or not.
+        return int.from_bytes(digest[0:4], 'big') < self.__sample_rate * (1 << 32)
+
+    def __intern(self, value):
+        index = self.__string_index.get(value)
+        if index is None:
+            index = self.__string_index[value] = len(self.__strings)
+            self.__strings.append(value)
+
+        return index
+
+    def __compact_strings(self):
+        strings = self.__strings
+        self.__strings = []
+        self.__string_index = dict()
+        for i in range(self.__length):
+            self.__sources[i] = self.__intern(strings[self.__sources[i]])
+            self.__images[i] = self.__intern(strings[self.__images[i]])
+
+    @staticmethod
+    def __parse_digest(digest):
+        try:
+            return bytes.fromhex(digest)[0:TupleLog.__digest_size].ljust(TupleLog.__digest_size, b"\0")
+        except ValueError:
+            return hashlib.md5(bytes(digest, 'UTF-8')).digest()
+
+    def __get_row(self, i):
+        start = i * TupleLog.__digest_size
+        return (self.__ids[i],
+                self.__strings[self.__sources[i]],
+                self.__strings[self.__images[i]],
+                self.__digests[start:start + TupleLog.__digest_size].hex(),
+                self.__priorities[i],
+                self.__timestamps[i],
+                self.__statuses[i])
+
+    def __flush_block(self, start):
+        lines = []
+        for i in range(start, min(start + self.__block, self.__capacity)):
+            lines.append("\t".join(str(value) for value in self.__get_row(i)))
+
+        self.__log_file.write(bytes("\n".join(lines) + "\n", 'UTF-8'))
+
+    def add(self, source, image_name, digest, priority, timestamp, status):
+        """
+        Log a tuple if it is sampled.
+        :return: Sequence number of the tuple, unique for the lifetime of the master.
+        """
+        digest_b = TupleLog.__parse_digest(digest)
+        with self.__lock:
+            tuple_id = self.__next_id
+            self.__next_id += 1
+            if not self.__is_sampled(digest_b):
+                return tuple_id
+
+            # Rebuild the string table from the live entries before it outgrows the ring.
+            if len(self.__strings) >= 2 * self.__capacity:
+                self.__compact_strings()
+
+            i = self.__position
+            if self.__length == self.__capacity and self.__log_file is not None and i % self.__block == 0:
+                self.__flush_block(i)
+
+            self.__ids[i] = tuple_id
+            self.__sources[i] = self.__intern(source)
+            self.__images[i] = self.__intern(image_name)
+            self.__digests[i * TupleLog.__digest_size:(i + 1) * TupleLog.__digest_size] = digest_b
+            self.__priorities[i] = max(0, min(priority, 0xffff))
+            self.__timestamps[i] = timestamp
+            self.__statuses[i] = status
+
+            self.__position = (i + 1) % self.__capacity
+            self.__length = min(self.__length + 1, self.__capacity)
+
+        return tuple_id
+
+    def get_rows(self, limit=None):
+        """
+        :return: List of the newest entries, oldest first, as tuples
+                 (id, source, image_name, digest, priority, timestamp, status).
+        """
+        with self.__lock:
+            count = self.__length if limit is None else min(limit, self.__length)
+            start = (self.__position - count) % self.__capacity
+            return [self.__get_row((start + i) % self.__capacity) for i in range(count)]
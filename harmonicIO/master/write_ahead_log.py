@@ -0,0 +1,326 @@
+import os
+import time
+import zlib
+import struct
+import threading
+from collections import OrderedDict
+from harmonicIO.general.services import SysOut
+
+
+class WriteAheadLog(object):
+    """
+    Append-only log of the arrivals and removals of queued messages, used to rebuild MessagesQueue after
+    a restart of the master.
+    Records are buffered by the callers and written by a single flusher thread, which issues one fsync
+    per batch of records (group commit) instead of one per message. Once the active log file grows beyond
+    the checkpoint size, a new file is started and the older files are compacted into a checkpoint that
+    only holds the messages which are still queued, so replay time stays bounded by the backlog.
+    A batch that cannot be written or synced is reported as failed to the callers waiting for it, and the log
+    continues in a new file, so that the records appended after it are not stored behind a torn record.
+    """
+    PUSH = 1
+    POP = 2
+
+    # crc32, record type, message id, priority, encoding, image name length, payload length
+    __header = struct.Struct(">IBQHBHI")
+
+    def __init__(self, directory, fsync_interval=0.01, fsync_batch=256, sync_commit=False,
+                 checkpoint_bytes=256 * 1024 * 1024):
+        self.__directory = directory
+        self.__fsync_interval = fsync_interval
+        self.__fsync_batch = fsync_batch
+        self.__sync_commit = sync_commit
+        self.__checkpoint_bytes = checkpoint_bytes
+
+        self.__lock = threading.Lock()
+        self.__flush_needed = threading.Condition(self.__lock)
+        self.__committed = threading.Condition(self.__lock)
+        self.__buffer = []
+        self.__seq = 0
+        self.__durable_seq = 0
+        # Log positions (first, last) of the batches that could not be made durable, kept while a caller may
+        # still wait for one of them, and the log positions callers are to wait for.
+        self.__failed_seqs = []
+        self.__waiting = set()
+        self.__next_id = 1
+
+        self.__file = None
+        self.__file_index = 0
+        self.__file_size = 0
+        self.__checkpoint_thread = None
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def __encode(record_type, msg_id, image_name=b"", payload=b"", priority=0, encoding=0):
+        """
+        :return: Tuple of the parts of the record, so that the payload is written without being copied.
+        """
+        header = WriteAheadLog.__header.pack(0, record_type, msg_id, priority, encoding, len(image_name),
+                                             len(payload))
+        crc = zlib.crc32(payload, zlib.crc32(image_name, zlib.crc32(header[4:]))) & 0xffffffff
+
+        return struct.pack(">I", crc) + header[4:], image_name, payload
+
+    def __get_path(self, index, extension):
+        return os.path.join(self.__directory, "{0:012d}.{1}".format(index, extension))
+
+    def __list_files(self, extension):
+        ret = []
+        for name in os.listdir(self.__directory):
+            stem, _, ext = name.partition(".")
+            if ext == extension and stem.isdigit():
+                ret.append(int(stem))
+
+        return sorted(ret)
+
+    def __get_replay_files(self, last_index):
+        """
+        Files to replay up to the given log index: the latest checkpoint, then the newer log files.
+        """
+        checkpoints = [index for index in self.__list_files("ckpt") if index <= last_index]
+        ret = []
+        first_log = 0
+        if checkpoints:
+            ret.append(self.__get_path(checkpoints[-1], "ckpt"))
+            first_log = checkpoints[-1] + 1
+
+        for index in self.__list_files("wal"):
+            if first_log <= index <= last_index:
+                ret.append(self.__get_path(index, "wal"))
+
+        return ret
+
+    def __scan(self, path, live):
+        """
+        Apply the records of a file to the live message table.
+        Messages are stored by location, so that the payloads do not have to be held in memory.
+        :return: Highest message id found in the file.
+        """
+        max_id = 0
+        offset = 0
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(WriteAheadLog.__header.size)
+                if len(header) < WriteAheadLog.__header.size:
+                    break
+
+                crc, record_type, msg_id, priority, encoding, name_length, data_length = \
+                    WriteAheadLog.__header.unpack(header)
+                body = f.read(name_length + data_length)
+                if len(body) < name_length + data_length or zlib.crc32(header[4:] + body) & 0xffffffff != crc:
+                    SysOut.warn_string("Torn record at the end of {0}, ignored.".format(path))
+                    break
+
+                if record_type == WriteAheadLog.PUSH:
+                    live[msg_id] = (path,
+                                    offset + WriteAheadLog.__header.size + name_length,
+                                    data_length,
+                                    str(body[0:name_length], 'UTF-8'),
+                                    priority,
+                                    encoding)
+                elif record_type == WriteAheadLog.POP:
+                    live.pop(msg_id, None)
+
+                max_id = max(max_id, msg_id)
+                offset += WriteAheadLog.__header.size + name_length + data_length
+
+        return max_id
+
+    @staticmethod
+    def __read_payloads(live):
+        handles = dict()
+        try:
+            for msg_id, (path, offset, length, image_name, priority, encoding) in live.items():
+                if path not in handles:
+                    handles[path] = open(path, 'rb')
+
+                handles[path].seek(offset)
+                yield msg_id, image_name, handles[path].read(length), priority, encoding
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    def recover(self):
+        """
+        Replay the checkpoint and the log files.
+        :return: Generator of (msg_id, image_name, payload, priority, encoding) for every message that was still
+                 queued, in order of arrival.
+        """
+        indexes = self.__list_files("wal") + self.__list_files("ckpt")
+        last_index = max(indexes) if indexes else 0
+
+        live = OrderedDict()
+        for path in self.__get_replay_files(last_index):
+            self.__next_id = max(self.__next_id, self.__scan(path, live) + 1)
+
+        SysOut.out_string("Replaying {0} messages from the write-ahead log.".format(len(live)))
+
+        self.__open_file(last_index + 1)
+        return WriteAheadLog.__read_payloads(live)
+
+    def __open_file(self, index):
+        if self.__file:
+            self.__file.close()
+
+        self.__file_index = index
+        self.__file = open(self.__get_path(index, "wal"), 'ab')
+        self.__file_size = self.__file.tell()
+
+    def start(self):
+        if not self.__file:
+            self.__open_file(1)
+
+        flusher = threading.Thread(target=self.__flush_loop)
+        flusher.daemon = True
+        flusher.start()
+
+    def __append(self, record, waited=False):
+        """
+        :param waited: True if the caller waits for the commit of the record.
+        """
+        with self.__lock:
+            self.__buffer.append(record)
+            self.__seq += 1
+            if waited and self.__sync_commit:
+                self.__waiting.add(self.__seq)
+            if len(self.__buffer) >= self.__fsync_batch:
+                self.__flush_needed.notify()
+
+            return self.__seq
+
+    def append_push(self, image_name, payload, priority=0, encoding=0):
+        """
+        Record the arrival of a message.
+        :return: Tuple (msg_id, seq), seq is the log position to wait for before acknowledging the message, with
+                 wait_for_commit which must then be called.
+        """
+        with self.__lock:
+            msg_id = self.__next_id
+            self.__next_id += 1
+
+        seq = self.__append(WriteAheadLog.__encode(WriteAheadLog.PUSH, msg_id, bytes(image_name, 'UTF-8'), payload,
+                                                   priority, encoding), True)
+        return msg_id, seq
+
+    def append_pop(self, msg_id):
+        return self.__append(WriteAheadLog.__encode(WriteAheadLog.POP, msg_id))
+
+    def __is_failed(self, seq):
+        return any(first <= seq <= last for first, last in self.__failed_seqs)
+
+    def __prune_failed(self):
+        # Failed batches below every log position still to be waited for are not looked up anymore.
+        if self.__failed_seqs:
+            first_waiting = min(self.__waiting) if self.__waiting else self.__seq + 1
+            self.__failed_seqs = [seqs for seqs in self.__failed_seqs if seqs[1] >= first_waiting]
+
+    def wait_for_commit(self, seq):
+        """
+        Block until the given log position is on disk, if commits are synchronous.
+        :return: False if the record could not be written or synced, True otherwise.
+        """
+        if not self.__sync_commit:
+            return True
+
+        with self.__lock:
+            while self.__durable_seq < seq and not self.__is_failed(seq):
+                self.__flush_needed.notify()
+                self.__committed.wait()
+
+            ret = not self.__is_failed(seq)
+            self.__waiting.discard(seq)
+            self.__prune_failed()
+            return ret
+
+    def __flush_loop(self):
+        while True:
+            with self.__lock:
+                if len(self.__buffer) < self.__fsync_batch:
+                    self.__flush_needed.wait(self.__fsync_interval)
+
+                records = self.__buffer
+                self.__buffer = []
+                first_seq = self.__seq - len(records) + 1
+                seq = self.__seq
+
+            if records:
+                try:
+                    if not self.__file:
+                        self.__open_file(self.__file_index + 1)
+
+                    for record in records:
+                        self.__file.writelines(record)
+                        self.__file_size += sum(len(part) for part in record)
+
+                    self.__file.flush()
+                    os.fsync(self.__file.fileno())
+                except OSError as e:
+                    SysOut.err_string("Cannot write the write-ahead log, {0} records failed: {1}".format(
+                        len(records), e))
+                    self.__fail(first_seq, seq)
+                    continue
+
+            with self.__lock:
+                self.__durable_seq = seq
+                self.__committed.notify_all()
+
+            if self.__file_size >= self.__checkpoint_bytes and \
+               (self.__checkpoint_thread is None or not self.__checkpoint_thread.is_alive()):
+                last_index = self.__file_index
+                self.__open_file(last_index + 1)
+
+                self.__checkpoint_thread = threading.Thread(target=self.checkpoint, args=(last_index,))
+                self.__checkpoint_thread.daemon = True
+                self.__checkpoint_thread.start()
+
+    def __fail(self, first_seq, last_seq):
+        """
+        Report a batch that could not be made durable to its waiters. Whether the file was left with a partial
+        record is unknown, and the data of a failed fsync may be lost from the page cache, so the next batch is
+        written to a new file. Records of the failed batch that reached the disk are replayed on recovery.
+        """
+        with self.__lock:
+            if self.__failed_seqs and self.__failed_seqs[-1][1] == first_seq - 1:
+                self.__failed_seqs[-1] = (self.__failed_seqs[-1][0], last_seq)
+            else:
+                self.__failed_seqs.append((first_seq, last_seq))
+            self.__prune_failed()
+            self.__committed.notify_all()
+
+        f = self.__file
+        self.__file = None
+        try:
+            if f:
+                f.close()
+        except OSError:
+            pass
+
+    def checkpoint(self, last_index):
+        """
+        Compact all files up to the given log index into a checkpoint holding the messages that are still
+        queued, then delete the compacted files.
+        """
+        start = time.time()
+        live = OrderedDict()
+        replay_files = self.__get_replay_files(last_index)
+        for path in replay_files:
+            self.__scan(path, live)
+
+        path = self.__get_path(last_index, "ckpt")
+        with open(path + ".tmp", 'wb') as f:
+            for msg_id, image_name, payload, priority, encoding in WriteAheadLog.__read_payloads(live):
+                f.writelines(WriteAheadLog.__encode(WriteAheadLog.PUSH, msg_id, bytes(image_name, 'UTF-8'), payload,
+                                                    priority, encoding))
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.rename(path + ".tmp", path)
+
+        for old_path in replay_files:
+            if old_path != path:
+                os.remove(old_path)
+
+        SysOut.debug_string("Checkpoint of {0} messages written in {1:.2f} s.".format(len(live), time.time() - start))
@@ -0,0 +1,78 @@
+"""
+Compare autoscaling and placement policies offline on a simulated cluster.
+usage: python -m harmonicIO.simulator <scenario.json> [trace.csv]
+The scenario describes the workers, the images with their Poisson arrival phases, and the policies to compare as
+AutoScaler arguments plus an optional "scheduler". Arrivals from a trace file replace those of the scenario.
+"""
+import sys
+import json
+import time
+from harmonicIO.general.services import SysOut
+from harmonicIO.master.autoscaler import AutoScaler
+from harmonicIO.master.scheduler import get_scheduler
+from .simulation import ImageModel, SimulatedWorker, Simulation
+from .trace import poisson_arrivals, read_trace
+
+
+def run_policy(scenario, policy, trace=None):
+    """
+    :param policy: Dict of AutoScaler arguments, with "scheduler" for the placement and "autoscaling" false to
+                   keep the initial containers only.
+    :return: Report of the run.
+    """
+    policy = dict(policy)
+    scheduler = get_scheduler(policy.pop("scheduler", scenario.get("scheduler", "spread")))
+    autoscaler = AutoScaler(**policy) if policy.pop("autoscaling", True) else None
+
+    workers = []
+    for group in scenario["workers"]:
+        group = dict(group)
+        for i in range(group.pop("count", 1)):
+            workers.append(SimulatedWorker("worker-{0}".format(len(workers)), **group))
+
+    images = dict()
+    for image_name, image in scenario["images"].items():
+        image = dict(image)
+        image.pop("arrivals", None)
+        images[image_name] = ImageModel(**image)
+
+    simulation = Simulation(workers, images, autoscaler, scheduler,
+                            max_msg=scenario.get("max_msg", 500),
+                            seed=scenario.get("seed", 0))
+    for i, (image_name, image) in enumerate(sorted(scenario["images"].items())):
+        if trace is not None:
+            simulation.add_arrivals(image_name, trace.get(image_name, []))
+        else:
+            simulation.add_arrivals(image_name, poisson_arrivals(image.get("arrivals", []),
+                                                                 scenario.get("seed", 0) + i))
+
+    return simulation.run(scenario["duration"])
+
+
+def main():
+    if len(sys.argv) < 2:
+        SysOut.terminate_string("usage: python -m harmonicIO.simulator <scenario.json> [trace.csv]")
+
+    with open(sys.argv[1], 'rt') as f:
+        scenario = json.loads(f.read())
+
+    trace = read_trace(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    columns = ["served", "rejected", "queued", "delay_p50", "delay_p90", "delay_p99", "delay_max",
+               "container_seconds", "peak_containers", "scale_out_events", "scale_in_events"]
+    SysOut.usr_string("{0:<16}".format("policy") + "".join("{0:>18}".format(column) for column in columns))
+
+    for name, policy in sorted(scenario.get("policies", {"default": {}}).items()):
+        start = time.perf_counter()
+        summary = run_policy(scenario, policy, trace).summary()
+        elapsed = time.perf_counter() - start
+
+        SysOut.usr_string("{0:<16}".format(name) + "".join(
+            "{0:>18}".format("-" if summary[column] is None else
+                             "{0:.2f}".format(summary[column]) if isinstance(summary[column], float) else
+                             summary[column]) for column in columns))
+        SysOut.debug_string("{0}: {1} simulated seconds in {2:.2f} s".format(name, scenario["duration"], elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+import heapq
+import random
+from harmonicIO.general.definition import Definition
+from harmonicIO.master.messaging_system import ImageQueue
+from harmonicIO.master.scheduler import SpreadScheduler
+
+
+class ImageModel(object):
+    """
+    Behaviour of the containers of one image.
+    """
+
+    def __init__(self, service_time=1.0, pull_delay=30.0, start_delay=2.0, idle_timeout=60.0, initial_containers=0):
+        """
+        :param service_time: Mean seconds to process a tuple, exponentially distributed unless the trace has it.
+        :param pull_delay: Seconds to pull the image onto a worker that does not have it.
+        :param start_delay: Seconds from the creation of a container to its first poll.
+        :param idle_timeout: Seconds after which an idle container started by the autoscaler exits.
+        :param initial_containers: Containers started at time 0 that do not exit when idle.
+        """
+        self.service_time = service_time
+        self.pull_delay = pull_delay
+        self.start_delay = start_delay
+        self.idle_timeout = idle_timeout
+        self.initial_containers = initial_containers
+
+
+class SimulatedWorker(object):
+
+    def __init__(self, addr, cpu_count=4, mem_total=8 * 1024 * 1024 * 1024, ports=20, local_images=()):
+        self.addr = addr
+        self.cpu_count = cpu_count
+        self.mem_total = mem_total
+        self.ports = ports
+        self.local_images = set(local_images)
+        self.pulls = dict()
+        self.containers = set()
+
+    def get_status(self, container_memory):
+        """
+        :return: Worker dict in the format of a worker status, with one unit of load per busy container.
+        """
+        return {Definition.get_str_node_addr(): self.addr,
+                Definition.get_str_node_port(): 0,
+                Definition.get_str_cpu_count(): self.cpu_count,
+                Definition.get_str_load5(): float(sum(1 for container in self.containers if container.busy)),
+                Definition.get_str_mem_total(): self.mem_total,
+                Definition.get_str_mem_available(): self.mem_total - len(self.containers) * container_memory,
+                Definition.REST.get_str_free_ports(): self.ports - len(self.containers),
+                Definition.REST.get_str_local_imgs(): list(self.local_images)}
+
+
+class SimulatedContainer(object):
+
+    def __init__(self, image_name, worker, volatile):
+        self.image_name = image_name
+        self.worker = worker
+        self.volatile = volatile
+        self.started_at = None
+        self.stopped_at = None
+        self.busy = False
+        self.stopping = False
+        self.idle_since = None
+
+
+class Report(object):
+    """
+    Outcome of a simulation run.
+    """
+
+    def __init__(self):
+        self.delays = []
+        self.rejected = 0
+        self.queued = 0
+        self.container_seconds = 0.0
+        self.peak_containers = 0
+        self.scale_events = []
+
+    def get_percentile(self, percentile):
+        if not self.delays:
+            return None
+
+        delays = sorted(self.delays)
+        return delays[min(len(delays) - 1, int(len(delays) * percentile / 100.0))]
+
+    def summary(self):
+        return {"served": len(self.delays),
+                "rejected": self.rejected,
+                "queued": self.queued,
+                "delay_mean": sum(self.delays) / len(self.delays) if self.delays else None,
+                "delay_p50": self.get_percentile(50),
+                "delay_p90": self.get_percentile(90),
+                "delay_p99": self.get_percentile(99),
+                "delay_max": max(self.delays) if self.delays else None,
+                "container_seconds": self.container_seconds,
+                "peak_containers": self.peak_containers,
+                "scale_out_events": sum(1 for event in self.scale_events if event[3] > event[2]),
+                "scale_in_events": sum(1 for event in self.scale_events if event[3] < event[2])}
+
+
+class Simulation(object):
+    """
+    Discrete-event simulation of the master queues, the autoscaler and the container placement, on simulated time.
+    Tuples are queued in the ImageQueue of their image, the autoscaler is the AutoScaler policy evaluated every
+    interval with the statistics the queue supervisor gives it, and containers are placed by a Scheduler on
+    worker dicts in the format of worker statuses. Idle containers take a tuple as soon as it is queued, as in
+    push mode. Scaling in stops idle containers first, busy ones once their tuple is done.
+    """
+
+    def __init__(self, workers, images, autoscaler=None, scheduler=None, max_msg=500, max_bytes=512 * 1024 * 1024,
+                 tuple_size=1024, container_memory=256 * 1024 * 1024, seed=0):
+        """
+        :param workers: List of SimulatedWorker.
+        :param images: Dict of ImageModel by image name.
+        :param autoscaler: AutoScaler, or None to run without autoscaling.
+        :param scheduler: Scheduler placing the containers, SpreadScheduler by default.
+        :param max_msg: Tuples an image queue holds before rejecting.
+        :param max_bytes: Bytes an image queue holds before rejecting.
+        :param tuple_size: Bytes of every tuple.
+        """
+        self.__workers = {worker.addr: worker for worker in workers}
+        self.__images = images
+        self.__autoscaler = autoscaler
+        self.__scheduler = scheduler if scheduler is not None else SpreadScheduler()
+        self.__container_memory = container_memory
+        self.__payload = bytes(tuple_size)
+        self.__queues = {image_name: ImageQueue(max_msg, max_bytes) for image_name in images}
+        self.__random = random.Random(seed)
+        self.__events = []
+        self.__sequence = 0
+        self.__now = 0.0
+        self.__arrivals = dict()
+        self.__next_msg_id = 0
+        self.__containers = {image_name: [] for image_name in images}
+        self.__idle = {image_name: [] for image_name in images}
+        self.__starting = {image_name: 0 for image_name in images}
+        self.__report = Report()
+
+    def get_now(self):
+        return self.__now
+
+    def schedule(self, at, function, *args):
+        heapq.heappush(self.__events, (at, self.__sequence, function, args))
+        self.__sequence += 1
+
+    def add_arrivals(self, image_name, arrivals):
+        """
+        Queue tuples of an image, the arrivals are read one at a time as the simulation reaches them.
+        :param arrivals: Iterable of tuples (time, service time) in time order, the service time being drawn
+                         from the image model when None.
+        """
+        arrivals = iter(arrivals)
+        arrival = next(arrivals, None)
+        if arrival is not None:
+            self.schedule(arrival[0], self.__arrive, image_name, arrival[1], arrivals)
+
+    def __arrive(self, image_name, service_time, arrivals):
+        arrival = next(arrivals, None)
+        if arrival is not None:
+            self.schedule(arrival[0], self.__arrive, image_name, arrival[1], arrivals)
+
+        if service_time is None:
+            service_time = self.__random.expovariate(1.0 / self.__images[image_name].service_time)
+
+        msg_id = self.__next_msg_id
+        if not self.__queues[image_name].push(self.__payload, msg_id):
+            self.__report.rejected += 1
+            return
+
+        self.__queues[image_name].add_arrival()
+
+        self.__next_msg_id += 1
+        self.__arrivals[msg_id] = (self.__now, service_time)
+        if self.__idle[image_name]:
+            self.__serve(self.__idle[image_name].pop())
+
+    def __serve(self, container):
+        entries = self.__queues[container.image_name].pop_batch(1)
+        if not entries:
+            container.idle_since = self.__now
+            self.__idle[container.image_name].append(container)
+            if container.volatile:
+                self.schedule(self.__now + self.__images[container.image_name].idle_timeout,
+                              self.__check_idle, container, self.__now)
+            return
+
+        arrived_at, service_time = self.__arrivals.pop(entries[0][0])
+        self.__report.delays.append(self.__now - arrived_at)
+        container.busy = True
+        self.schedule(self.__now + service_time, self.__complete, container)
+
+    def __complete(self, container):
+        container.busy = False
+        if container.stopping:
+            self.__stop(container)
+        else:
+            self.__serve(container)
+
+    def __check_idle(self, container, idle_since):
+        if container.stopped_at is None and not container.busy and container.idle_since == idle_since:
+            self.__idle[container.image_name].remove(container)
+            self.__stop(container)
+
+    def __stop(self, container):
+        container.stopped_at = self.__now
+        self.__report.container_seconds += self.__now - container.started_at
+        container.worker.containers.discard(container)
+        self.__containers[container.image_name].remove(container)
+
+    def launch(self, image_name, worker, volatile=True):
+        """
+        Create a container of an image on a worker, pulling the image first if the worker does not have it.
+        """
+        model = self.__images[image_name]
+        container = SimulatedContainer(image_name, worker, volatile)
+        worker.containers.add(container)
+
+        ready_at = self.__now
+        if image_name not in worker.local_images:
+            ready_at = worker.pulls.get(image_name)
+            if ready_at is None:
+                ready_at = worker.pulls[image_name] = self.__now + model.pull_delay
+                self.schedule(ready_at, self.__pulled, worker, image_name)
+
+        self.__starting[image_name] += 1
+        self.schedule(ready_at + model.start_delay, self.__start, container)
+
+    @staticmethod
+    def __pulled(worker, image_name):
+        worker.local_images.add(image_name)
+        worker.pulls.pop(image_name, None)
+
+    def __start(self, container):
+        self.__starting[container.image_name] -= 1
+        container.started_at = self.__now
+        self.__containers[container.image_name].append(container)
+        self.__report.peak_containers = max(self.__report.peak_containers,
+                                            sum(len(containers) for containers in self.__containers.values()))
+        self.__serve(container)
+
+    def __place(self, image_name, num):
+        workers = {addr: worker.get_status(self.__container_memory) for addr, worker in self.__workers.items()}
+        for addr, _ in self.__scheduler.place(workers, image_name, num):
+            self.launch(image_name, self.__workers[addr])
+
+    def __remove(self, image_name, num):
+        containers = [container for container in self.__containers[image_name] if not container.stopping]
+        for container in sorted(containers, key=lambda container: container.busy)[:num]:
+            container.stopping = True
+            if not container.busy:
+                self.__idle[image_name].remove(container)
+                self.__stop(container)
+
+    def get_scaling_statistics(self):
+        """
+        :return: Statistics for the autoscaler, as given by the queue supervisor.
+        """
+        ret = dict()
+        for image_name, queue in self.__queues.items():
+            length, _, popped, arrived = queue.get_counters()
+            containers = sum(1 for container in self.__containers[image_name] if not container.stopping)
+            ret[image_name] = (length, arrived, popped, containers, self.__starting[image_name])
+
+        return ret
+
+    def __supervise(self):
+        for image_name, current, desired in self.__autoscaler.evaluate(self.__now, self.get_scaling_statistics()):
+            self.__report.scale_events.append((self.__now, image_name, current, desired))
+            if desired > current:
+                self.__place(image_name, desired - current)
+            else:
+                self.__remove(image_name, current - desired)
+
+        self.schedule(self.__now + self.__autoscaler.get_interval(), self.__supervise)
+
+    def run(self, duration):
+        """
+        Simulate from time 0 to duration.
+        :return: Report of the run.
+        """
+        for image_name, model in self.__images.items():
+            workers = {addr: worker.get_status(self.__container_memory) for addr, worker in self.__workers.items()}
+            for addr, _ in self.__scheduler.place(workers, image_name, model.initial_containers):
+                self.launch(image_name, self.__workers[addr], volatile=False)
+
+        if self.__autoscaler is not None:
+            self.schedule(self.__autoscaler.get_interval(), self.__supervise)
+
+        while self.__events and self.__events[0][0] <= duration:
+            self.__now, _, function, args = heapq.heappop(self.__events)
+            function(*args)
+
+        self.__now = duration
+        for containers in self.__containers.values():
+            for container in containers:
+                self.__report.container_seconds += duration - container.started_at
+
+        self.__report.queued = sum(len(queue) for queue in self.__queues.values())
+        return self.__report
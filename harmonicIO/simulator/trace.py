@@ -0,0 +1,43 @@
+import csv
+import random
+
+
+def poisson_arrivals(phases, seed=0):
+    """
+    Arrivals of a Poisson process whose rate changes from phase to phase.
+    :param phases: List of pairs (duration in seconds, tuples per second).
+    :return: Generator of tuples (time, None), the service time being left to the image model.
+    """
+    rand = random.Random(seed)
+    start = 0.0
+    for duration, rate in phases:
+        end = start + duration
+        now = start
+        while rate > 0:
+            now += rand.expovariate(rate)
+            if now >= end:
+                break
+
+            yield now, None
+
+        start = end
+
+
+def read_trace(path):
+    """
+    Read recorded arrivals from a CSV file with the columns time, image name and optionally service time.
+    :return: Dict by image name of lists of tuples (time, service time or None) in time order.
+    """
+    ret = dict()
+    with open(path, 'rt') as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith('#'):
+                continue
+
+            service_time = float(row[2]) if len(row) > 2 and row[2] else None
+            ret.setdefault(row[1].strip(), []).append((float(row[0]), service_time))
+
+    for arrivals in ret.values():
+        arrivals.sort(key=lambda arrival: arrival[0])
+
+    return ret
@@ -1,12 +1,16 @@
 """
 This module contain information about the master node and its connector
 """
+import json
 import urllib3
 import time
 import socket
 import hashlib
+from collections import deque
 from harmonicIO.general.services import SysOut, Services
-from harmonicIO.general.definition import Definition, CRole
+from harmonicIO.general.definition import Definition, Key, CRole
+from harmonicIO.general.wire_protocol import StreamHeader, FrameHeader, FrameAck
+from harmonicIO.general.compression import Encoding, Compression
 
 
 class LocalError(object):
@@ -35,10 +39,15 @@ class LocalError(object):
     def err_invalid_data_container_type():
         SysOut.terminate_string("Invalid data type! Require ByteArray, but got others")
 
+    @staticmethod
+    def err_invalid_protocol_version():
+        SysOut.terminate_string("Invalid protocol version! Require 1 or 2, but got others!")
+
 
 class StreamConnector(object):
 
-    def __init__(self, server_addr, server_port, token="None", std_idle_time=0, max_try=9, source_name=None):
+    def __init__(self, server_addr, server_port, token="None", std_idle_time=0, max_try=9, source_name=None,
+                 protocol_version=1, window=64):
         # Check instance type
         if not isinstance(server_port, int):
             LocalError.err_invalid_port()
@@ -55,6 +64,10 @@ class StreamConnector(object):
         if not isinstance(max_try, int):
             LocalError.err_invalid_max_try_type()
 
+        # Check stream protocol version
+        if protocol_version not in [1, 2]:
+            LocalError.err_invalid_protocol_version()
+
         """
         System definitions.
         """
@@ -79,6 +92,19 @@ class StreamConnector(object):
         # URL Request
         self.__connector = urllib3.PoolManager()
 
+        # Version 2 stream protocol: one persistent connection to the messaging system, with up to
+        # window frames sent ahead of their acknowledgement. Frames not acknowledged when the connection
+        # is lost are sent again on the next one, frames the messaging system rejects are reported as failed.
+        self.__protocol_version = protocol_version
+        self.__window = max(1, window)
+        self.__ms_socket = None
+        self.__ms_end_point = None
+        self.__last_end_point = None
+        self.__in_flight = deque()
+        self.__unacked = deque()
+        self.__failed = []
+        self.__seq = 0
+
     def is_master_alive(self):
         """
         Check for the master status that is it alive or not!
@@ -140,10 +166,10 @@ class StreamConnector(object):
             return False
 
         try:
-            content = eval(response.data.decode('utf-8'))
+            content = json.loads(response.data.decode('utf-8'))
             return content
 
-        except:
+        except ValueError:
             SysOut.warn_string("JSON content error from the master!")
             return False
 
@@ -188,7 +214,7 @@ class StreamConnector(object):
         except:
             SysOut.warn_string("Cannot stream data to an end point!")
 
-    def __push_stream_end_point_MS(self, t_addr, t_port, data, image_name):
+    def __push_stream_end_point_MS(self, t_addr, t_port, data, image_name, priority=0):
         """
         Create a client socket to connect to server
         :param target: Tuple with three parameter from the endpoint request
@@ -219,13 +245,7 @@ class StreamConnector(object):
                 return False
 
             # Generate header string
-            image_name_b = bytes(image_name, 'UTF-8')
-            image_name_l = str(len(image_name_b))
-
-            while len(image_name_l) < 3:
-                image_name_l = "0" + image_name_l
-
-            image_name_t = bytes(image_name_l, 'UTF-8') + image_name_b
+            image_name_t = StreamHeader.encode(image_name, priority)
 
             with s:
                 # Identifying object id
@@ -239,6 +259,185 @@ class StreamConnector(object):
         except:
             SysOut.warn_string("Cannot stream data to an end point!")
 
+    def __get_ms_connection(self, t_addr, t_port):
+        """
+        Return the persistent connection to the messaging system, open it if needed. The frames left without
+        acknowledgement by the previous connection are sent again first.
+        """
+        if self.__ms_socket and self.__ms_end_point == (t_addr, t_port):
+            return self.__ms_socket
+
+        self.__close_ms_connection()
+
+        s = socket.create_connection((t_addr, t_port))
+        s.sendall(FrameHeader.MAGIC)
+        self.__ms_socket = s
+        self.__ms_end_point = (t_addr, t_port)
+        self.__last_end_point = (t_addr, t_port)
+        self.__seq = 0
+
+        if self.__unacked:
+            SysOut.warn_string("Sending {0} unacknowledged tuples again.".format(len(self.__unacked)))
+        while self.__unacked:
+            self.__send_frame(self.__unacked[0])
+            self.__unacked.popleft()
+
+        return s
+
+    def __send_frame(self, frame):
+        """
+        :param frame: Dict with the image name, tuple id, header and payload of the frame.
+        """
+        self.__ms_socket.sendall(frame["header"])
+        self.__ms_socket.sendall(frame["data"])
+        frame["seq"] = self.__seq
+        self.__in_flight.append(frame)
+        self.__seq += 1
+
+    def __close_ms_connection(self):
+        # The frames still waiting for an acknowledgement go first on the next connection.
+        while self.__in_flight:
+            self.__unacked.appendleft(self.__in_flight.pop())
+
+        if self.__ms_socket:
+            try:
+                self.__ms_socket.close()
+            except OSError:
+                pass
+
+        self.__ms_socket = None
+        self.__ms_end_point = None
+
+    def __read_acks(self, max_in_flight, current=None):
+        """
+        Read acknowledgements until at most max_in_flight frames are waiting for one. Rejected frames are
+        recorded as failed, except the current one.
+        :return: False if the current frame was rejected.
+        """
+        accepted = True
+        while len(self.__in_flight) > max_in_flight:
+            data = bytearray()
+            while len(data) < FrameAck.size:
+                c = self.__ms_socket.recv(FrameAck.size - len(data))
+                if not c:
+                    raise OSError("Connection closed by the messaging system.")
+                data += c
+
+            status, seq = FrameAck.decode(data)
+            frame = self.__in_flight[0]
+            if seq != frame["seq"] & 0xffffffff:
+                raise OSError("Acknowledgement out of order.")
+
+            self.__in_flight.popleft()
+            if status == FrameAck.OK:
+                continue
+
+            if status == FrameAck.QUEUE_FULL:
+                SysOut.warn_string("Queue in master is full, tuple for {0} was rejected.".format(frame["image_name"]))
+            else:
+                SysOut.warn_string("Messaging system rejected a tuple for {0}.".format(frame["image_name"]))
+
+            if frame is current:
+                accepted = False
+            else:
+                self.__failed.append((frame["image_name"], frame["tuple_id"]))
+
+        return accepted
+
+    def __push_frame_MS(self, t_addr, t_port, data, image_name, priority, digest, encoding=Encoding.IDENTITY,
+                        tuple_id=None):
+        """
+        Send data to the messaging system as a frame on the persistent connection.
+        :return: False if the frame was not sent, or if it was rejected by the messaging system before the call
+                 returned, in which case the caller may send it again.
+        """
+        priority = max(0, min(int(priority or 0), StreamHeader.MAX_PRIORITY))
+        frame = {"image_name": image_name,
+                 "tuple_id": tuple_id,
+                 "header": FrameHeader.encode(image_name, len(data), digest, priority, encoding),
+                 "data": data}
+        try:
+            self.__get_ms_connection(t_addr, t_port)
+            self.__send_frame(frame)
+
+            # Pipelining: only wait for acknowledgements once the window is full.
+            return self.__read_acks(self.__window - 1, frame)
+
+        except OSError as e:
+            SysOut.warn_string("Cannot stream data to the messaging system: {0}".format(e))
+            self.__close_ms_connection()
+            # The caller sends the current tuple again, the other unacknowledged ones are sent on reconnect.
+            self.__unacked = deque(unacked for unacked in self.__unacked if unacked is not frame)
+            return False
+
+    def flush(self):
+        """
+        Wait until every tuple sent on the persistent connection has been acknowledged.
+        :return: True if every tuple was acknowledged, rejected ones are listed by get_failed_tuples.
+        """
+        try:
+            if self.__unacked and self.__last_end_point:
+                self.__get_ms_connection(*self.__last_end_point)
+
+            if not self.__ms_socket:
+                return not self.__unacked
+
+            self.__read_acks(0)
+            return True
+        except OSError as e:
+            SysOut.warn_string("Cannot read acknowledgements from the messaging system: {0}".format(e))
+            self.__close_ms_connection()
+            return False
+
+    def get_failed_tuples(self):
+        """
+        Tuples sent ahead of their acknowledgement that the messaging system rejected, such as when the queue of
+        their image was full, or that could not be sent again before the connector was closed.
+        :return: List of tuples (image name, tuple id), the tuple id being the MD5 hex digest of the data. The list
+                 is cleared.
+        """
+        ret = self.__failed
+        self.__failed = []
+        return ret
+
+    def close(self):
+        """
+        Flush and close the persistent connection to the messaging system.
+        """
+        self.flush()
+        self.__close_ms_connection()
+
+        if self.__unacked:
+            SysOut.warn_string("{0} tuples sent to the messaging system were not acknowledged!".format(
+                len(self.__unacked)))
+            self.__failed.extend((frame["image_name"], frame["tuple_id"]) for frame in self.__unacked)
+            self.__unacked.clear()
+
+    @staticmethod
+    def __encode_for(end_point, data, md5):
+        """
+        Compress data as negotiated with the master for the image of the tuple.
+        :return: Tuple (payload, MD5 digest of the payload, encoding)
+        """
+        try:
+            encoding = Encoding.get_encoding(end_point.get(Key.ENCODING, "identity"))
+        except ValueError:
+            encoding = Encoding.IDENTITY
+
+        threshold = end_point.get(Key.THRESHOLD, 0)
+        payload, encoding = Compression.encode(data, encoding, threshold)
+        if encoding == Encoding.IDENTITY:
+            return data, md5.digest(), encoding
+
+        return payload, hashlib.md5(payload).digest(), encoding
+
+    @staticmethod
+    def get_compression_statistics():
+        """
+        Compression ratio and CPU time spent compressing tuples, per encoding.
+        """
+        return Compression.verbose()
+
     def send_data(self, container_name, container_os, data, priority=None):
         # The data must be byte array
         if not isinstance(data, bytearray):
@@ -248,7 +447,8 @@ class StreamConnector(object):
             SysOut.err_string("No content in byte array.")
             return None
 
-        digest = hashlib.md5(data).hexdigest()
+        md5 = hashlib.md5(data)
+        digest = md5.hexdigest()
 
         end_point = None
 
@@ -262,9 +462,9 @@ class StreamConnector(object):
 
         # Send data to worker for processing directly
         counter = self.__max_try
-        if end_point[Definition.get_str_node_role()] == CRole.WORKER:
-            while not self.__push_stream_end_point(end_point[Definition.get_str_node_addr()],
-                                                   end_point[Definition.get_str_node_port()],
+        if end_point[Key.NODE_ROLE] == CRole.WORKER:
+            while not self.__push_stream_end_point(end_point[Key.NODE_ADDR],
+                                                   end_point[Key.NODE_PORT],
                                                    data):
                 time.sleep(self.__std_idle_time)
                 counter -= 1
@@ -272,12 +472,30 @@ class StreamConnector(object):
                     SysOut.err_string("Cannot contact server. Exceed maximum retry {0}!".format(self.__max_try))
                     return False
 
+        # Send data to master for queuing on the persistent connection
+        elif end_point[Key.NODE_ROLE] == CRole.MESSAGING_SYSTEM and self.__protocol_version == 2:
+            payload, payload_digest, encoding = self.__encode_for(end_point, data, md5)
+            while not self.__push_frame_MS(end_point[Key.NODE_ADDR],
+                                           end_point[Key.NODE_PORT],
+                                           payload,
+                                           container_name,
+                                           priority,
+                                           payload_digest,
+                                           encoding,
+                                           digest):
+                time.sleep(self.__std_idle_time)
+                counter -= 1
+                if counter == 0:
+                    SysOut.err_string("Cannot contact server. Exceed maximum retry {0}!".format(self.__max_try))
+                    return False
+
         # Send data to master for queuing (?)
-        elif end_point[Definition.get_str_node_role()] == CRole.MESSAGING_SYSTEM:
-            while not self.__push_stream_end_point_MS(end_point[Definition.get_str_node_addr()],
-                                                      end_point[Definition.get_str_node_port()],
+        elif end_point[Key.NODE_ROLE] == CRole.MESSAGING_SYSTEM:
+            while not self.__push_stream_end_point_MS(end_point[Key.NODE_ADDR],
+                                                      end_point[Key.NODE_PORT],
                                                       data,
-                                                      container_name):
+                                                      container_name,
+                                                      priority):
                 time.sleep(self.__std_idle_time)
                 counter -= 1
                 if counter == 0:
@@ -286,20 +504,20 @@ class StreamConnector(object):
         else:
             return False
 
-        if end_point[Definition.get_str_node_role()] == CRole.WORKER:
+        if end_point[Key.NODE_ROLE] == CRole.WORKER:
             SysOut.out_string(
-                "Push data to worker ({0}:{1}>{2}) successful.".format(end_point[Definition.get_str_node_addr()],
-                                                                       end_point[Definition.get_str_node_port()],
+                "Push data to worker ({0}:{1}>{2}) successful.".format(end_point[Key.NODE_ADDR],
+                                                                       end_point[Key.NODE_PORT],
                                                                        container_name))
-        elif end_point[Definition.get_str_node_role()] == CRole.MESSAGING_SYSTEM:
+        elif end_point[Key.NODE_ROLE] == CRole.MESSAGING_SYSTEM:
             SysOut.out_string("Push data to messaging system ({0}:{1}>{2}) successful.".format(
-                end_point[Definition.get_str_node_addr()],
-                end_point[Definition.get_str_node_port()],
+                end_point[Key.NODE_ADDR],
+                end_point[Key.NODE_PORT],
                 container_name))
         else:
             SysOut.out_string(
-                "Push data to unknown ({0}:{1}>{2}) successful.".format(end_point[Definition.get_str_node_addr()],
-                                                                        end_point[Definition.get_str_node_port()],
+                "Push data to unknown ({0}:{1}>{2}) successful.".format(end_point[Key.NODE_ADDR],
+                                                                        end_point[Key.NODE_PORT],
                                                                         container_name))
 
     def get_data_container(self):
@@ -41,6 +41,11 @@ def update_worker_status():
     content = Services.get_machine_status(Setting, CRole.WORKER)
     content[Definition.REST.get_str_docker()] = DockerService.get_containers_status()
     content[Definition.REST.get_str_local_imgs()] = DockerService.get_local_images()
+    content[Definition.REST.get_str_pending_operations()] = DockerService.get_pending_operations()
+    content[Definition.Docker.get_str_creating()] = DockerService.get_creating_containers()
+    content[Definition.get_str_warm_pool()] = DockerService.get_warm_pool_status()
+    content[Definition.Docker.get_str_image_pulls()] = DockerService.get_image_pulls()
+    content[Definition.REST.get_str_free_ports()] = DockerService.get_available_port_count()
     
     s_content = bytes(json.dumps(content), 'utf-8')
 
@@ -86,7 +91,8 @@ if __name__ == "__main__":
 
     # Init docker driver
     from .docker_service import DockerService
-    DockerService.init()
+    DockerService.init(Setting.get_operation_workers(), Setting.get_warm_pool(), Setting.get_warm_pool_volatile(),
+                       Setting.get_image_disk_budget(), Setting.get_pull_workers())
 
     # Create thread for handling REST Service
     from concurrent.futures import ThreadPoolExecutor
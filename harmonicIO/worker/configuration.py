@@ -13,6 +13,13 @@ class Setting(object):
     __node_external_addr = None
     __node_internal_addr = None
     __container_idle_timeout = None
+    __rest_server = "simple"
+    __rest_workers = 16
+    __operation_workers = 4
+    __warm_pool = {}
+    __warm_pool_volatile = True
+    __image_disk_budget = 0
+    __pull_workers = 2
 
     @staticmethod
     def set_node_addr(addr=None):
@@ -93,6 +100,34 @@ class Setting(object):
     def get_container_idle_timeout():
         return Setting.__container_idle_timeout
 
+    @staticmethod
+    def get_rest_server():
+        return Setting.__rest_server
+
+    @staticmethod
+    def get_rest_workers():
+        return Setting.__rest_workers
+
+    @staticmethod
+    def get_operation_workers():
+        return Setting.__operation_workers
+
+    @staticmethod
+    def get_warm_pool():
+        return Setting.__warm_pool
+
+    @staticmethod
+    def get_warm_pool_volatile():
+        return Setting.__warm_pool_volatile
+
+    @staticmethod
+    def get_image_disk_budget():
+        return Setting.__image_disk_budget
+
+    @staticmethod
+    def get_pull_workers():
+        return Setting.__pull_workers
+
     @staticmethod
     def read_cfg_from_file():
         from harmonicIO.general.services import Services
@@ -132,6 +167,19 @@ class Setting(object):
                         elif cfg[Definition.get_str_data_port_range()][0] > \
                              cfg[Definition.get_str_data_port_range()][1]:
                             SysOut.terminate_string("Start port range must greater than stop port range.")
+                        elif cfg.get(Definition.get_str_rest_server(), "simple") not in ["simple", "threaded"]:
+                            SysOut.terminate_string("REST server must be simple or threaded.")
+                        elif not isinstance(cfg.get(Definition.get_str_rest_workers(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_operation_workers(), 0), int):
+                            SysOut.terminate_string("REST and operation workers must be integer.")
+                        elif not isinstance(cfg.get(Definition.get_str_warm_pool(), {}), dict) or \
+                             not all(isinstance(size, int)
+                                     for size in cfg.get(Definition.get_str_warm_pool(), {}).values()):
+                            SysOut.terminate_string("Warm pool must be dict of image names to integer sizes.")
+                        elif not isinstance(cfg.get(Definition.get_str_image_disk_budget(), 0), int) or \
+                             not isinstance(cfg.get(Definition.get_str_pull_workers(), 1), int) or \
+                             cfg.get(Definition.get_str_pull_workers(), 1) < 1:
+                            SysOut.terminate_string("Image disk budget and pull workers must be integer.")
                         else:
                             Setting.set_node_addr()
                             import multiprocessing
@@ -144,6 +192,17 @@ class Setting(object):
                             Setting.__master_port = cfg[Definition.get_str_master_port()]
                             Setting.__node_external_addr = cfg[Definition.get_str_node_external_addr()].strip().lower()
                             Setting.__container_idle_timeout = cfg[Definition.get_str_container_idle_timeout()]
+                            Setting.__rest_server = cfg.get(Definition.get_str_rest_server(), Setting.__rest_server)
+                            Setting.__rest_workers = cfg.get(Definition.get_str_rest_workers(), Setting.__rest_workers)
+                            Setting.__operation_workers = cfg.get(Definition.get_str_operation_workers(),
+                                                                  Setting.__operation_workers)
+                            Setting.__warm_pool = cfg.get(Definition.get_str_warm_pool(), Setting.__warm_pool)
+                            Setting.__warm_pool_volatile = bool(cfg.get(Definition.get_str_warm_pool_volatile(),
+                                                                        Setting.__warm_pool_volatile))
+                            Setting.__image_disk_budget = cfg.get(Definition.get_str_image_disk_budget(),
+                                                                  Setting.__image_disk_budget)
+                            Setting.__pull_workers = cfg.get(Definition.get_str_pull_workers(),
+                                                             Setting.__pull_workers)
 
                             # Check for auto node name
                             if Setting.__node_name.lower() == "auto":
@@ -1,10 +1,12 @@
 import socket
+import threading
 import docker
 from .configuration import Setting
 from harmonicIO.general.definition import CStatus, Definition
 from harmonicIO.general.services import SysOut
 
-from docker.errors import APIError
+from docker.errors import APIError, ImageNotFound
+from docker.utils import parse_repository_tag
 from requests.exceptions import HTTPError
 
 class ChannelStatus(object):
@@ -30,6 +32,8 @@ class DockerMaster(object):
 
     def __init__(self):
         self.__ports = []
+        self.__ports_lock = threading.Lock()
+        self.__reserved_ports = set()
 
         self.__client = docker.from_env()
 
@@ -57,11 +61,30 @@ class DockerMaster(object):
 
     def __update_ports(self):
         for port in self.__ports:
-            if port.is_port_open():
+            if port.is_port_open() or port.port in self.__reserved_ports:
                 port.status = CStatus.BUSY
             else:
                 port.status = CStatus.AVAILABLE
 
+    def __reserve_port(self):
+        # Containers are created concurrently, a port stays reserved until docker has published it.
+        with self.__ports_lock:
+            self.__update_ports()
+            port = self.__get_available_port()
+            if port:
+                self.__reserved_ports.add(port)
+
+        return port
+
+    def __release_port(self, port):
+        with self.__ports_lock:
+            self.__reserved_ports.discard(port)
+
+    def get_available_port_count(self):
+        with self.__ports_lock:
+            self.__update_ports()
+            return sum(1 for port in self.__ports if port.status == CStatus.AVAILABLE)
+
     def get_containers_status(self):
 
         def get_container_status(input):
@@ -69,6 +92,8 @@ class DockerMaster(object):
             res[Definition.Container.Status.get_str_sid()] = input.short_id
             res[Definition.Container.Status.get_str_image()] = input.image.tags
             res[Definition.Container.Status.get_str_status()] = input.status
+            # image name as given when the container was run, to match the desired replicas of the master
+            res[Definition.Container.get_str_con_image_name()] = input.attrs.get('Config', {}).get('Image')
             return res
 
         res = []
@@ -88,39 +113,152 @@ class DockerMaster(object):
         
         return local_imgs
 
+    def pull_image(self, image_name, on_progress):
+        """
+        Pull an image, following the progress of its layers.
+        :param on_progress: Function called with each progress event of the docker engine.
+        :return: True if the image was pulled.
+        """
+        repository, tag = parse_repository_tag(image_name)
+        try:
+            for event in self.__client.api.pull(repository, tag or 'latest', stream=True, decode=True):
+                if 'error' in event:
+                    SysOut.err_string("Could not pull image {}: {}".format(image_name, event['error']))
+                    return False
+
+                on_progress(event)
+        except (APIError, HTTPError) as e:
+            SysOut.err_string("Could not pull image {}, exception:\n{}".format(image_name, e))
+            return False
+
+        return True
+
+    def get_disk_usage(self):
+        """
+        :return: Tuple (bytes taken by all image layers, list of tuples (image id, tags, bytes not shared with
+                 other images, number of containers using the image)).
+        """
+        usage = self.__client.df()
+        images = []
+        for image in usage.get('Images') or []:
+            images.append((image['Id'], image.get('RepoTags') or [],
+                           image.get('Size', 0) - max(image.get('SharedSize', 0), 0),
+                           image.get('Containers', 0)))
+
+        return usage.get('LayersSize', 0), images
+
+    def remove_image(self, image_id):
+        # images used by a container, even a stopped one, are not removed
+        try:
+            self.__client.images.remove(image_id)
+            return True
+        except (APIError, HTTPError) as e:
+            SysOut.debug_string("Could not remove image {}, exception:\n{}".format(image_id, e))
+            return False
+
     def delete_container(self, cont_shortid):
         # remove a container from the worker by provided short id, only removes exited containers
         try:
             self.__client.containers.get(cont_shortid).remove()
             return True
-        except (ApiError, HTTPError) as e:
+        except (APIError, HTTPError) as e:
             SysOut.err_string("Could not remove requested container, exception:\n{}".format(e))
             return False
 
+    def stop_containers(self, short_ids, timeout=10):
+        """
+        Stop containers by short id, the garbage collector removes them once exited.
+        :return: Number of containers stopped.
+        """
+        stopped = 0
+        for short_id in short_ids:
+            try:
+                self.__client.containers.get(short_id).stop(timeout=timeout)
+                stopped += 1
+            except (APIError, HTTPError) as e:
+                SysOut.err_string("Could not stop container {}, exception:\n{}".format(short_id, e))
+
+        return stopped
+
+
+    @staticmethod
+    def __get_ports_setting(expose, ports):
+        return {str(expose) + '/tcp': ports}
+
+    @staticmethod
+    def __get_env_setting(container_name, expose, a_port, volatile):
+        ret = dict()
+        ret[Definition.Docker.HDE.get_str_node_name()] = container_name
+        ret[Definition.Docker.HDE.get_str_node_addr()] = Setting.get_node_addr()
+        ret[Definition.Docker.HDE.get_str_node_rest_port()] = Setting.get_node_port()
+        ret[Definition.Docker.HDE.get_str_node_data_port()] = expose
+        ret[Definition.Docker.HDE.get_str_node_forward_port()] = a_port
+        ret[Definition.Docker.HDE.get_str_master_addr()] = Setting.get_master_addr()
+        ret[Definition.Docker.HDE.get_str_master_port()] = Setting.get_master_port()
+        ret[Definition.Docker.HDE.get_str_std_idle_time()] = Setting.get_std_idle_time()
+        ret[Definition.Docker.HDE.get_str_token()] = Setting.get_token()
+        if volatile:
+            ret[Definition.Docker.HDE.get_str_idle_timeout()] = Setting.get_container_idle_timeout()
+        return ret
+
+    def create_container(self, container_name, volatile=False):
+        """
+        Create a container without starting it, pulling its image if needed. Its data port stays reserved until
+        the container is started or removed.
+        :return: Tuple (container, port) or None.
+        """
+        expose_port = 80
+        port = self.__reserve_port()
+        if not port:
+            SysOut.err_string("No more port available!")
+            return None
+
+        def create():
+            return self.__client.containers.create(container_name,
+                                                   ports=self.__get_ports_setting(expose_port, port),
+                                                   environment=self.__get_env_setting(container_name, expose_port,
+                                                                                      port, volatile),
+                                                   labels={Definition.get_str_warm_pool(): container_name})
+
+        try:
+            try:
+                return create(), port
+            except ImageNotFound:
+                self.__client.images.pull(container_name)
+                return create(), port
+        except (APIError, HTTPError) as e:
+            self.__release_port(port)
+            SysOut.err_string("Could not create container of {}, exception:\n{}".format(container_name, e))
+            return None
+
+    def start_container(self, container, port):
+        """
+        Start a container made by create_container.
+        :return: Short id of the container or False.
+        """
+        try:
+            container.start()
+            return container.short_id
+        except (APIError, HTTPError) as e:
+            SysOut.err_string("Could not start container {}, exception:\n{}".format(container.short_id, e))
+            return False
+        finally:
+            self.__release_port(port)
+
+    def remove_created_containers(self):
+        """
+        Remove the containers left created but not started by create_container, such as a former warm pool.
+        """
+        for container in self.__client.containers.list(all=True, filters={'label': Definition.get_str_warm_pool(),
+                                                                           'status': 'created'}):
+            try:
+                container.remove()
+            except (APIError, HTTPError) as e:
+                SysOut.err_string("Could not remove container {}, exception:\n{}".format(container.short_id, e))
 
     def run_container(self, container_name, volatile=False):
+        port = self.__reserve_port()
 
-        def get_ports_setting(expose, ports):
-            return {str(expose) + '/tcp': ports}
-
-        def get_env_setting(expose, a_port, volatile):
-            ret = dict()
-            ret[Definition.Docker.HDE.get_str_node_name()] = container_name
-            ret[Definition.Docker.HDE.get_str_node_addr()] = Setting.get_node_addr()
-            ret[Definition.Docker.HDE.get_str_node_rest_port()] = Setting.get_node_port()
-            ret[Definition.Docker.HDE.get_str_node_data_port()] = expose
-            ret[Definition.Docker.HDE.get_str_node_forward_port()] = a_port
-            ret[Definition.Docker.HDE.get_str_master_addr()] = Setting.get_master_addr()
-            ret[Definition.Docker.HDE.get_str_master_port()] = Setting.get_master_port()
-            ret[Definition.Docker.HDE.get_str_std_idle_time()] = Setting.get_std_idle_time()
-            ret[Definition.Docker.HDE.get_str_token()] = Setting.get_token()
-            if volatile:
-                ret[Definition.Docker.HDE.get_str_idle_timeout()] = Setting.get_container_idle_timeout()
-            return ret
-
-        self.__update_ports()
-
-        port = self.__get_available_port()
         expose_port = 80
 
         if not port:
@@ -128,16 +266,16 @@ class DockerMaster(object):
             return False
         else:
             print('starting container ' + container_name)
-            res = self.__client.containers.run(container_name,
-                                               detach=True,
-                                               stderr=True,
-                                               stdout=True,
-                                               ports=get_ports_setting(expose_port, port),
-                                               environment=get_env_setting(expose_port, port, volatile))
-            import time
-            time.sleep(1)
-            print('..created container, logs:')
-            print(res.logs(stdout=True, stderr=True))
+            try:
+                res = self.__client.containers.run(container_name,
+                                                   detach=True,
+                                                   stderr=True,
+                                                   stdout=True,
+                                                   ports=self.__get_ports_setting(expose_port, port),
+                                                   environment=self.__get_env_setting(container_name, expose_port,
+                                                                                      port, volatile))
+            finally:
+                self.__release_port(port)
 
             if res:
                 SysOut.out_string("Container " + container_name + " is created!")
@@ -1,21 +1,150 @@
+import threading
+from harmonicIO.general.definition import Definition
 from .docker_master import DockerMaster
+from .operations import ContainerOperations
+from .warm_pool import WarmPool
+from .image_store import ImageStore
 
 
 class DockerService(object):
     __docker_master = None
+    __operations = None
+    __warm_pool = None
+    __image_store = None
+    # Containers queued or being created, by image name
+    __creating = dict()
+    __creating_lock = threading.Lock()
 
     @staticmethod
-    def init():
+    def init(operation_workers=4, warm_pool=None, warm_pool_volatile=True, image_disk_budget=0, pull_workers=2):
+        """
+        :param warm_pool: Dict of the number of containers kept created ahead of time by image name.
+        :param image_disk_budget: Bytes the images may take before the least recently used ones are evicted.
+        """
         DockerService.__docker_master = DockerMaster()
+        DockerService.__operations = ContainerOperations(operation_workers)
+        DockerService.__image_store = ImageStore(DockerService.__docker_master, image_disk_budget, pull_workers)
+        if warm_pool:
+            DockerService.__warm_pool = WarmPool(DockerService.__docker_master, warm_pool, warm_pool_volatile)
+            DockerService.__warm_pool.start()
 
     @staticmethod
     def create_container(container_name, volatile=False):
-        return DockerService.__docker_master.run_container(container_name, volatile)
+        """
+        Create a container and wait for it, the creation still counts towards the bound of operations.
+        """
+        DockerService.__image_store.touch(container_name)
+        _, future = DockerService.__operations.submit(Definition.Docker.get_str_create(),
+                                                      DockerService.__docker_master.run_container,
+                                                      container_name, volatile)
+        return future.result()
+
+    @staticmethod
+    def __run_container(container_name, volatile):
+        try:
+            if DockerService.__warm_pool is not None:
+                short_id = DockerService.__warm_pool.take(container_name, volatile)
+                if short_id:
+                    return short_id
+
+            return DockerService.__docker_master.run_container(container_name, volatile)
+        finally:
+            with DockerService.__creating_lock:
+                DockerService.__creating[container_name] -= 1
+                if not DockerService.__creating[container_name]:
+                    del DockerService.__creating[container_name]
+
+    @staticmethod
+    def submit_create_container(container_name, volatile=False):
+        """
+        Create a container in the background.
+        :return: Id of the operation, to query with get_operation.
+        """
+        DockerService.__image_store.touch(container_name)
+        with DockerService.__creating_lock:
+            DockerService.__creating[container_name] = DockerService.__creating.get(container_name, 0) + 1
+
+        operation_id, _ = DockerService.__operations.submit(Definition.Docker.get_str_create(),
+                                                            DockerService.__run_container,
+                                                            container_name, volatile)
+        return operation_id
+
+    @staticmethod
+    def submit_create_containers(container_name, num, volatile=False):
+        """
+        Create several containers of an image in the background, one operation each.
+        :return: List of the ids of the operations.
+        """
+        return [DockerService.submit_create_container(container_name, volatile) for _ in range(num)]
+
+    @staticmethod
+    def get_creating_containers():
+        """
+        :return: Dict of the number of containers queued or being created by image name.
+        """
+        with DockerService.__creating_lock:
+            return dict(DockerService.__creating)
+
+    @staticmethod
+    def submit_stop_containers(short_ids):
+        """
+        Stop containers in the background.
+        :return: Id of the operation, to query with get_operation.
+        """
+        operation_id, _ = DockerService.__operations.submit(Definition.Docker.get_str_remove(),
+                                                            DockerService.__docker_master.stop_containers,
+                                                            short_ids)
+        return operation_id
+
+    @staticmethod
+    def submit_pull_image(image_name):
+        """
+        Pull an image in the background, outside of the bound of container operations.
+        :return: True if a pull was started, False if the image is being pulled already.
+        """
+        return DockerService.__image_store.pull(image_name)
+
+    @staticmethod
+    def get_image_pulls():
+        """
+        :return: Dict by image name of the status, layer sizes and progress of the pulls.
+        """
+        return DockerService.__image_store.verbose()
+
+    @staticmethod
+    def evict_images():
+        return DockerService.__image_store.evict()
+
+    @staticmethod
+    def get_warm_pool_status():
+        """
+        :return: Dict by image name of the size, ready containers, hits and misses of the warm pool.
+        """
+        if DockerService.__warm_pool is None:
+            return {}
+
+        return DockerService.__warm_pool.verbose()
+
+    @staticmethod
+    def get_operation(operation_id):
+        return DockerService.__operations.get_operation(operation_id)
+
+    @staticmethod
+    def get_operations():
+        return DockerService.__operations.verbose()
+
+    @staticmethod
+    def get_pending_operations():
+        return DockerService.__operations.get_pending_count()
 
     @staticmethod
     def get_containers_status():
         return DockerService.__docker_master.get_containers_status()
 
+    @staticmethod
+    def get_available_port_count():
+        return DockerService.__docker_master.get_available_port_count()
+
     @staticmethod
     def get_local_images():
         return DockerService.__docker_master.get_local_images()
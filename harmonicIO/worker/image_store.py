@@ -0,0 +1,149 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from harmonicIO.general.definition import OperationStatus
+from harmonicIO.general.services import SysOut
+
+
+class ImageStore(object):
+    """
+    Images pulled in the background ahead of the containers that need them, at the request of the master, and
+    evicted least recently used first once the image layers take more than the disk budget. An image is used
+    when a pull or a creation of one of its containers is requested. Images used by a container, even a stopped
+    one, are never evicted.
+    """
+    # progress events that are about one layer of the image
+    layer_statuses = ["Pulling fs layer", "Waiting", "Downloading", "Verifying Checksum", "Download complete",
+                      "Extracting", "Pull complete", "Already exists"]
+    downloaded_statuses = ["Download complete", "Extracting", "Pull complete", "Already exists"]
+
+    def __init__(self, docker_master, disk_budget=0, pull_workers=2):
+        """
+        :param disk_budget: Bytes the image layers may take before images are evicted, 0 to never evict.
+        :param pull_workers: Number of images pulled at once.
+        """
+        self.__docker_master = docker_master
+        self.__disk_budget = disk_budget
+        self.__pulls = dict()
+        self.__last_used = dict()
+        self.__lock = threading.Lock()
+        self.__evict_lock = threading.Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=pull_workers)
+
+    def touch(self, image_name):
+        with self.__lock:
+            self.__last_used[image_name] = time.time()
+
+    def pull(self, image_name):
+        """
+        Pull an image in the background, unless it is being pulled already.
+        :return: True if a pull was started.
+        """
+        with self.__lock:
+            self.__last_used[image_name] = time.time()
+            pull = self.__pulls.get(image_name)
+            if pull is not None and pull["status"] in [OperationStatus.PENDING, OperationStatus.RUNNING]:
+                return False
+
+            self.__pulls[image_name] = {"status": OperationStatus.PENDING, "layers": dict(), "downloaded": 0,
+                                        "total": 0, "started": time.time(), "finished": None}
+
+        self.__executor.submit(self.__pull, image_name)
+        return True
+
+    def __on_progress(self, pull, event):
+        layer = event.get("id")
+        status = event.get("status", "")
+        if not layer or status not in self.layer_statuses:
+            return
+
+        detail = event.get("progressDetail") or {}
+        with self.__lock:
+            # [downloaded, size] of the layer, the size is known once its download starts
+            progress = pull["layers"].setdefault(layer, [0, None])
+            if status == "Downloading" and detail.get("total"):
+                progress[0], progress[1] = detail.get("current", 0), detail["total"]
+            elif status in self.downloaded_statuses and progress[1] is not None:
+                progress[0] = progress[1]
+
+            pull["downloaded"] = sum(progress[0] for progress in pull["layers"].values())
+            pull["total"] = sum(progress[1] or 0 for progress in pull["layers"].values())
+
+    def __pull(self, image_name):
+        with self.__lock:
+            pull = self.__pulls[image_name]
+            pull["status"] = OperationStatus.RUNNING
+
+        SysOut.out_string("Pulling image {}".format(image_name))
+        try:
+            pulled = self.__docker_master.pull_image(image_name, lambda event: self.__on_progress(pull, event))
+        except Exception as e:
+            SysOut.err_string("Pull of image {} failed: {}".format(image_name, e))
+            pulled = False
+
+        with self.__lock:
+            pull["status"] = OperationStatus.DONE if pulled else OperationStatus.FAILED
+            pull["finished"] = time.time()
+            self.__last_used[image_name] = time.time()
+
+        if pulled:
+            SysOut.out_string("Pulled image {} ({} bytes in {:.1f} s)".format(image_name, pull["total"],
+                                                                             pull["finished"] - pull["started"]))
+            self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used images until the image layers fit the disk budget.
+        :return: Number of images removed.
+        """
+        if not self.__disk_budget:
+            return 0
+
+        with self.__evict_lock:
+            used, images = self.__docker_master.get_disk_usage()
+            if used <= self.__disk_budget:
+                return 0
+
+            with self.__lock:
+                pulling = set(image_name for image_name, pull in self.__pulls.items()
+                              if pull["status"] in [OperationStatus.PENDING, OperationStatus.RUNNING])
+                last_used = dict(self.__last_used)
+
+            # images no request used since the worker started, such as untagged ones, go first
+            candidates = [(max([last_used.get(tag, 0) for tag in tags] or [0]), image_id, tags, size)
+                          for image_id, tags, size, containers in images
+                          if not containers and not pulling.intersection(tags)]
+            candidates.sort(key=lambda candidate: candidate[0])
+
+            removed = 0
+            for _, image_id, tags, size in candidates:
+                if used <= self.__disk_budget:
+                    break
+
+                if self.__docker_master.remove_image(image_id):
+                    used -= size
+                    removed += 1
+                    SysOut.out_string("Evicted image {} ({} bytes)".format(tags or image_id, size))
+                    with self.__lock:
+                        for tag in tags:
+                            self.__pulls.pop(tag, None)
+                            self.__last_used.pop(tag, None)
+
+            if used > self.__disk_budget:
+                SysOut.warn_string("Images take {} bytes, over the budget of {} bytes".format(used,
+                                                                                           self.__disk_budget))
+
+            return removed
+
+    def verbose(self):
+        """
+        :return: Dict by image name of the pulls requested, with their status, the size of each layer, the
+                 bytes downloaded and the total size of the layers known so far.
+        """
+        with self.__lock:
+            ret = dict()
+            for image_name, pull in self.__pulls.items():
+                ret[image_name] = dict(pull)
+                ret[image_name]["layers"] = {layer: progress[1] for layer, progress in pull["layers"].items()}
+
+            return ret
@@ -0,0 +1,85 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from harmonicIO.general.definition import Definition, OperationStatus
+from harmonicIO.general.services import SysOut
+
+
+class ContainerOperations(object):
+    """
+    Bounded executor for long running container operations, such as creating a container whose image has to
+    be pulled first. Every operation gets an id under which its status and result can be queried while the
+    REST threads stay free; the newest max_kept finished operations are kept.
+    """
+
+    def __init__(self, workers=4, max_kept=1000):
+        self.__executor = ThreadPoolExecutor(max_workers=workers)
+        self.__operations = OrderedDict()
+        self.__max_kept = max_kept
+        self.__next_id = 0
+        self.__lock = threading.Lock()
+
+    def __run(self, operation, function, args):
+        with self.__lock:
+            operation[Definition.Docker.get_str_status()] = OperationStatus.RUNNING
+
+        try:
+            result = function(*args)
+            status = OperationStatus.DONE if result else OperationStatus.FAILED
+        except Exception as e:
+            SysOut.err_string("Container operation {0} failed: {1}".format(
+                operation[Definition.Docker.get_str_operation_id()], e))
+            result = False
+            status = OperationStatus.FAILED
+
+        with self.__lock:
+            operation[Definition.Docker.get_str_status()] = status
+            operation[Definition.Docker.get_str_result()] = result
+            operation[Definition.get_str_last_update()] = time.time()
+
+        return result
+
+    def submit(self, name, function, *args):
+        """
+        Queue an operation, it fails if function raises or returns a false value.
+        :return: Tuple (operation id, future of the result of function)
+        """
+        with self.__lock:
+            operation_id = str(self.__next_id)
+            self.__next_id += 1
+
+            operation = {Definition.Docker.get_str_operation_id(): operation_id,
+                         Definition.Docker.get_str_operation(): name,
+                         Definition.Docker.get_str_status(): OperationStatus.PENDING,
+                         Definition.Docker.get_str_result(): None,
+                         Definition.get_str_last_update(): time.time()}
+            self.__operations[operation_id] = operation
+
+            # Forget the oldest finished operations, pending ones are kept until they finish.
+            while len(self.__operations) > self.__max_kept:
+                oldest_id, oldest = next(iter(self.__operations.items()))
+                if oldest[Definition.Docker.get_str_status()] not in [OperationStatus.DONE, OperationStatus.FAILED]:
+                    break
+
+                del self.__operations[oldest_id]
+
+        return operation_id, self.__executor.submit(self.__run, operation, function, args)
+
+    def get_operation(self, operation_id):
+        """
+        :return: Copy of the operation dict or None for an unknown id.
+        """
+        with self.__lock:
+            operation = self.__operations.get(operation_id)
+            return dict(operation) if operation is not None else None
+
+    def get_pending_count(self):
+        with self.__lock:
+            return sum(1 for operation in self.__operations.values()
+                       if operation[Definition.Docker.get_str_status()] in [OperationStatus.PENDING,
+                                                                            OperationStatus.RUNNING])
+
+    def verbose(self):
+        with self.__lock:
+            return [dict(operation) for operation in self.__operations.values()]
@@ -2,7 +2,7 @@ import falcon
 from .configuration import Setting
 from harmonicIO.general.services import SysOut, Services
 from .docker_service import DockerService
-from harmonicIO.general.definition import Definition, CRole
+from harmonicIO.general.definition import Definition, CRole, to_json
 import json
 
 
@@ -56,8 +56,29 @@ class ContainerService(object):
         # Check for status command
         if req.params[Definition.Docker.get_str_command()] == Definition.Docker.get_str_status():
             body = DockerService.get_containers_status()
-            res.body = str(body)
-            res.content_type = "String"
+            res.body = to_json(body)
+            res.content_type = "application/json"
+            res.status = falcon.HTTP_200
+            return
+
+        # Status of a container operation started with wait=false, or of all recent operations
+        if req.params[Definition.Docker.get_str_command()] == Definition.Docker.get_str_operation():
+            operation_id = req.params.get(Definition.Docker.get_str_operation_id())
+            if operation_id is None:
+                res.body = to_json(DockerService.get_operations())
+                res.content_type = "application/json"
+                res.status = falcon.HTTP_200
+                return
+
+            operation = DockerService.get_operation(operation_id)
+            if operation is None:
+                res.body = "Operation not found."
+                res.content_type = "String"
+                res.status = falcon.HTTP_404
+                return
+
+            res.body = to_json(operation)
+            res.content_type = "application/json"
             res.status = falcon.HTTP_200
             return
 
@@ -102,15 +123,34 @@ class ContainerService(object):
             raw = req.stream.read(req.content_length or 0)
             data = json.loads(str(raw, 'utf-8')) # create dict of body data if it exists
 
-            if not data[Definition.Container.get_str_con_image_name()]:
+            if not data.get(Definition.Container.get_str_con_image_name()):
                 res.body = "Required parameters are not supplied!"
                 res.content_type = "String"
                 res.status = falcon.HTTP_401
+                return
 
             volatile = False
             if data.get('volatile'):
                 volatile = True # only set to true if user has actually provided the 'volatile' : true data in request
 
+            # With wait=false, return at once and let the caller poll the operations instead of waiting for the
+            # pull. A batch of num containers is created with one operation per container.
+            if req.params.get(Definition.Docker.get_str_wait(), "true").lower() == "false":
+                num = data.get(Definition.Container.get_str_num(), 1)
+                if not isinstance(num, int) or num < 1:
+                    res.body = "Number of containers must be a positive integer!"
+                    res.content_type = "String"
+                    res.status = falcon.HTTP_400
+                    return
+
+                operation_ids = DockerService.submit_create_containers(
+                    data[Definition.Container.get_str_con_image_name()], num, volatile)
+                res.body = to_json({Definition.Docker.get_str_operation_id(): operation_ids[0],
+                                    Definition.Docker.get_str_operation_ids(): operation_ids})
+                res.content_type = "application/json"
+                res.status = falcon.HTTP_202
+                return
+
             result = DockerService.create_container(data[Definition.Container.get_str_con_image_name()], volatile)
 
             if result:
@@ -122,6 +162,47 @@ class ContainerService(object):
                 res.body = "Create container error!"
                 res.content_type = "String"
                 res.status = falcon.HTTP_400
+            return
+
+        """
+        POST: docker?token=None&command=remove
+        """
+        if req.params[Definition.Docker.get_str_command()] == Definition.Docker.get_str_remove():
+            raw = req.stream.read(req.content_length or 0)
+            data = json.loads(str(raw, 'utf-8'))
+            short_ids = data.get(Definition.Container.Status.get_str_sid())
+
+            if not short_ids or not isinstance(short_ids, list):
+                res.body = "Required parameters are not supplied!"
+                res.content_type = "String"
+                res.status = falcon.HTTP_401
+                return
+
+            # Containers are stopped in the background, the caller polls the operation if it needs the outcome
+            operation_id = DockerService.submit_stop_containers(short_ids)
+            res.body = to_json({Definition.Docker.get_str_operation_id(): operation_id})
+            res.content_type = "application/json"
+            res.status = falcon.HTTP_202
+            return
+
+        """
+        POST: docker?token=None&command=pull
+        """
+        if req.params[Definition.Docker.get_str_command()] == Definition.Docker.get_str_pull():
+            raw = req.stream.read(req.content_length or 0)
+            data = json.loads(str(raw, 'utf-8'))
+
+            if not data.get(Definition.Container.get_str_con_image_name()):
+                res.body = "Required parameters are not supplied!"
+                res.content_type = "String"
+                res.status = falcon.HTTP_401
+                return
+
+            # The image is pulled in the background, its progress is in the status under image_pulls
+            started = DockerService.submit_pull_image(data[Definition.Container.get_str_con_image_name()])
+            res.body = to_json({Definition.Docker.get_str_pull(): started})
+            res.content_type = "application/json"
+            res.status = falcon.HTTP_202
 
 
 class RequestStatus(object):
@@ -143,10 +224,14 @@ class RequestStatus(object):
             s_content = Services.get_machine_status(Setting, CRole.WORKER)
             s_content[Definition.REST.get_str_docker()] = DockerService.get_containers_status()
             s_content[Definition.REST.get_str_local_imgs()] = DockerService.get_local_images()
+            s_content[Definition.REST.get_str_pending_operations()] = DockerService.get_pending_operations()
+            s_content[Definition.REST.get_str_free_ports()] = DockerService.get_available_port_count()
+            s_content[Definition.Docker.get_str_creating()] = DockerService.get_creating_containers()
+            s_content[Definition.get_str_warm_pool()] = DockerService.get_warm_pool_status()
+            s_content[Definition.Docker.get_str_image_pulls()] = DockerService.get_image_pulls()
 
-            res.body = str(s_content)
-
-            res.content_type = "String"
+            res.body = to_json(s_content)
+            res.content_type = "application/json"
             res.status = falcon.HTTP_200
         else:
             res.body = "Invalid token ID."
@@ -157,7 +242,7 @@ class RequestStatus(object):
 class RESTService(object):
     def __init__(self):
         # Initialize REST Services
-        from wsgiref.simple_server import make_server
+        from harmonicIO.general.wsgi_server import make_server
         api = falcon.API()
 
         # Add route for getting status update
@@ -167,8 +252,9 @@ class RESTService(object):
         api.add_route('/' + Definition.REST.get_str_docker(), ContainerService())
 
         # Establishing a REST server
-        self.__server = make_server(Setting.get_node_internal_addr(), Setting.get_node_port(), api)
+        self.__server = make_server(Setting.get_node_internal_addr(), Setting.get_node_port(), api,
+                                    Setting.get_rest_server(), Setting.get_rest_workers())
 
     def run(self):
-        SysOut.out_string("REST Ready.....")
+        SysOut.out_string("REST Ready ({0}).....".format(Setting.get_rest_server()))
         self.__server.serve_forever()
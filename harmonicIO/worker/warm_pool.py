@@ -0,0 +1,106 @@
+import threading
+from collections import deque
+from harmonicIO.general.services import SysOut
+
+
+class WarmPool(object):
+    """
+    Containers created ahead of time for some images, so that starting a container of these images skips creating
+    it. Pool containers are created but not started: they neither register with the master nor take tuples, and
+    keep their data port reserved. Their environment is fixed at creation, so they are only handed out for
+    requests with the same volatility. A background thread creates the pool and replaces the containers handed out.
+    """
+
+    def __init__(self, docker_master, sizes, volatile=True, retry_interval=30):
+        """
+        :param sizes: Dict of the number of containers to keep ready by image name.
+        :param volatile: Whether the pool containers exit after the idle timeout once started.
+        :param retry_interval: Seconds before filling the pool again after a failed creation.
+        """
+        self.__docker_master = docker_master
+        self.__sizes = dict(sizes)
+        self.__volatile = volatile
+        self.__retry_interval = retry_interval
+        self.__ready = {image_name: deque() for image_name in sizes}
+        self.__hits = dict()
+        self.__misses = dict()
+        self.__lock = threading.Lock()
+        self.__wanted = threading.Event()
+
+    def start(self):
+        self.__docker_master.remove_created_containers()
+        self.__wanted.set()
+
+        refill_thread = threading.Thread(target=self.__refill)
+        refill_thread.daemon = True
+        refill_thread.start()
+        SysOut.out_string("Warm pool started for {}".format(self.__sizes))
+
+    def __count(self, counts, image_name):
+        with self.__lock:
+            counts[image_name] = counts.get(image_name, 0) + 1
+
+    def take(self, image_name, volatile=False):
+        """
+        Start a pool container of the image.
+        :return: Short id of the started container, or None if the pool has none ready.
+        """
+        entry = None
+        with self.__lock:
+            ready = self.__ready.get(image_name)
+            if ready and volatile == self.__volatile:
+                entry = ready.popleft()
+
+        if entry is None:
+            self.__count(self.__misses, image_name)
+            return None
+
+        self.__wanted.set()
+        short_id = self.__docker_master.start_container(*entry)
+        if not short_id:
+            self.__count(self.__misses, image_name)
+            return None
+
+        self.__count(self.__hits, image_name)
+        SysOut.out_string("Container {} of {} started from the warm pool".format(short_id, image_name))
+        return short_id
+
+    def __fill(self):
+        for image_name, size in self.__sizes.items():
+            while True:
+                with self.__lock:
+                    if len(self.__ready[image_name]) >= size:
+                        break
+
+                entry = self.__docker_master.create_container(image_name, self.__volatile)
+                if entry is None:
+                    return False
+
+                with self.__lock:
+                    self.__ready[image_name].append(entry)
+
+        return True
+
+    def __refill(self):
+        while True:
+            self.__wanted.wait()
+            self.__wanted.clear()
+            if not self.__fill():
+                # try again later, or as soon as a container is handed out
+                self.__wanted.wait(self.__retry_interval)
+                self.__wanted.set()
+
+    def verbose(self):
+        """
+        :return: Dict by image name of the pool size, the containers ready, and the hits and misses of the
+                 requests served by the pool.
+        """
+        with self.__lock:
+            ret = dict()
+            for image_name in set(self.__sizes) | set(self.__hits) | set(self.__misses):
+                ret[image_name] = {"size": self.__sizes.get(image_name, 0),
+                                   "ready": len(self.__ready.get(image_name, ())),
+                                   "hits": self.__hits.get(image_name, 0),
+                                   "misses": self.__misses.get(image_name, 0)}
+
+            return ret
@@ -6,12 +6,14 @@ setup(name='harmonicIO',
       packages=['harmonicIO',
                 'harmonicIO.stream_connector',
                 'harmonicIO.master',
-                'harmonicIO.worker'],
+                'harmonicIO.worker',
+                'harmonicIO.simulator'],
       entry_points={
           'console_scripts': [
               'stream_connector = harmonicIO.stream_connector.__main__:main',
               'master = harmonicIO.master.__main__:main',
               'worker = harmonicIO.worker.__main__:main',
+              'simulator = harmonicIO.simulator.__main__:main',
               'play = harmonicIO.play.__main__:main'
           ]
       }
@@ -0,0 +1,54 @@
+import unittest
+from harmonicIO.master.autoscaler import AutoScaler
+from harmonicIO.master.messaging_system import ImageQueue
+
+
+def make_autoscaler(**kwargs):
+    settings = dict(interval=10, target_delay=10.0, min_queue_length=10, max_step=5, min_containers=0,
+                    max_containers=50, scale_out_cooldown=0, scale_in_cooldown=0, hysteresis=0.25,
+                    smoothing=1.0, initial_service_rate=1.0)
+    settings.update(kwargs)
+    return AutoScaler(**settings)
+
+
+class AutoScalerTest(unittest.TestCase):
+
+    def test_arrivals_routed_to_containers_keep_them(self):
+        # 4 containers keep up with 4 tuples per second routed to them directly, the queue stays empty
+        autoscaler = make_autoscaler()
+        autoscaler.evaluate(0, {"img": (0, 0, 0, 4, 0)})
+        for step in range(1, 10):
+            self.assertEqual(autoscaler.evaluate(step * 10, {"img": (0, step * 40, 0, 4, 0)}), [])
+
+        self.assertEqual(autoscaler.get_rates("img"), (4.0, 1.0))
+
+    def test_scale_in_without_arrivals(self):
+        autoscaler = make_autoscaler()
+        autoscaler.evaluate(0, {"img": (0, 0, 0, 4, 0)})
+        self.assertEqual(autoscaler.evaluate(10, {"img": (0, 0, 0, 4, 0)}), [("img", 4, 0)])
+
+    def test_scale_out_with_queue(self):
+        autoscaler = make_autoscaler()
+        autoscaler.evaluate(0, {"img": (0, 0, 0, 1, 0)})
+        # 2 tuples per second arrive, 1 is served, and 20 are waiting
+        self.assertEqual(autoscaler.evaluate(10, {"img": (20, 20, 10, 1, 0)}), [("img", 1, 4)])
+
+    def test_no_scale_in_while_starting(self):
+        autoscaler = make_autoscaler()
+        autoscaler.evaluate(0, {"img": (0, 0, 0, 4, 0)})
+        self.assertEqual(autoscaler.evaluate(10, {"img": (0, 0, 0, 4, 2)}), [])
+
+
+class ImageQueueCountersTest(unittest.TestCase):
+
+    def test_arrivals_are_counted_apart_from_pushes(self):
+        queue = ImageQueue(10, 1024)
+        queue.add_arrival()
+        queue.add_arrival()
+        queue.push(b"payload", 1)
+        queue.pop()
+        self.assertEqual(queue.get_counters(), (0, 1, 1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from harmonicIO.general.definition import Definition, CStatus
+from harmonicIO.master.meta_table import ImageContainers
+
+
+def make_container(short_id, status=CStatus.AVAILABLE):
+    return {Definition.REST.Batch.get_str_batch_addr(): "10.0.0.1",
+            Definition.REST.Batch.get_str_batch_port(): 9000,
+            Definition.REST.Batch.get_str_batch_status(): status,
+            Definition.Container.get_str_con_image_name(): "img",
+            Definition.Container.Status.get_str_sid(): short_id}
+
+
+class ImageContainersTest(unittest.TestCase):
+
+    def get_volatile(self, containers):
+        return {container[Definition.Container.Status.get_str_sid()]: container['volatile']
+                for container in containers.get_containers()}
+
+    def test_volatile_before_registration(self):
+        containers = ImageContainers(1, False)
+        containers.set_volatile(["a"])
+        containers.update(make_container("a"), 0)
+        containers.update(make_container("b"), 0)
+        self.assertEqual(self.get_volatile(containers), {"a": True, "b": False})
+
+    def test_volatile_after_registration(self):
+        containers = ImageContainers(1, False)
+        containers.update(make_container("a"), 0)
+        containers.set_volatile(["a"])
+        containers.update(make_container("a", CStatus.BUSY), 1)
+        self.assertEqual(self.get_volatile(containers), {"a": True})
+
+    def test_removed_container_registers_again_as_not_volatile(self):
+        containers = ImageContainers(1, False)
+        containers.set_volatile(["a"])
+        containers.update(make_container("a"), 0)
+        containers.remove("a")
+        containers.update(make_container("a"), 1)
+        self.assertEqual(self.get_volatile(containers), {"a": False})
+
+    def test_expired_on_select_registers_again_as_not_volatile(self):
+        containers = ImageContainers(1, False)
+        containers.set_volatile(["a"])
+        containers.update(make_container("a"), 0)
+        self.assertIsNone(containers.select(1))
+        containers.update(make_container("a"), 2)
+        self.assertEqual(self.get_volatile(containers), {"a": False})
+
+
+if __name__ == '__main__':
+    unittest.main()
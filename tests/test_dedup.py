@@ -0,0 +1,29 @@
+import unittest
+from harmonicIO.master.messaging_system import DedupWindow
+
+
+class DedupWindowTest(unittest.TestCase):
+
+    def test_duplicate(self):
+        window = DedupWindow(10, 60)
+        self.assertFalse(window.check(b"digest", 10))
+        self.assertTrue(window.check(b"digest", 10))
+        self.assertEqual(window.verbose(), {'window': 1, 'tuples_saved': 1, 'bytes_saved': 10})
+
+    def test_discarded_digest_is_not_duplicate(self):
+        # a tuple rejected because its queue is full is sent again by the producer
+        window = DedupWindow(10, 60)
+        self.assertFalse(window.check(b"digest", 10))
+        window.discard(b"digest")
+        self.assertFalse(window.check(b"digest", 10))
+
+    def test_eviction(self):
+        window = DedupWindow(2, 60)
+        for digest in [b"a", b"b", b"c"]:
+            window.check(digest, 1)
+
+        self.assertFalse(window.check(b"a", 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
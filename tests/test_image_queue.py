@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+import unittest
+from harmonicIO.master.messaging_system import ImageQueue
+from harmonicIO.master.segment_log import SegmentLog
+
+
+class ImageQueueTest(unittest.TestCase):
+
+    def test_requeue_at_head_with_enqueue_time(self):
+        queue = ImageQueue(10, 1024)
+        queue.push(b"first")
+        queue.push(b"second")
+        entry = queue.pop()
+        self.assertTrue(queue.requeue(entry))
+        self.assertEqual(queue.pop(), entry)
+        self.assertEqual(queue.get_counters(), (1, 2, 1, 0))
+
+    def test_requeue_full(self):
+        queue = ImageQueue(1, 1024)
+        queue.push(b"first")
+        entry = queue.pop()
+        queue.push(b"second")
+        self.assertFalse(queue.requeue(entry))
+
+
+class SpilledImageQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_queue(self, max_msg, max_bytes):
+        return ImageQueue(max_msg, max_bytes, SegmentLog(self.directory, "img", 4096, 1024 * 1024))
+
+    def pop_all(self, queue):
+        ret = []
+        while True:
+            entry = queue.pop()
+            if entry is None:
+                return ret
+            ret.append(bytes(entry[1]))
+
+    def test_fifo_within_level(self):
+        queue = self.make_queue(2, 1024)
+        for i in range(6):
+            self.assertTrue(queue.push(bytes([i]), priority=1))
+
+        self.assertEqual(queue.get_spilled_length(), 4)
+        self.assertEqual(self.pop_all(queue), [bytes([i]) for i in range(6)])
+
+    def test_spilled_priority_served_first(self):
+        queue = self.make_queue(2, 1024)
+        queue.push(b"low1")
+        queue.push(b"low2")
+        queue.push(b"high", priority=5)
+        queue.push(b"low3")
+        self.assertEqual(queue.get_spilled_length(), 2)
+        self.assertEqual(self.pop_all(queue), [b"high", b"low1", b"low2", b"low3"])
+
+    def test_refill_within_memory_budget(self):
+        queue = self.make_queue(10, 10)
+        for item in [b"aaaaaa", b"bbbbbb", b"cccccc"]:
+            self.assertTrue(queue.push(item))
+
+        self.assertEqual(bytes(queue.pop()[1]), b"aaaaaa")
+        self.assertEqual(bytes(queue.pop()[1]), b"bbbbbb")
+        # "cccccc" does not fit next to "bbbbbb" in 10 bytes, so it was not read back while "bbbbbb" was queued
+        self.assertEqual(queue.get_spilled_length(), 1)
+        self.assertEqual(self.pop_all(queue), [b"cccccc"])
+
+    def test_item_beyond_memory_budget(self):
+        queue = self.make_queue(10, 4)
+        self.assertTrue(queue.push(b"too large"))
+        self.assertEqual(queue.get_spilled_length(), 1)
+        self.assertEqual(self.pop_all(queue), [b"too large"])
+        self.assertEqual(len(queue), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+from collections import Counter
+from harmonicIO.general.definition import Definition
+from harmonicIO.master.scheduler import Scheduler, SpreadScheduler, BinPackingScheduler, get_scheduler
+
+GB = 1024 * 1024 * 1024
+
+
+def make_worker(addr, cpus=4, load=0.0, free_ports=10, mem_total=None, mem_available=None, local_images=()):
+    return {Definition.get_str_node_addr(): addr,
+            Definition.get_str_node_port(): 8081,
+            Definition.get_str_cpu_count(): cpus,
+            Definition.get_str_load5(): load,
+            Definition.get_str_mem_total(): mem_total,
+            Definition.get_str_mem_available(): mem_available,
+            Definition.REST.get_str_free_ports(): free_ports,
+            Definition.REST.get_str_local_imgs(): list(local_images)}
+
+
+def make_workers(*workers):
+    return {worker[Definition.get_str_node_addr()]: worker for worker in workers}
+
+
+def count(end_points):
+    return Counter(addr for addr, _ in end_points)
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_scheduler_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Scheduler()
+
+    def test_get_scheduler(self):
+        self.assertIsInstance(get_scheduler("spread"), SpreadScheduler)
+        self.assertIsInstance(get_scheduler("bin_packing"), BinPackingScheduler)
+        with self.assertRaises(ValueError):
+            get_scheduler("random")
+
+
+class SpreadSchedulerTest(unittest.TestCase):
+
+    def test_spreads_over_idle_workers(self):
+        workers = make_workers(*[make_worker("10.0.0.{}".format(i), cpus=16) for i in range(5)])
+        placed = count(SpreadScheduler().place(workers, "img", 10))
+        self.assertEqual(placed, Counter({"10.0.0.{}".format(i): 2 for i in range(5)}))
+
+    def test_local_image_does_not_take_whole_job(self):
+        workers = make_workers(make_worker("a", cpus=16, free_ports=100, local_images=["img"]),
+                               make_worker("b", cpus=16, free_ports=100), make_worker("c", cpus=16, free_ports=100))
+        placed = count(SpreadScheduler().place(workers, "img", 30))
+        self.assertEqual(sum(placed.values()), 30)
+        self.assertGreater(placed["a"], placed["b"])
+        self.assertGreater(placed["b"], 0)
+        self.assertGreater(placed["c"], 0)
+
+    def test_local_image_breaks_ties(self):
+        workers = make_workers(make_worker("a"), make_worker("b", local_images=["img"]))
+        self.assertEqual(SpreadScheduler().place(workers, "img", 1), [("b", 8081)])
+
+    def test_load_is_normalized_per_core(self):
+        # a load of 4 on 16 cores is lighter than a load of 2 on 4 cores
+        workers = make_workers(make_worker("small", cpus=4, load=2.0), make_worker("large", cpus=16, load=4.0))
+        self.assertEqual(SpreadScheduler().place(workers, "img", 1), [("large", 8081)])
+
+    def test_max_load_per_core(self):
+        workers = make_workers(make_worker("a", cpus=2, load=1.0, free_ports=100))
+        # (1.0 + n * 0.5) / 2 <= 0.8 holds for one container only
+        self.assertEqual(len(SpreadScheduler(max_load=0.8, container_load=0.5).place(workers, "img", 5)), 1)
+
+    def test_free_ports(self):
+        workers = make_workers(make_worker("a", cpus=64, free_ports=2), make_worker("b", cpus=64, free_ports=0))
+        self.assertEqual(count(SpreadScheduler().place(workers, "img", 5)), Counter({"a": 2}))
+
+    def test_memory(self):
+        workers = make_workers(make_worker("a", cpus=64, mem_total=4 * GB, mem_available=GB),
+                               make_worker("b", cpus=64, mem_total=4 * GB, mem_available=GB // 2))
+        placed = count(SpreadScheduler(container_memory=GB // 4).place(workers, "img", 10))
+        self.assertEqual(placed, Counter({"a": 4, "b": 2}))
+
+    def test_excluded(self):
+        workers = make_workers(make_worker("a"), make_worker("b"))
+        self.assertEqual(count(SpreadScheduler().place(workers, "img", 3, {("a", 8081)})), Counter({"b": 3}))
+
+    def test_placed_containers_count_against_capacity(self):
+        # each container adds 0.5 to the load of a 4 core worker, a second one no longer fits under 0.25
+        workers = make_workers(make_worker("a", cpus=4), make_worker("b", cpus=4))
+        placed = SpreadScheduler(max_load=0.25, container_load=0.5).place(workers, "img", 5)
+        self.assertEqual(count(placed), Counter({"a": 2, "b": 2}))
+
+    def test_no_workers(self):
+        self.assertEqual(SpreadScheduler().place({}, "img", 3), [])
+
+
+class BinPackingSchedulerTest(unittest.TestCase):
+
+    def test_packs_most_utilized_worker(self):
+        workers = make_workers(make_worker("a", cpus=4, load=1.0), make_worker("b", cpus=4))
+        placed = count(BinPackingScheduler(max_load=0.8, container_load=0.5).place(workers, "img", 4))
+        # "a" still fits at (1.0 + 4 * 0.5) / 4 = 0.75
+        self.assertEqual(placed, Counter({"a": 4}))
+
+    def test_overflows_to_next_worker(self):
+        workers = make_workers(make_worker("a", cpus=4, load=1.0), make_worker("b", cpus=4))
+        placed = count(BinPackingScheduler(max_load=0.8, container_load=0.5).place(workers, "img", 6))
+        self.assertEqual(placed, Counter({"a": 4, "b": 2}))
+
+    def test_idle_workers_with_local_image(self):
+        workers = make_workers(*[make_worker("10.0.0.{}".format(i), cpus=16, free_ports=100) for i in range(5)])
+        workers["10.0.0.3"][Definition.REST.get_str_local_imgs()] = ["img"]
+        placed = count(BinPackingScheduler(max_load=0.8, container_load=0.5).place(workers, "img", 10))
+        self.assertEqual(placed, Counter({"10.0.0.3": 10}))
+
+    def test_free_ports_and_memory(self):
+        workers = make_workers(make_worker("a", cpus=64, free_ports=1, load=10.0),
+                               make_worker("b", cpus=64, free_ports=10, mem_total=4 * GB, mem_available=GB))
+        placed = count(BinPackingScheduler(container_memory=GB // 2).place(workers, "img", 5))
+        self.assertEqual(placed, Counter({"a": 1, "b": 2}))
+
+    def test_excluded(self):
+        workers = make_workers(make_worker("a", load=1.0), make_worker("b"))
+        self.assertEqual(count(BinPackingScheduler().place(workers, "img", 2, {("a", 8081)})), Counter({"b": 2}))
+
+
+if __name__ == '__main__':
+    unittest.main()
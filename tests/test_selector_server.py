@@ -0,0 +1,49 @@
+import socket
+import hashlib
+import threading
+import unittest
+from harmonicIO.general.wire_protocol import FrameHeader, FrameAck
+from harmonicIO.master.selector_server import SelectorTCPServer
+
+
+def read_exactly(conn, size):
+    data = b""
+    while len(data) < size:
+        c = conn.recv(size - len(data))
+        if not c:
+            break
+        data += c
+
+    return data
+
+
+class SelectorTCPServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = SelectorTCPServer(("127.0.0.1", 0))
+        cls.port = cls.server._SelectorTCPServer__socket.getsockname()[1]
+        thread = threading.Thread(target=cls.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def connect(self):
+        conn = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        conn.sendall(FrameHeader.MAGIC)
+        return conn
+
+    def test_frame(self):
+        payload = b"payload"
+        with self.connect() as conn:
+            conn.sendall(FrameHeader.encode("test_selector/frame", len(payload), hashlib.md5(payload).digest()))
+            conn.sendall(payload)
+            self.assertEqual(FrameAck.decode(read_exactly(conn, FrameAck.size)), (FrameAck.OK, 0))
+
+    def test_oversized_frame_closes_connection(self):
+        with self.connect() as conn:
+            conn.sendall(FrameHeader.encode("test_selector/oversized", 0xffffffff, b"\0" * 16))
+            self.assertEqual(read_exactly(conn, FrameAck.size), b"")
+
+
+if __name__ == '__main__':
+    unittest.main()
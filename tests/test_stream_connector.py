@@ -0,0 +1,106 @@
+import socket
+import threading
+import unittest
+from harmonicIO.general.wire_protocol import FrameHeader, FrameAck
+from harmonicIO.stream_connector.stream_connector import StreamConnector
+
+
+def read_exactly(conn, size):
+    data = bytearray()
+    while len(data) < size:
+        c = conn.recv(size - len(data))
+        if not c:
+            return None
+        data += c
+
+    return bytes(data)
+
+
+class FakeMessagingSystem(object):
+    """
+    Accepts one connection per script. A script lists, for every frame received, the status to acknowledge it
+    with, or None to leave it without acknowledgement. The connection is closed at the end of the script.
+    """
+
+    def __init__(self, scripts):
+        self.received = []
+        self.__scripts = scripts
+        self.__listener = socket.socket()
+        self.__listener.bind(("127.0.0.1", 0))
+        self.__listener.listen(1)
+        self.port = self.__listener.getsockname()[1]
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __run(self):
+        for script in self.__scripts:
+            conn, _ = self.__listener.accept()
+            with conn:
+                if read_exactly(conn, len(FrameHeader.MAGIC)) != FrameHeader.MAGIC:
+                    return
+
+                for seq, status in enumerate(script):
+                    header = read_exactly(conn, FrameHeader.size)
+                    if header is None:
+                        break
+
+                    _, _, _, name_length, payload_length, _ = FrameHeader.decode(header)
+                    read_exactly(conn, name_length)
+                    self.received.append(read_exactly(conn, payload_length))
+                    if status is not None:
+                        conn.sendall(FrameAck.encode(status, seq))
+
+        self.__listener.close()
+
+    def join(self):
+        self.__thread.join(5)
+
+
+class StreamConnectorTest(unittest.TestCase):
+
+    def push(self, connector, server, payload):
+        return connector._StreamConnector__push_frame_MS("127.0.0.1", server.port, payload, "img", 0, b"\0" * 16,
+                                                         tuple_id=payload.decode())
+
+    def test_resend_after_connection_loss(self):
+        server = FakeMessagingSystem([[None, None, None], [FrameAck.OK] * 4])
+        connector = StreamConnector("127.0.0.1", 8080, protocol_version=2, window=4)
+        for payload in [b"t0", b"t1", b"t2"]:
+            self.assertTrue(self.push(connector, server, payload))
+
+        # the connection is lost while waiting for acknowledgements, the caller sends the current tuple again
+        self.assertFalse(self.push(connector, server, b"t3"))
+        self.assertTrue(self.push(connector, server, b"t3"))
+        self.assertTrue(connector.flush())
+        connector.close()
+        server.join()
+
+        self.assertEqual(server.received[3:], [b"t0", b"t1", b"t2", b"t3"])
+        self.assertEqual(connector.get_failed_tuples(), [])
+
+    def test_queue_full_fails_current_tuple(self):
+        server = FakeMessagingSystem([[FrameAck.QUEUE_FULL, FrameAck.OK]])
+        connector = StreamConnector("127.0.0.1", 8080, protocol_version=2, window=1)
+        self.assertFalse(self.push(connector, server, b"t0"))
+        self.assertTrue(self.push(connector, server, b"t0"))
+        connector.close()
+        server.join()
+
+        self.assertEqual(connector.get_failed_tuples(), [])
+
+    def test_queue_full_reports_pipelined_tuple(self):
+        server = FakeMessagingSystem([[FrameAck.QUEUE_FULL, FrameAck.OK]])
+        connector = StreamConnector("127.0.0.1", 8080, protocol_version=2, window=2)
+        self.assertTrue(self.push(connector, server, b"t0"))
+        self.assertTrue(self.push(connector, server, b"t1"))
+        self.assertTrue(connector.flush())
+        connector.close()
+        server.join()
+
+        self.assertEqual(connector.get_failed_tuples(), [("img", "t0")])
+        self.assertEqual(connector.get_failed_tuples(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
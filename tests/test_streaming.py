@@ -0,0 +1,139 @@
+import time
+import socket
+import unittest
+from unittest import mock
+import falcon
+from falcon import testing
+from harmonicIO.general.definition import Definition, CStatus
+from harmonicIO.general.compression import Encoding
+from harmonicIO.master.messaging_system import MessagesQueue
+from harmonicIO.master.meta_table import LookUpTable
+from harmonicIO.master.push_dispatcher import PushDispatcher
+from harmonicIO.master.rest_service import MessageStreaming
+
+
+def make_container(image_name, short_id, port, status=CStatus.AVAILABLE):
+    return {Definition.REST.Batch.get_str_batch_addr(): "127.0.0.1",
+            Definition.REST.Batch.get_str_batch_port(): port,
+            Definition.REST.Batch.get_str_batch_status(): status,
+            Definition.Container.get_str_con_image_name(): image_name,
+            Definition.Container.Status.get_str_sid(): short_id}
+
+
+def get_closed_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+
+    return False
+
+
+class StreamRequestTest(unittest.TestCase):
+
+    def setUp(self):
+        api = falcon.API()
+        api.add_route('/' + Definition.REST.get_str_stream_req(), MessageStreaming())
+        self.client = testing.TestClient(api)
+
+    def get_params(self, image_name, **kwargs):
+        params = {"token": "None",
+                  Definition.REST.Batch.get_str_batch_addr(): "127.0.0.1",
+                  Definition.REST.Batch.get_str_batch_port(): "9000",
+                  Definition.REST.Batch.get_str_batch_status(): str(CStatus.AVAILABLE),
+                  Definition.Container.get_str_con_image_name(): image_name,
+                  Definition.Container.Status.get_str_sid(): "c1"}
+        params.update(kwargs)
+        return params
+
+    def test_queue_drained_before_pop(self):
+        image_name = "test_streaming/drained"
+        MessagesQueue.push_to_queue(image_name, b"payload")
+
+        # another consumer takes the tuple between the length check and the pop
+        with mock.patch.object(MessagesQueue, "pop_message", return_value=None):
+            result = self.client.simulate_post('/' + Definition.REST.get_str_stream_req(),
+                                               params=self.get_params(image_name))
+
+        self.assertEqual(result.status, falcon.HTTP_200)
+        self.assertEqual(result.text, "No item in queue")
+        container = LookUpTable.get_candidate_container(image_name)
+        self.assertEqual(container[Definition.Container.Status.get_str_sid()], "c1")
+
+    def test_queue_drained_before_batch(self):
+        image_name = "test_streaming/drained_batch"
+        MessagesQueue.push_to_queue(image_name, b"payload")
+
+        with mock.patch.object(MessagesQueue, "pop_batch", return_value=[]):
+            result = self.client.simulate_post('/' + Definition.REST.get_str_stream_req(),
+                                               params=self.get_params(image_name, batch_size="10"))
+
+        self.assertEqual(result.status, falcon.HTTP_200)
+        self.assertEqual(result.text, "No item in queue")
+        container = LookUpTable.get_candidate_container(image_name)
+        self.assertEqual(container[Definition.Container.Status.get_str_sid()], "c1")
+
+    def test_invalid_batch_parameters(self):
+        image_name = "test_streaming/invalid_batch"
+        MessagesQueue.push_to_queue(image_name, b"payload")
+        result = self.client.simulate_post('/' + Definition.REST.get_str_stream_req(),
+                                           params=self.get_params(image_name, batch_size="many"))
+
+        self.assertEqual(result.status, falcon.HTTP_406)
+        self.assertFalse(LookUpTable.Containers.verbose().get(image_name))
+        self.assertEqual(MessagesQueue.get_queues_length(image_name), 1)
+
+
+class PushDispatcherTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dispatcher = PushDispatcher(timeout=1)
+        cls.dispatcher.start()
+        MessagesQueue.set_push_dispatcher(cls.dispatcher)
+
+    @classmethod
+    def tearDownClass(cls):
+        MessagesQueue.set_push_dispatcher(None)
+
+    def assert_requeued(self, image_name):
+        self.assertTrue(wait_for(lambda: not LookUpTable.Containers.verbose().get(image_name)))
+        self.assertTrue(wait_for(lambda: MessagesQueue.get_queues_length(image_name) == 1))
+
+    def test_unreachable_container(self):
+        image_name = "test_streaming/unreachable"
+        LookUpTable.Containers.update_container(make_container(image_name, "c1", get_closed_port()))
+        MessagesQueue.push_to_queue(image_name, b"payload")
+        pushed_before = time.time()
+        self.assert_requeued(image_name)
+
+        # the tuple is put back as it was, and the limit of the removed container is dropped
+        entry = MessagesQueue.lease_message(image_name)
+        self.assertEqual(bytes(entry[1]), b"payload")
+        self.assertLessEqual(entry[3], pushed_before)
+        self.assertTrue(wait_for(lambda: not self.dispatcher._PushDispatcher__limits))
+
+    def test_undecodable_payload(self):
+        image_name = "test_streaming/undecodable"
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        try:
+            LookUpTable.Containers.update_container(make_container(image_name, "c1", listener.getsockname()[1]))
+            MessagesQueue.push_to_queue(image_name, b"not zlib", encoding=Encoding.ZLIB)
+            self.assert_requeued(image_name)
+        finally:
+            listener.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
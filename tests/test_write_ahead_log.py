@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from harmonicIO.master.write_ahead_log import WriteAheadLog
+
+
+class WriteAheadLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sync_commit(self):
+        wal = WriteAheadLog(self.directory, sync_commit=True)
+        wal.start()
+        _, seq = wal.append_push("img", b"payload")
+        self.assertTrue(wal.wait_for_commit(seq))
+
+    def test_failed_fsync_fails_commit(self):
+        wal = WriteAheadLog(self.directory, sync_commit=True)
+        wal.start()
+        with mock.patch("os.fsync", side_effect=OSError("No space left on device")):
+            _, failed_seq = wal.append_push("img", b"lost")
+            self.assertFalse(wal.wait_for_commit(failed_seq))
+
+        msg_id, seq = wal.append_push("img", b"payload")
+        self.assertTrue(wal.wait_for_commit(seq))
+
+        # the log continues in a new file
+        self.assertEqual(sorted(os.listdir(self.directory)), ["000000000001.wal", "000000000002.wal"])
+        recovered = [(m, payload) for m, _, payload, _, _ in WriteAheadLog(self.directory).recover()]
+        self.assertIn((msg_id, b"payload"), recovered)
+
+    def test_failed_batches_are_dropped_once_waited_for(self):
+        wal = WriteAheadLog(self.directory, sync_commit=True)
+        wal.start()
+        for _ in range(3):
+            with mock.patch("os.fsync", side_effect=OSError("Input/output error")):
+                _, failed_seq = wal.append_push("img", b"lost")
+                self.assertFalse(wal.wait_for_commit(failed_seq))
+
+            _, seq = wal.append_push("img", b"payload")
+            self.assertTrue(wal.wait_for_commit(seq))
+
+        self.assertEqual(wal._WriteAheadLog__failed_seqs, [])
+
+    def test_failed_batch_before_wait(self):
+        wal = WriteAheadLog(self.directory, sync_commit=True)
+        wal.start()
+        with mock.patch("os.fsync", side_effect=OSError("Input/output error")):
+            _, failed_seq = wal.append_push("img", b"lost")
+            _, seq = wal.append_push("img", b"lost")
+            self.assertFalse(wal.wait_for_commit(seq))
+
+        # a later batch succeeds before the first caller waits
+        _, durable_seq = wal.append_push("img", b"payload")
+        self.assertTrue(wal.wait_for_commit(durable_seq))
+        self.assertFalse(wal.wait_for_commit(failed_seq))
+        self.assertEqual(wal._WriteAheadLog__failed_seqs, [])
+
+
+if __name__ == '__main__':
+    unittest.main()